@@ -0,0 +1,257 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+import pyarrow as pa
+
+from cleaning.customers_cleaning import clean_customers
+from cleaning.order_items_cleaning import clean_order_items
+from cleaning.orders_cleaning import clean_orders
+from cleaning.payments_cleaning import clean_payments
+from cleaning.products_cleaning import clean_products
+from ingestion.synthetic_olist import generate_olist_dataset, is_generated
+from modeling.date_dimension import build_date_dimension
+from modeling.fact_orders import fact_orders, fact_orders_from_cleaned
+from modeling.order_items_aggregation import order_items_aggregation
+from modeling.payments_aggregation import payments_aggregation
+from orchestration.dag import run_dag
+from run_pipeline import PIPELINE_STEPS, RAW_DATA_DIR
+from schemas.registry import get_schema
+
+BENCHMARK_DIR = Path("data/benchmarks")
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+RESULTS_PATH = BENCHMARK_DIR / "results.json"
+
+DEFAULT_SCALES = (1.0,)
+DEFAULT_REPEATS = 3
+# A case regresses when it is this much slower / hungrier than the baseline...
+DEFAULT_TOLERANCE = 0.25
+# ...and the difference is above the noise floor
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 16
+
+ARROW_SAMPLE_INTERVAL = 0.005
+
+
+class PeakMemory:
+    """
+    Peak memory allocated by a block of code, above what was allocated before.
+
+    numpy / pandas buffers are tracked with tracemalloc; Arrow buffers
+    (string[pyarrow] columns, Parquet I/O) bypass it and are sampled from
+    the Arrow memory pool in a background thread. Unlike RSS, neither is
+    hidden by memory the allocator kept from earlier calls.
+    """
+
+    def __enter__(self):
+        gc.collect()
+        self._arrow_baseline = pa.total_allocated_bytes()
+        self._arrow_peak = 0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+        tracemalloc.start()
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._arrow_peak = max(self._arrow_peak, pa.total_allocated_bytes() - self._arrow_baseline)
+            time.sleep(ARROW_SAMPLE_INTERVAL)
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._sampler.join()
+        self.peak_bytes = tracemalloc.get_traced_memory()[1] + self._arrow_peak
+        tracemalloc.stop()
+
+def measure(func: Callable[[], Any], repeats: int = DEFAULT_REPEATS) -> tuple[Any, dict]:
+    """
+    Time a call (best of `repeats`) and measure its peak memory (one extra call).
+
+    Returns
+    -------
+    tuple[Any, dict]
+        Result of the last call, and {"seconds", "peak_memory_mb", "rows"}.
+    """
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    with PeakMemory() as memory:
+        result = func()
+
+    return result, {
+        "seconds": round(min(timings), 4),
+        "peak_memory_mb": round(memory.peak_bytes / 2**20, 1),
+        "rows": len(result) if isinstance(result, pd.DataFrame) else None,
+    }
+
+def benchmark_scale(scale_factor: float, repeats: int = DEFAULT_REPEATS, seed: int = 0) -> dict[str, dict]:
+    """
+    Benchmark every pipeline function and the end-to-end run at one scale.
+
+    Must be called from the benchmark working directory of the scale: the
+    synthetic raw data is generated (once) into RAW_DATA_DIR, and the
+    end-to-end run writes the processed and modeled tables next to it.
+
+    Parameters
+    ----------
+    scale_factor : float
+        Synthetic dataset scale (1 = size of the Kaggle dataset).
+    repeats : int
+        Timed calls per case; the fastest is kept.
+    seed : int
+        Seed of the synthetic dataset.
+
+    Returns
+    -------
+    dict[str, dict]
+        Case name -> {"seconds", "peak_memory_mb", "rows"}.
+    """
+    if not is_generated(RAW_DATA_DIR, scale_factor, seed):
+        generate_olist_dataset(RAW_DATA_DIR, scale_factor, seed)
+
+    def raw_path(table):
+        return RAW_DATA_DIR / get_schema(table).file_name
+
+    results = {}
+
+    def run(name, func):
+        print(f"  {name} ...", end=" ", flush=True)
+        result, results[name] = measure(func, repeats)
+        print(f"{results[name]['seconds']:.3f}s, {results[name]['peak_memory_mb']:.0f} MB")
+        return result
+
+    orders = run("clean_orders", lambda: clean_orders(raw_path("orders")))
+    order_items = run("clean_order_items", lambda: clean_order_items(raw_path("order_items")))
+    payments = run("clean_payments", lambda: clean_payments(raw_path("payments")))
+    run("clean_products", lambda: clean_products(raw_path("products"), raw_path("category_translation")))
+    run("clean_customers", lambda: clean_customers(raw_path("customers")))
+
+    items_agg = run("order_items_aggregation", lambda: order_items_aggregation(order_items))
+    payments_agg = run("payments_aggregation", lambda: payments_aggregation(payments))
+    run("fact_orders", lambda: fact_orders(orders, items_agg, payments_agg))
+    fact_df = run("fact_orders_from_cleaned", lambda: fact_orders_from_cleaned(orders, order_items, payments))
+    run("build_date_dimension", lambda: build_date_dimension(fact_df))
+
+    run("end_to_end", lambda: run_dag(PIPELINE_STEPS))
+
+    return results
+
+def compare_to_baseline(
+    results: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> list[str]:
+    """
+    List the cases slower or using more memory than the baseline.
+
+    Parameters
+    ----------
+    results : dict[str, dict]
+        Scale factor -> case -> measures, as written to RESULTS_PATH.
+    baseline : dict[str, dict]
+        Same layout, from a previous run.
+    tolerance : float
+        Allowed relative increase (0.25 = 25%).
+
+    Returns
+    -------
+    list[str]
+        One message per regression; cases missing from the baseline are ignored.
+    """
+    regressions = []
+    checks = (("seconds", MIN_SECONDS_DELTA, "s"), ("peak_memory_mb", MIN_MEMORY_DELTA_MB, " MB"))
+
+    for scale, cases in results.items():
+        for case, measures in cases.items():
+            reference = baseline.get(scale, {}).get(case)
+            if reference is None:
+                continue
+            for measure_name, min_delta, unit in checks:
+                current, previous = measures[measure_name], reference[measure_name]
+                if current > previous * (1 + tolerance) and current - previous > min_delta:
+                    regressions.append(
+                        f"scale {scale} / {case}: {measure_name} {previous}{unit} -> {current}{unit} "
+                        f"(+{(current / previous - 1) * 100 if previous else float('inf'):.0f}%)"
+                    )
+
+    return regressions
+
+def run_benchmarks(
+    scales: tuple[float, ...] = DEFAULT_SCALES,
+    repeats: int = DEFAULT_REPEATS,
+    seed: int = 0,
+    benchmark_dir: Path = BENCHMARK_DIR,
+) -> dict[str, dict]:
+    """
+    Benchmark each scale in its own working directory under benchmark_dir.
+
+    Returns
+    -------
+    dict[str, dict]
+        Scale factor (as a string key) -> case -> measures.
+    """
+    benchmark_dir = Path(benchmark_dir).resolve()
+    results = {}
+
+    for scale_factor in scales:
+        scale_dir = benchmark_dir / f"scale_{scale_factor:g}"
+        scale_dir.mkdir(parents=True, exist_ok=True)
+        print(f"\nScale factor {scale_factor:g}")
+
+        cwd = Path.cwd()
+        os.chdir(scale_dir)
+        try:
+            results[f"{scale_factor:g}"] = benchmark_scale(scale_factor, repeats, seed)
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data (offline).")
+    parser.add_argument("--scales", type=float, nargs="+", default=list(DEFAULT_SCALES),
+                        help="Scale factors to benchmark (e.g. 1 10 100).")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Timed calls per case.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline results to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown / memory increase before flagging a regression.")
+    args = parser.parse_args()
+
+    results = run_benchmarks(tuple(args.scales), args.repeats, args.seed)
+
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {RESULTS_PATH}")
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2))
+        print(f"Baseline updated in {args.baseline}")
+    elif args.baseline.exists():
+        regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n✅ No regression against the baseline")
+    else:
+        print(f"No baseline at {args.baseline} (use --save-baseline to create one)")
@@ -1,6 +1,9 @@
 from pathlib import Path
 import pandas as pd
 
+from schemas.registry import enforce_schema, read_raw_table, validate_columns
+from storage.tables import write_table
+
 RAW_DATA_DIR = Path("data/raw/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
@@ -15,20 +18,10 @@ def clean_customers(customers_path: Path) -> pd.DataFrame:
     - pd.DataFrame : Cleaned customer data.
     """
     # Load the data
-    df = pd.read_csv(customers_path)
-
-    expected_columns = {
-        "customer_id",
-        "customer_unique_id",
-        "customer_zip_code_prefix",
-        "customer_city",
-        "customer_state"
-    }
+    df = read_raw_table(customers_path, "customers")
 
     # Check for missing columns in customers dataset
-    missing_columns = expected_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in customers dataset: {missing_columns}")
+    validate_columns(df, "customers")
     
     # Ensure customer_id uniqueness (assertion)
     if df["customer_id"].duplicated().any():
@@ -39,13 +32,11 @@ def clean_customers(customers_path: Path) -> pd.DataFrame:
     df["customer_state"] = df["customer_state"].astype(str).str.upper().str.strip()
 
 
-    return df
+    return enforce_schema(df, "customers_cleaned")
 
 if __name__ == "__main__":
     customers_path = RAW_DATA_DIR / "olist_customers_dataset.csv"
     PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
     cleaned_df = clean_customers(customers_path)
-    output_path = PROCESSED_DATA_DIR / "customers_cleaned.csv"
-
-    cleaned_df.to_csv(output_path, index=False)
\ No newline at end of file
+    write_table(cleaned_df, PROCESSED_DATA_DIR, "customers_cleaned")
\ No newline at end of file
@@ -0,0 +1,59 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from cleaning.rules import REJECTS_DIR, apply_cleaning_rules
+from schemas.registry import enforce_schema, read_raw_table, validate_columns
+from storage.tables import write_table
+
+RAW_DATA_DIR = Path("data/raw/olist")
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+
+def clean_geolocation(geolocation_path: Path, rejects_dir: Path | None = None) -> pd.DataFrame:
+    """
+    Collapse the raw geolocation points to one centroid per zip code prefix.
+
+    The raw file lists ~1M points for ~19k prefixes. Points outside Brazil
+    are rejected (see cleaning.rules), then the mean latitude and longitude
+    of each prefix are computed with one np.bincount per column over the
+    factorized prefixes, so no Python code runs per prefix.
+
+    Parameters
+    ----------
+    geolocation_path : Path
+        Path to the raw geolocation CSV file.
+    rejects_dir : Path | None
+        Directory of the reject table (rejected rows with their reason codes), if any.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per zip code prefix, sorted by prefix, with its centroid and
+        number of points.
+    """
+    df = read_raw_table(geolocation_path, "geolocation")
+
+    # Check for missing columns in geolocation dataset
+    validate_columns(df, "geolocation")
+
+    # Remove points outside Brazil (see cleaning.rules)
+    df = apply_cleaning_rules(df, "geolocation", rejects_dir)
+
+    codes, prefixes = pd.factorize(df["geolocation_zip_code_prefix"], sort=True)
+    points = np.bincount(codes, minlength=len(prefixes))
+    # Points failing the bounding box are gone, so every coordinate is known
+    centroids = pd.DataFrame({
+        "geolocation_zip_code_prefix": prefixes,
+        "geolocation_lat": np.bincount(codes, weights=df["geolocation_lat"].to_numpy(), minlength=len(prefixes)) / points,
+        "geolocation_lng": np.bincount(codes, weights=df["geolocation_lng"].to_numpy(), minlength=len(prefixes)) / points,
+        "geolocation_points": points,
+    })
+
+    return enforce_schema(centroids, "geolocation_centroids")
+
+if __name__ == "__main__":
+    geolocation_path = RAW_DATA_DIR / "olist_geolocation_dataset.csv"
+    PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    centroids_df = clean_geolocation(geolocation_path, rejects_dir=REJECTS_DIR)
+    write_table(centroids_df, PROCESSED_DATA_DIR, "geolocation_centroids")
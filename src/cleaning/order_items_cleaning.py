@@ -1,10 +1,14 @@
 from pathlib import Path
 import pandas as pd
 
+from cleaning.rules import REJECTS_DIR, apply_cleaning_rules
+from schemas.registry import enforce_schema, read_raw_table, validate_columns
+from storage.tables import TableWriter, write_table
+
 RAW_DATA_DIR = Path("data/raw/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
-def clean_order_items(order_items_path: Path) -> pd.DataFrame:
+def clean_order_items(order_items_path: Path, rejects_dir: Path | None = None) -> pd.DataFrame:
     """
     Clean the raw order_items dataset.
 
@@ -12,6 +16,8 @@ def clean_order_items(order_items_path: Path) -> pd.DataFrame:
     ----------
     order_items_path : Path
         Path to the raw order_items CSV file.
+    rejects_dir : Path | None
+        Directory of the reject table (rejected rows with their reason codes), if any.
 
     Returns
     -------
@@ -19,36 +25,48 @@ def clean_order_items(order_items_path: Path) -> pd.DataFrame:
         Cleaned order_items dataframe.
     """
 
-    df = pd.read_csv(order_items_path)
+    df = read_raw_table(order_items_path, "order_items")
+
+    return clean_order_items_chunk(df, rejects_dir)
+
+def clean_order_items_chunk(
+    df: pd.DataFrame,
+    rejects_dir: Path | None = None,
+    rejects: TableWriter | None = None,
+) -> pd.DataFrame:
+    """
+    Apply the order_items cleaning rules to an already loaded frame.
+
+    The rules are row-level, so this also cleans any chunk of the raw file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw order_items rows.
+    rejects_dir : Path | None
+        Directory of the reject table, if any.
+    rejects : TableWriter | None
+        Reject table the rejected rows are appended to instead (see cleaning.rules.rejects_writer).
+
+    Returns
+    -------
+    pd.DataFrame
+        Cleaned order_items rows.
+    """
 
     # Check for missing columns in order_items dataset
-    expected_columns = {
-        "order_id",
-        "order_item_id",
-        "product_id",
-        "seller_id",
-        "shipping_limit_date",
-        "price",
-        "freight_value",
-    }
-    
-    missing_columns = expected_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in order_items dataset: {missing_columns}")
-
-    # Remove rows with negative prices or freight values, keep 0 values (free items/shipping promotions)
-    df = df[(df["price"] >= 0) & (df["freight_value"] >= 0)].copy()
-
-    # Convert shipping_limit_date to datetime
-    df["shipping_limit_date"] = pd.to_datetime(df["shipping_limit_date"], errors="coerce")
-
-    return df
+    validate_columns(df, "order_items")
+
+    # Remove rows with negative prices or freight values (see cleaning.rules)
+    df = apply_cleaning_rules(df, "order_items", rejects_dir, rejects)
+
+    # Convert shipping_limit_date to datetime (no-op when read through the schema registry)
+    return enforce_schema(df, "order_items_cleaned")
 
 if __name__ == "__main__":
     order_items_path = RAW_DATA_DIR / "olist_order_items_dataset.csv"
 
     PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    cleaned_df = clean_order_items(order_items_path)
+    cleaned_df = clean_order_items(order_items_path, REJECTS_DIR)
 
-    output_path = PROCESSED_DATA_DIR / "order_items_cleaned.csv"
-    cleaned_df.to_csv(output_path, index=False)
\ No newline at end of file
+    write_table(cleaned_df, PROCESSED_DATA_DIR, "order_items_cleaned")
\ No newline at end of file
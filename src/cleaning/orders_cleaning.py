@@ -1,96 +1,70 @@
 from pathlib import Path
 import pandas as pd
 
+from cleaning.rules import REJECTS_DIR, apply_cleaning_rules
+from schemas.registry import enforce_schema, read_raw_table, validate_columns
+from storage.tables import TableWriter, write_table
+
 RAW_DATA_DIR = Path("data/raw/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
-def clean_orders(products_path: Path) -> pd.DataFrame:
+def clean_orders(orders_path: Path, rejects_dir: Path | None = None) -> pd.DataFrame:
     """
-    Clean the raw products dataset.
+    Clean the raw orders dataset.
 
     Parameters
     ----------
-    products_path : Path
-        Path to the raw products CSV file.
+    orders_path : Path
+        Path to the raw orders CSV file.
+    rejects_dir : Path | None
+        Directory of the reject table (rejected rows with their reason codes), if any.
 
     Returns
     -------
     pd.DataFrame
-        Cleaned products dataframe.
+        Cleaned orders dataframe.
+    """
+
+    # Timestamps are parsed by the schema reader (invalid values become NaT)
+    df = read_raw_table(orders_path, "orders")
+
+    return clean_orders_chunk(df, rejects_dir)
+
+def clean_orders_chunk(
+    df: pd.DataFrame,
+    rejects_dir: Path | None = None,
+    rejects: TableWriter | None = None,
+) -> pd.DataFrame:
     """
+    Apply the orders cleaning rules to an already loaded frame.
+
+    The rules are row-level, so this also cleans any subset of the raw orders.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw orders rows.
+    rejects_dir : Path | None
+        Directory of the reject table, if any.
+    rejects : TableWriter | None
+        Reject table the rejected rows are appended to instead (see cleaning.rules.rejects_writer).
 
-    df = pd.read_csv(orders_path)
+    Returns
+    -------
+    pd.DataFrame
+        Cleaned orders rows.
+    """
 
     # Check for missing columns in orders dataset
-    expected_columns = {
-        "order_id",
-        "customer_id",
-        "order_status",
-        "order_purchase_timestamp",
-        "order_approved_at",
-        "order_delivered_carrier_date",
-        "order_delivered_customer_date",
-      "order_estimated_delivery_date",
-    }
-    
-    missing_columns = expected_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in products dataset: {missing_columns}")
-
-    timestamp_cols = [
-        "order_purchase_timestamp",
-        "order_approved_at",
-        "order_delivered_carrier_date",
-        "order_delivered_customer_date",
-        "order_estimated_delivery_date",
-    ]
-    # Remove rows with invalid timestamps
-    for col in timestamp_cols:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
-    
-    valid_statuses = {"delivered"}
-    # Remove rows with invalid order statuses (undelivered, canceled, etc.)
-
-    df = df[df["order_status"].isin(valid_statuses)].copy()
-
-    date_pairs = [
-    ("order_purchase_timestamp", "order_approved_at"),
-    ("order_approved_at", "order_delivered_carrier_date"),
-    ("order_delivered_carrier_date", "order_delivered_customer_date"),
-    ]
-    # Remove rows with inconsistent/impossible date sequences
-
-    invalid_date_mask = False
-
-    for earlier, later in date_pairs:
-        invalid_date_mask |= (
-            df[earlier].notna() &
-            df[later].notna() &
-            (df[earlier] > df[later])
-    )
-        
-    df = df.loc[~invalid_date_mask].copy()
-
-    df["delivery_duration_days"] = df["order_delivered_customer_date"] - df["order_purchase_timestamp"]
-
-    df["delivery_delay_days"] = df["order_delivered_customer_date"] - df["order_estimated_delivery_date"]
-
-    df["delivery_duration_days"] = (
-    df["order_delivered_customer_date"]
-    - df["order_purchase_timestamp"]
-    ).dt.days
-    # Calculate delivery duration in days
-
-    df["delivery_delay_days"] = (
-    df["order_delivered_customer_date"]
-    - df["order_estimated_delivery_date"]
-    ).dt.days
-    # Calculate delivery delay in days
-
-    df = df[df["delivery_duration_days"] >= 0].copy()
-
-
-    return df
+    validate_columns(df, "orders")
+
+    # Parse timestamps if the frame was not read through the schema registry
+    df = enforce_schema(df, "orders")
+
+    # Status, date sequence and delivery duration rules (see cleaning.rules)
+    df = apply_cleaning_rules(df, "orders", rejects_dir, rejects)
+
+    return enforce_schema(df, "orders_cleaned")
 
 
 
@@ -99,7 +73,6 @@ if __name__ == "__main__":
 
     PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    cleaned_df = clean_orders(orders_path)
+    cleaned_df = clean_orders(orders_path, REJECTS_DIR)
 
-    output_path = PROCESSED_DATA_DIR / "orders_cleaned.csv"
-    cleaned_df.to_csv(output_path, index=False)
+    write_table(cleaned_df, PROCESSED_DATA_DIR, "orders_cleaned")
@@ -1,10 +1,14 @@
 from pathlib import Path
 import pandas as pd
 
+from cleaning.rules import REJECTS_DIR, apply_cleaning_rules
+from schemas.registry import enforce_schema, read_raw_table, validate_columns
+from storage.tables import TableWriter, write_table
+
 RAW_DATA_DIR = Path("data/raw/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
-def clean_payments(payments_path: Path):
+def clean_payments(payments_path: Path, rejects_dir: Path | None = None):
     """
     Clean the raw payments dataset.
 
@@ -12,6 +16,8 @@ def clean_payments(payments_path: Path):
     ----------
     payments_path : Path
         Path to the raw payments CSV file.
+    rejects_dir : Path | None
+        Directory of the reject table (rejected rows with their reason codes), if any.
 
     Returns
     -------
@@ -19,42 +25,47 @@ def clean_payments(payments_path: Path):
         Cleaned payments dataframe.
     """
 
-    df = pd.read_csv(payments_path)
+    df = read_raw_table(payments_path, "payments")
 
-    # Check for missing columns in payments dataset
-    expected_columns = {
-        "order_id",
-        "payment_sequential",
-        "payment_type",
-        "payment_installments",
-        "payment_value",
-    }
-    
-    missing_columns = expected_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in payments dataset: {missing_columns}")
+    return clean_payments_chunk(df, rejects_dir)
 
-    # Remove rows with negative payment values
-    df = df[df["payment_value"] >= 0].copy()
+def clean_payments_chunk(
+    df: pd.DataFrame,
+    rejects_dir: Path | None = None,
+    rejects: TableWriter | None = None,
+) -> pd.DataFrame:
+    """
+    Apply the payments cleaning rules to an already loaded frame.
 
-    # Remove negative installments, keep 0 installments (some orders might be paid in full without installments)
-    df = df[df["payment_installments"] >= 0].copy()
+    The rules are row-level, so this also cleans any chunk of the raw file.
 
-    # Normalize payment_type values to lowercase and strip whitespace
-    df["payment_type"] = df["payment_type"].str.strip().str.lower()
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw payments rows.
+    rejects_dir : Path | None
+        Directory of the reject table, if any.
+    rejects : TableWriter | None
+        Reject table the rejected rows are appended to instead (see cleaning.rules.rejects_writer).
 
-    # Replace 'not_defined' payment types with NaN
-    df.loc[df["payment_type"] == "not_defined", "payment_type"] = pd.NA
+    Returns
+    -------
+    pd.DataFrame
+        Cleaned payments rows.
+    """
 
+    # Check for missing columns in payments dataset
+    validate_columns(df, "payments")
 
+    # Remove negative payment values and installments, normalize payment_type (see cleaning.rules)
+    df = apply_cleaning_rules(df, "payments", rejects_dir, rejects)
 
-    return df
+    return enforce_schema(df, "payments_cleaned")
 
 if __name__ == "__main__":
     payments_path = RAW_DATA_DIR / "olist_order_payments_dataset.csv"
 
     PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    cleaned_df = clean_payments(payments_path)
+    cleaned_df = clean_payments(payments_path, REJECTS_DIR)
 
-    output_path = PROCESSED_DATA_DIR / "payments_cleaned.csv"
-    cleaned_df.to_csv(output_path, index=False)
\ No newline at end of file
+    write_table(cleaned_df, PROCESSED_DATA_DIR, "payments_cleaned")
\ No newline at end of file
@@ -1,10 +1,16 @@
 from pathlib import Path
 import pandas as pd
 
+from cleaning.rules import REJECTS_DIR, apply_cleaning_rules
+from schemas.registry import enforce_schema, validate_columns
+from storage.concurrent_io import raw_table_read, read_concurrently
+from storage.tables import write_table
+
 RAW_DATA_DIR = Path("data/raw/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
-def clean_products(products_path: Path, category_translation_path: Path) -> pd.DataFrame:
+def clean_products(products_path: Path, category_translation_path: Path,
+                   rejects_dir: Path | None = None) -> pd.DataFrame:
     """
     Clean the raw products dataset.
 
@@ -12,6 +18,10 @@ def clean_products(products_path: Path, category_translation_path: Path) -> pd.D
     ----------
     products_path : Path
         Path to the raw products CSV file.
+    category_translation_path : Path
+        Path to the category name translation CSV file.
+    rejects_dir : Path | None
+        Directory of the reject table (rejected rows with their reason codes), if any.
 
     Returns
     -------
@@ -19,51 +29,21 @@ def clean_products(products_path: Path, category_translation_path: Path) -> pd.D
         Cleaned products dataframe.
     """
 
-    df = pd.read_csv(products_path)
-    category_translation = pd.read_csv(category_translation_path)
+    # Both files are loaded concurrently
+    raw = read_concurrently({
+        "products": raw_table_read(products_path, "products"),
+        "category_translation": raw_table_read(category_translation_path, "category_translation"),
+    })
+    df, category_translation = raw["products"], raw["category_translation"]
 
     # Check for missing columns in category translation dataset
-    expected_translation_columns = {
-        "product_category_name",
-        "product_category_name_english",
-    }
-
-    missing_translation_cols = expected_translation_columns - set(category_translation.columns)
-    if missing_translation_cols:
-        raise ValueError(
-            f"Missing columns in category translation dataset: {missing_translation_cols}"
-        )
+    validate_columns(category_translation, "category_translation")
 
     # Check for missing columns in products dataset
-    expected_columns = {
-        "product_id",
-        "product_category_name",
-        "product_name_lenght",
-        "product_description_lenght",
-        "product_photos_qty",
-        "product_weight_g",
-        "product_length_cm",
-        "product_height_cm",
-        "product_width_cm"
-    }
-    
-    missing_columns = expected_columns - set(df.columns)
-    if missing_columns:
-        raise ValueError(f"Missing columns in products dataset: {missing_columns}")
-
-    dimension_cols = [
-    "product_weight_g",
-    "product_length_cm",
-    "product_height_cm",
-    "product_width_cm",
-    ]
-    
-    # Remove rows with non-positive values in dimension columns
-    invalid_mask = (
-    (df[dimension_cols] <= 0) |
-    (df[dimension_cols].isna())).any(axis=1)
+    validate_columns(df, "products")
 
-    df = df.loc[~invalid_mask].copy()
+    # Remove rows with non-positive or missing dimensions (see cleaning.rules)
+    df = apply_cleaning_rules(df, "products", rejects_dir)
 
     # Fill missing product category names with 'unknown'
     df["product_category_name"] = df["product_category_name"].fillna("unknown")
@@ -88,7 +68,7 @@ def clean_products(products_path: Path, category_translation_path: Path) -> pd.D
         df["product_category_name_english"]
         .fillna("unknown")
     )
-    return df
+    return enforce_schema(df, "products_cleaned")
 
 if __name__ == "__main__":
     products_path = RAW_DATA_DIR / "olist_products_dataset.csv"
@@ -99,7 +79,7 @@ if __name__ == "__main__":
     cleaned_df = clean_products(
         products_path=products_path,
         category_translation_path=category_translation_path,
+        rejects_dir=REJECTS_DIR,
     )
 
-    output_path = PROCESSED_DATA_DIR / "products_cleaned.csv"
-    cleaned_df.to_csv(output_path, index=False)
+    write_table(cleaned_df, PROCESSED_DATA_DIR, "products_cleaned")
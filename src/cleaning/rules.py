@@ -0,0 +1,287 @@
+from collections import ChainMap
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from orchestration.metrics import record_rejects
+from schemas.registry import SCHEMAS
+from storage.tables import TableWriter, write_table
+
+REJECTS_DIR = Path("data/processed/olist/rejects")
+# Reject tables are an audit trail: always Parquet, whatever the format of the tables
+REJECTS_FORMAT = "parquet"
+# Separator of the reason codes of a rejected row
+REASON_SEPARATOR = "|"
+# (min, max) latitude and longitude of Brazil, islands included, in degrees
+BRAZIL_BOUNDS = {"lat": (-33.8, 5.3), "lng": (-74.0, -28.8)}
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    Row-level cleaning rule: rows failing any of its checks are rejected.
+
+    Attributes
+    ----------
+    name : str
+        Reject reason code, reported in the run manifest and the reject tables.
+    checks : tuple[tuple, ...]
+        (column, operation, operand) conditions a valid row satisfies:
+          "isin"      : the value is one of operand (a tuple); missing values fail
+          "ge"        : the value is >= operand; missing values fail
+          "gt"        : the value is > operand; missing values fail
+          "le"        : the value is <= operand; missing values fail
+          "not_after" : the value is <= the operand column, or either value is missing
+    """
+
+    name: str
+    checks: tuple[tuple, ...]
+
+
+@dataclass(frozen=True)
+class Derive:
+    """
+    Column computed from the row, available to the following rules.
+
+    Attributes
+    ----------
+    column : str
+        Column created (or replaced).
+    operation : str
+        "days_between" : whole days from the first to the second datetime
+                         operand column (floored, missing if either is)
+        "normalize"    : the operand column stripped and lower-cased, missing
+                         where it equals the second operand
+    operands : tuple
+        Operands of the operation.
+    """
+
+    column: str
+    operation: str
+    operands: tuple
+
+
+# Cleaning of each raw table. Rules and derived columns are evaluated in
+# declaration order (a rule sees the columns derived before it), but every rule
+# is checked on every row: a rejected row gets the code of each rule it fails.
+# Every engine (see engines/) interprets these declarations, so the rules are
+# written only once.
+CLEANING_RULES = {
+    "orders": (
+        # Remove rows with invalid order statuses (undelivered, canceled, etc.)
+        Rule("invalid_order_status", (("order_status", "isin", ("delivered",)),)),
+        # Remove rows with inconsistent/impossible date sequences
+        Rule("inconsistent_dates", (
+            ("order_purchase_timestamp", "not_after", "order_approved_at"),
+            ("order_approved_at", "not_after", "order_delivered_carrier_date"),
+            ("order_delivered_carrier_date", "not_after", "order_delivered_customer_date"),
+        )),
+        # Delivery duration and delay in days
+        Derive("delivery_duration_days", "days_between",
+               ("order_purchase_timestamp", "order_delivered_customer_date")),
+        Derive("delivery_delay_days", "days_between",
+               ("order_estimated_delivery_date", "order_delivered_customer_date")),
+        Rule("negative_delivery_duration", (("delivery_duration_days", "ge", 0),)),
+    ),
+    "order_items": (
+        # Remove rows with negative prices or freight values, keep 0 values (free items/shipping promotions)
+        Rule("negative_price_or_freight", (("price", "ge", 0), ("freight_value", "ge", 0))),
+    ),
+    "payments": (
+        # Remove rows with negative payment values
+        Rule("negative_payment_value", (("payment_value", "ge", 0),)),
+        # Remove negative installments, keep 0 installments (some orders might be paid in full without installments)
+        Rule("negative_installments", (("payment_installments", "ge", 0),)),
+        # Normalize payment_type values to lowercase and strip whitespace, 'not_defined' becomes missing
+        Derive("payment_type", "normalize", ("payment_type", "not_defined")),
+    ),
+    "products": (
+        # Remove rows with non-positive or missing weight and dimensions
+        Rule("invalid_dimensions", (
+            ("product_weight_g", "gt", 0),
+            ("product_length_cm", "gt", 0),
+            ("product_height_cm", "gt", 0),
+            ("product_width_cm", "gt", 0),
+        )),
+    ),
+    "geolocation": (
+        # Remove points outside Brazil's bounding box (swapped signs, placeholder coordinates)
+        Rule("outside_brazil", (
+            ("geolocation_lat", "ge", BRAZIL_BOUNDS["lat"][0]),
+            ("geolocation_lat", "le", BRAZIL_BOUNDS["lat"][1]),
+            ("geolocation_lng", "ge", BRAZIL_BOUNDS["lng"][0]),
+            ("geolocation_lng", "le", BRAZIL_BOUNDS["lng"][1]),
+        )),
+    ),
+}
+
+
+def _check_mask(columns, column: str, operation: str, operand) -> np.ndarray:
+    values = columns[column]
+    if operation == "isin":
+        return values.isin(operand).to_numpy(dtype=bool)
+    if operation == "ge":
+        return (values >= operand).fillna(False).to_numpy(dtype=bool)
+    if operation == "gt":
+        return (values > operand).fillna(False).to_numpy(dtype=bool)
+    if operation == "le":
+        return (values <= operand).fillna(False).to_numpy(dtype=bool)
+    if operation == "not_after":
+        other = columns[operand]
+        return (values.isna() | other.isna() | (values <= other)).to_numpy(dtype=bool)
+    raise ValueError(f"Unknown rule check operation: {operation!r}")
+
+def _normalize_categorical(values: pd.Series, missing_value: str) -> pd.Series:
+    """
+    "normalize" of a categorical column, done on its categories instead of its rows.
+
+    Categories equal once normalized are merged; the result has sorted
+    categories, as a cast of the normalized strings would.
+    """
+    normalized = values.cat.categories.str.strip().str.lower()
+    labels, inverse = np.unique(np.asarray(normalized, dtype=object), return_inverse=True)
+    missing = labels == missing_value
+    # Category position -> new code, missing_value dropping to -1 (missing)
+    new_codes = np.cumsum(~missing) - 1
+    new_codes[missing] = -1
+    remap = np.append(new_codes[inverse], -1)
+    codes = remap[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, labels[~missing]), index=values.index, name=values.name)
+
+def _derive(columns, derive: Derive) -> pd.Series:
+    if derive.operation == "days_between":
+        start, end = derive.operands
+        return (columns[end] - columns[start]).dt.days
+    if derive.operation == "normalize":
+        column, missing_value = derive.operands
+        values = columns[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return _normalize_categorical(values, missing_value)
+        values = values.str.strip().str.lower()
+        return values.mask(values == missing_value)
+    raise ValueError(f"Unknown derived column operation: {derive.operation!r}")
+
+def _reject_reasons(failures: np.ndarray, rule_names: list[str]) -> np.ndarray:
+    """
+    Reason codes of rejected rows, from their (rows x rules) failure matrix.
+
+    Rows are grouped by the set of rules they fail (a bit mask), so each
+    distinct combination is formatted once.
+    """
+    bits = failures.astype(np.int64) @ (np.int64(1) << np.arange(len(rule_names), dtype=np.int64))
+    combinations, inverse = np.unique(bits, return_inverse=True)
+    labels = np.array([
+        REASON_SEPARATOR.join(name for i, name in enumerate(rule_names) if combination >> i & 1)
+        for combination in combinations
+    ], dtype=object)
+    return labels[inverse]
+
+def evaluate_rules(df: pd.DataFrame, table: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Split the rows of a raw table into cleaned rows and rejected rows.
+
+    Derived columns are computed as standalone series, without copying the
+    frame; every rule is checked on every row in one vectorized pass, and the
+    combined mask selects the kept and the rejected rows with a single take
+    each. Rows failing several rules count once for each of them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw rows, with parsed timestamps.
+    table : str
+        Raw table name (key of CLEANING_RULES).
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        Rows kept by every rule, with the derived columns (cast to the
+        dtypes of the cleaned table when it declares them), and rejected
+        rows, as read, with their reject_reasons codes.
+    """
+    derived = {}
+    # Columns derived so far shadow the raw ones
+    columns = ChainMap(derived, df)
+    rule_names, failures = [], []
+    for step in CLEANING_RULES[table]:
+        if isinstance(step, Rule):
+            valid = np.ones(len(df), dtype=bool)
+            for column, operation, operand in step.checks:
+                valid &= _check_mask(columns, column, operation, operand)
+            rule_names.append(step.name)
+            failures.append(~valid)
+        else:
+            derived[step.column] = _derive(columns, step)
+
+    failures = np.column_stack(failures) if failures else np.zeros((len(df), 0), dtype=bool)
+    for name, count in zip(rule_names, failures.sum(axis=0)):
+        record_rejects(name, count)
+
+    rejected_mask = failures.any(axis=1)
+    kept_rows = np.flatnonzero(~rejected_mask)
+    kept = df.take(kept_rows)
+    if derived:
+        cleaned_table = f"{table}_cleaned"
+        dtypes = {
+            column.name: column.dtype for column in SCHEMAS[cleaned_table].columns
+        } if cleaned_table in SCHEMAS else {}
+        for column, values in derived.items():
+            values = values.take(kept_rows)
+            if column in dtypes and dtypes[column] != "object" and values.dtype != dtypes[column]:
+                values = values.astype(dtypes[column])
+            kept[column] = values
+
+    rejected_rows = np.flatnonzero(rejected_mask)
+    rejected = df.take(rejected_rows)
+    rejected["reject_reasons"] = _reject_reasons(failures[rejected_rows], rule_names)
+
+    return kept, rejected
+
+def write_rejects(rejected: pd.DataFrame, table: str, rejects_dir: Path = REJECTS_DIR) -> Path:
+    """
+    Write the rejected rows of a raw table to its reject table (e.g. orders_rejects).
+    """
+    return write_table(rejected, rejects_dir, f"{table}_rejects", fmt=REJECTS_FORMAT)
+
+def rejects_writer(table: str, rejects_dir: Path = REJECTS_DIR) -> TableWriter:
+    """
+    Open the reject table of a raw table for chunk by chunk writing.
+    """
+    return TableWriter(rejects_dir, f"{table}_rejects", REJECTS_FORMAT)
+
+def apply_cleaning_rules(
+    df: pd.DataFrame,
+    table: str,
+    rejects_dir: Path | None = None,
+    rejects: TableWriter | None = None,
+) -> pd.DataFrame:
+    """
+    Apply the cleaning rules of a raw table to a pandas frame.
+
+    The rows failing each rule are counted in the step metrics (see evaluate_rules).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw rows, with parsed timestamps.
+    table : str
+        Raw table name (key of CLEANING_RULES).
+    rejects_dir : Path | None
+        Directory the rejected rows are written to, with their reason codes.
+    rejects : TableWriter | None
+        Reject table the rejected rows are appended to instead, for the
+        chunks or shards of a table (see rejects_writer).
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows kept by every rule, with the derived columns.
+    """
+    kept, rejected = evaluate_rules(df, table)
+    if rejects is not None:
+        rejects.write(rejected)
+    elif rejects_dir is not None:
+        write_rejects(rejected, table, rejects_dir)
+    return kept
@@ -0,0 +1,109 @@
+from abc import ABC, abstractmethod
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+# Engine name -> "module:class", imported on demand so optional backends
+# (duckdb) are only needed when selected
+ENGINES = {
+    "pandas": "engines.pandas_engine:PandasEngine",
+    "duckdb": "engines.duckdb_engine:DuckDBEngine",
+}
+
+
+class Engine(ABC):
+    """
+    Backend running the cleaning and order-level modeling of the pipeline.
+
+    Engines hand around opaque relations (a DataFrame, a database table,
+    ...) and implement the same contract: the cleaning rules of
+    cleaning.rules, the per-order measures of modeling.order_aggregation
+    and the fact_orders columns, with the registered table schemas.
+
+    Parameters
+    ----------
+    memory_limit_mb : int | None
+        Memory the engine may use before spilling to disk (out-of-core engines only).
+    threads : int | None
+        Worker threads (multi-threaded engines only; default: all cores).
+    """
+
+    name = ""
+
+    def __init__(self, memory_limit_mb: int | None = None, threads: int | None = None):
+        self.memory_limit_mb = memory_limit_mb
+        self.threads = threads
+
+    @abstractmethod
+    def clean(self, raw_path: Path, table: str, rejects_dir: Path | None = None) -> Any:
+        """
+        Read a raw CSV and apply the cleaning rules of its table.
+
+        When rejects_dir is given, the rejected rows are written there (as
+        cleaning.rules.write_rejects does), with their reason codes.
+        """
+
+    @abstractmethod
+    def aggregate_per_order(self, rows: Any, measures: dict[str, tuple], name: str) -> Any:
+        """
+        Aggregate cleaned rows to one row per order_id, sorted by order_id, into table `name`.
+        """
+
+    @abstractmethod
+    def fact_orders(self, orders: Any, order_items_aggregated: Any, payments_aggregated: Any) -> Any:
+        """
+        Join the cleaned orders with their item and payment measures, in orders row order.
+
+        The result has the FINAL_COLUMNS of modeling.fact_orders (natural IDs):
+        surrogate keys are assigned by the caller, which owns the key maps.
+        """
+
+    @abstractmethod
+    def write(self, relation: Any, directory: Path, name: str, fmt: str) -> Path:
+        """
+        Store a relation as a table of the storage layer (see storage.tables).
+        """
+
+    @abstractmethod
+    def to_pandas(self, relation: Any, name: str) -> pd.DataFrame:
+        """
+        Materialize a relation as a DataFrame with the schema of table `name`.
+        """
+
+    def close(self):
+        """
+        Release the engine resources (connections, spill files).
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def get_engine(name: str, **options) -> Engine:
+    """
+    Instantiate an engine by name.
+
+    Parameters
+    ----------
+    name : str
+        One of ENGINES.
+    **options
+        Engine options (memory_limit_mb, threads).
+
+    Raises
+    ------
+    ValueError
+        If the engine is unknown.
+    ImportError
+        If the engine's library is not installed.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine: {name!r} (expected one of {sorted(ENGINES)})")
+
+    module_name, class_name = ENGINES[name].split(":")
+    return getattr(import_module(module_name), class_name)(**options)
@@ -0,0 +1,344 @@
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import duckdb
+except ImportError as exc:
+    raise ImportError("The duckdb engine needs the duckdb package (pip install duckdb)") from exc
+
+from cleaning.rules import CLEANING_RULES, REASON_SEPARATOR, REJECTS_FORMAT, Rule
+from engines.base import Engine
+from modeling.fact_orders import FINAL_COLUMNS
+from orchestration.metrics import (
+    capture_metrics,
+    record_bytes_read,
+    record_bytes_written,
+    record_nat_coercions,
+    record_rejects,
+)
+from schemas.registry import CATEGORY, DATETIME, TEXT, Column, enforce_schema, get_schema
+from schemas.timestamps import OLIST_TIMESTAMP_FORMATS, parse_timestamps
+from storage.tables import table_path, write_table
+
+# DuckDB type of each registered dtype
+DUCKDB_TYPES = {
+    "string[pyarrow]": "VARCHAR",
+    "category": "VARCHAR",
+    DATETIME: "TIMESTAMP",
+    "bool": "BOOLEAN",
+    "boolean": "BOOLEAN",
+    "int8": "TINYINT",
+    "int16": "SMALLINT",
+    "int32": "INTEGER",
+    "int64": "BIGINT",
+    "float32": "FLOAT",
+    "float64": "DOUBLE",
+}
+# CSV values read as missing, as pd.read_csv does by default
+NULL_STRINGS = ("", "NA", "N/A", "n/a", "NaN", "nan", "-NaN", "-nan", "NULL", "null", "None", "<NA>", "#N/A")
+# Characters removed by str.strip()
+WHITESPACE = "' ' || chr(9) || chr(10) || chr(11) || chr(12) || chr(13)"
+FALLBACK_PARSER = "parse_timestamp_fallback"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _literal(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+def _parse_fallback(values: pa.Array) -> pa.Array:
+    """
+    Slow path of the timestamp parser, for the values no Olist format matched.
+    """
+    # NaT coercions are counted in SQL, on the step thread
+    with capture_metrics():
+        parsed = parse_timestamps(pd.Series(values.to_pandas(), dtype="object"))
+    return pa.array(parsed.to_numpy().astype("datetime64[us]"), type=pa.timestamp("us"))
+
+def _pandas_dtype(arrow_type: pa.DataType):
+    """
+    Load text as Arrow-backed strings (the registry's ID / TEXT dtype), not Python objects.
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type) or pa.types.is_string_view(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def _timestamp_sql(column: str) -> str:
+    """
+    SQL parsing a text column like schemas.timestamps.parse_timestamps.
+    """
+    branches = [
+        f"WHEN try_strptime({column}, {_literal(fmt)}) IS NOT NULL THEN try_strptime({column}, {_literal(fmt)})"
+        for fmt in OLIST_TIMESTAMP_FORMATS
+    ]
+    return f"CASE {' '.join(branches)} WHEN {column} IS NOT NULL THEN {FALLBACK_PARSER}({column}) END"
+
+def _check_sql(column: str, operation: str, operand) -> str:
+    column = _quote(column)
+    if operation == "isin":
+        return f"coalesce({column} IN ({', '.join(_literal(value) for value in operand)}), false)"
+    if operation == "ge":
+        return f"coalesce({column} >= {_literal(operand)}, false)"
+    if operation == "gt":
+        return f"coalesce({column} > {_literal(operand)}, false)"
+    if operation == "le":
+        return f"coalesce({column} <= {_literal(operand)}, false)"
+    if operation == "not_after":
+        other = _quote(operand)
+        return f"({column} IS NULL OR {other} IS NULL OR {column} <= {other})"
+    raise ValueError(f"Unknown rule check operation: {operation!r}")
+
+def _derive_sql(operation: str, operands: tuple) -> str:
+    if operation == "days_between":
+        start, end = map(_quote, operands)
+        return f"floor((epoch_us({end}) - epoch_us({start})) / 86400000000.0)"
+    if operation == "normalize":
+        column, missing_value = operands
+        return f"nullif(lower(trim({_quote(column)}, {WHITESPACE})), {_literal(missing_value)})"
+    raise ValueError(f"Unknown derived column operation: {operation!r}")
+
+
+class DuckDBEngine(Engine):
+    """
+    Out-of-core, multi-threaded engine on an embedded DuckDB database.
+
+    Relations are tables of a database file in a temporary directory, so
+    intermediate tables and large joins / aggregations spill to disk
+    beyond memory_limit_mb. Raw CSVs are scanned in parallel by DuckDB, the
+    cleaning rules are compiled to SQL, and Parquet / CSV outputs are
+    written by DuckDB without going through pandas. Categorical columns are
+    ENUMs with the categories the pandas engine gives them.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, memory_limit_mb: int | None = None, threads: int | None = None):
+        super().__init__(memory_limit_mb, threads)
+        self._tmp_dir = Path(tempfile.mkdtemp(prefix="duckdb_"))
+        config = {
+            "preserve_insertion_order": True,
+            "temp_directory": str(self._tmp_dir / "spill"),
+        }
+        if memory_limit_mb is not None:
+            config["memory_limit"] = f"{memory_limit_mb}MB"
+        if threads is not None:
+            config["threads"] = threads
+
+        self._con = duckdb.connect(str(self._tmp_dir / "engine.duckdb"), config=config)
+        # Relation -> ENUM type of each of its categorical columns
+        self._enums = {}
+        self._con.create_function(
+            FALLBACK_PARSER, _parse_fallback, ["VARCHAR"], "TIMESTAMP", type="arrow", null_handling="special",
+        )
+
+    def _create_table(
+        self,
+        name: str,
+        select_sql: str,
+        order_by: str | None = None,
+        columns: tuple[Column, ...] | None = None,
+        enums: dict[str, str] | None = None,
+    ):
+        """
+        Create a table from a query, with the columns and types of the registered table `name`
+        (or the given columns), categorical columns in enums being cast to their ENUM type.
+        """
+        enums = enums or {}
+        if enums:
+            self._enums[name] = enums
+        columns = ", ".join(
+            f"CAST({_quote(column.name)} AS "
+            f"{_quote(enums[column.name]) if column.name in enums else DUCKDB_TYPES[column.dtype]}) "
+            f"AS {_quote(column.name)}"
+            for column in columns or get_schema(name).columns
+        )
+        order_sql = f" ORDER BY {order_by}" if order_by else ""
+        self._con.execute(f"CREATE OR REPLACE TABLE {_quote(name)} AS SELECT {columns} FROM ({select_sql}){order_sql}")
+
+    def clean(self, raw_path: Path, table: str, rejects_dir: Path | None = None) -> str:
+        schema = get_schema(table)
+        raw_types = {
+            column.name: "VARCHAR" if column.dtype == DATETIME else DUCKDB_TYPES[column.dtype]
+            for column in schema.columns
+        }
+        struct = "{" + ", ".join(f"{_literal(name)}: {_literal(dtype)}" for name, dtype in raw_types.items()) + "}"
+        nullstr = "[" + ", ".join(map(_literal, NULL_STRINGS)) + "]"
+        record_bytes_read(raw_path)
+
+        # Parse timestamps, then flag the values coerced to missing
+        selections, texts, flags = [], [], []
+        for column in schema.columns:
+            name = _quote(column.name)
+            if column.dtype == DATETIME:
+                texts.append(f"_text_{len(texts)}")
+                flags.append((column.name, f"_nat_{len(flags)}"))
+                selections += [f"{_timestamp_sql(name)} AS {name}", f"{name} AS {texts[-1]}"]
+            else:
+                selections.append(name)
+        query = (
+            f"SELECT {', '.join(selections)} FROM read_csv({_literal(str(raw_path))}, header = true, "
+            f"auto_detect = false, columns = {struct}, nullstr = {nullstr})"
+        )
+        if flags:
+            nat_flags = ", ".join(
+                f"({text} IS NOT NULL AND {_quote(column)} IS NULL) AS {flag}"
+                for text, (column, flag) in zip(texts, flags)
+            )
+            query = f"SELECT * EXCLUDE ({', '.join(texts)}), {nat_flags} FROM ({query})"
+
+        # One layer per rule (a flag column) or derived column, in declaration order
+        rules = []
+        # Raw column -> column holding its value as read, for the rejected rows
+        raw_columns = {name: _quote(name) for name in raw_types}
+        for step in CLEANING_RULES[table]:
+            if isinstance(step, Rule):
+                rules.append((step.name, f"_rule_{len(rules)}"))
+                predicate = " AND ".join(_check_sql(*check) for check in step.checks)
+                query = f"SELECT *, {predicate} AS {rules[-1][1]} FROM ({query})"
+            else:
+                expression = _derive_sql(step.operation, step.operands)
+                if step.column in raw_types:
+                    if raw_columns[step.column] == _quote(step.column):
+                        raw_columns[step.column] = f"_raw_{list(raw_types).index(step.column)}"
+                        query = f"SELECT *, {_quote(step.column)} AS {raw_columns[step.column]} FROM ({query})"
+                    query = f"SELECT * REPLACE ({expression} AS {_quote(step.column)}) FROM ({query})"
+                else:
+                    query = f"SELECT *, {expression} AS {_quote(step.column)} FROM ({query})"
+
+        staged = f"{table}_staged"
+        self._con.execute(f"CREATE OR REPLACE TABLE {_quote(staged)} AS {query}")
+
+        # Rows failing each rule (a row failing several rules counts for each)
+        counts = [f"count(*) FILTER (WHERE {flag}) AS {flag}" for _, flag in flags]
+        counts += [f"count(*) FILTER (WHERE NOT {flag}) AS {flag}" for _, flag in rules]
+        totals = self._con.execute(f"SELECT {', '.join(counts)} FROM {_quote(staged)}").fetchone()
+        for (column, _), count in zip(flags, totals):
+            record_nat_coercions(column, count)
+        for (rule_name, _), count in zip(rules, totals[len(flags):]):
+            record_rejects(rule_name, count)
+
+        # Categories as in pandas: the sorted distinct values of the whole file
+        # (normalized ones for derived columns), rejected rows included
+        cleaned = f"{table}_cleaned"
+        enums = {}
+        for column in get_schema(cleaned).columns:
+            if column.dtype == CATEGORY:
+                enums[column.name] = f"{cleaned}_{column.name}"
+                self._con.execute(
+                    f"CREATE OR REPLACE TYPE {_quote(enums[column.name])} AS ENUM ("
+                    f"SELECT DISTINCT {_quote(column.name)} FROM {_quote(staged)} "
+                    f"WHERE {_quote(column.name)} IS NOT NULL ORDER BY 1)"
+                )
+
+        where = " AND ".join(flag for _, flag in rules) or "true"
+        self._create_table(cleaned, f"SELECT * FROM {_quote(staged)} WHERE {where}", enums=enums)
+
+        if rejects_dir is not None:
+            # Rejected rows as read, with the codes of the rules they fail (concat_ws skips NULLs)
+            rejected = f"{table}_rejects"
+            reasons = ", ".join(f"CASE WHEN NOT {flag} THEN {_literal(rule_name)} END" for rule_name, flag in rules)
+            selections = ", ".join(f"{column} AS {_quote(name)}" for name, column in raw_columns.items())
+            self._create_table(
+                rejected,
+                f"SELECT {selections}, concat_ws({_literal(REASON_SEPARATOR)}, {reasons or 'NULL'}) AS reject_reasons "
+                f"FROM {_quote(staged)} WHERE NOT ({where})",
+                columns=(*schema.columns, Column("reject_reasons", TEXT)),
+            )
+            self.write(rejected, rejects_dir, rejected, REJECTS_FORMAT)
+            self._con.execute(f"DROP TABLE {_quote(rejected)}")
+
+        self._con.execute(f"DROP TABLE {_quote(staged)}")
+
+        return cleaned
+
+    def aggregate_per_order(self, rows: str, measures: dict[str, tuple], name: str) -> str:
+        aggregates = []
+        for output, (column, operation, *operand) in measures.items():
+            column = _quote(column)
+            if operation == "count":
+                aggregates.append(f"count({column}) AS {_quote(output)}")
+            elif operation == "sum":
+                aggregates.append(f"coalesce(sum({column}), 0) AS {_quote(output)}")
+            elif operation == "any_equal":
+                aggregates.append(f"coalesce(bool_or({column} = {_literal(operand[0])}), false) AS {_quote(output)}")
+            else:
+                raise ValueError(f"Unknown aggregation operation: {operation!r}")
+
+        self._create_table(
+            name,
+            f"SELECT order_id, {', '.join(aggregates)} FROM {_quote(rows)} GROUP BY order_id",
+            order_by="order_id",
+        )
+        return name
+
+    def fact_orders(self, orders: str, order_items_aggregated: str, payments_aggregated: str) -> str:
+        orders_columns = set(get_schema(orders).column_names)
+        # Natural IDs, typed as in the cleaned orders: surrogate keys are assigned in pandas
+        declared = {
+            column.name: column
+            for column in (*get_schema("fact_orders").columns, *get_schema(orders).columns)
+        }
+        measures = {}
+        for alias, table in (("i", order_items_aggregated), ("p", payments_aggregated)):
+            for column in get_schema(table).columns[1:]:
+                # Orders without items or payments get zero counts and totals
+                fill = "false" if column.dtype in ("bool", "boolean") else "0"
+                measures[column.name] = f"coalesce({alias}.{_quote(column.name)}, {fill})"
+
+        selections = [
+            f"o.{_quote(column)}" if column in orders_columns else f"{measures[column]} AS {_quote(column)}"
+            for column in FINAL_COLUMNS
+        ]
+        self._create_table(
+            "fact_orders",
+            f"SELECT {', '.join(selections)}, o.rowid AS _row FROM {_quote(orders)} o "
+            f"LEFT JOIN {_quote(order_items_aggregated)} i ON i.order_id = o.order_id "
+            f"LEFT JOIN {_quote(payments_aggregated)} p ON p.order_id = o.order_id",
+            order_by="_row",
+            columns=tuple(declared[column] for column in FINAL_COLUMNS),
+            enums={column: enum for column, enum in self._enums.get(orders, {}).items() if column in FINAL_COLUMNS},
+        )
+        return "fact_orders"
+
+    def write(self, relation: str, directory: Path, name: str, fmt: str) -> Path:
+        if fmt == "feather":
+            # No Feather writer in DuckDB: go through pandas
+            return write_table(self.to_pandas(relation, name), directory, name, fmt=fmt)
+
+        path = table_path(directory, name, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        options = "FORMAT parquet, COMPRESSION zstd" if fmt == "parquet" else "FORMAT csv, HEADER"
+        try:
+            if fmt == "parquet" and relation in self._enums:
+                # COPY stores ENUMs as plain strings: stream Arrow batches to keep their categories
+                reader = self._con.table(relation).to_arrow_reader()
+                with pq.ParquetWriter(tmp_path, reader.schema, compression="zstd") as writer:
+                    for batch in reader:
+                        writer.write_batch(batch)
+            else:
+                self._con.execute(f"COPY {_quote(relation)} TO {_literal(str(tmp_path))} ({options})")
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        record_bytes_written(path)
+        return path
+
+    def to_pandas(self, relation: str, name: str) -> pd.DataFrame:
+        table = self._con.table(relation).to_arrow_table()
+        return enforce_schema(table.to_pandas(types_mapper=_pandas_dtype), name)
+
+    def close(self):
+        self._con.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
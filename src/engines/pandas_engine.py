@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pandas as pd
+
+from cleaning.order_items_cleaning import clean_order_items
+from cleaning.orders_cleaning import clean_orders
+from cleaning.payments_cleaning import clean_payments
+from engines.base import Engine
+from modeling.fact_orders import fact_orders
+from modeling.order_aggregation import aggregate_per_order
+from schemas.registry import enforce_schema
+from storage.tables import write_table
+
+# Cleaning function of each raw table
+CLEANERS = {
+    "orders": clean_orders,
+    "order_items": clean_order_items,
+    "payments": clean_payments,
+}
+
+
+class PandasEngine(Engine):
+    """
+    In-memory engine: the pipeline's pandas implementation. Relations are DataFrames.
+    """
+
+    name = "pandas"
+
+    def clean(self, raw_path: Path, table: str, rejects_dir: Path | None = None) -> pd.DataFrame:
+        return CLEANERS[table](raw_path, rejects_dir)
+
+    def aggregate_per_order(self, rows: pd.DataFrame, measures: dict[str, tuple], name: str) -> pd.DataFrame:
+        return enforce_schema(aggregate_per_order(rows, measures), name)
+
+    def fact_orders(
+        self,
+        orders: pd.DataFrame,
+        order_items_aggregated: pd.DataFrame,
+        payments_aggregated: pd.DataFrame,
+    ) -> pd.DataFrame:
+        return fact_orders(orders, order_items_aggregated, payments_aggregated, keys_dir=None)
+
+    def write(self, relation: pd.DataFrame, directory: Path, name: str, fmt: str) -> Path:
+        return write_table(relation, directory, name, fmt=fmt)
+
+    def to_pandas(self, relation: pd.DataFrame, name: str) -> pd.DataFrame:
+        return enforce_schema(relation, name)
@@ -0,0 +1,133 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from engines.base import ENGINES
+from ingestion.synthetic_olist import generate_olist_dataset
+from modeling.engine_fact_orders import engine_fact_orders
+from orchestration.metrics import capture_metrics
+from schemas.registry import get_schema
+from storage.tables import DEFAULT_FORMAT, read_table, write_table
+
+RAW_DATA_DIR = Path("data/raw/olist")
+REFERENCE_ENGINE = "pandas"
+# Relative tolerance on floats: engines may sum in a different order
+FLOAT_TOLERANCE = 1e-9
+
+# Output table -> layer it is written to
+PARITY_TABLES = {
+    "orders_cleaned": "processed",
+    "order_items_cleaned": "processed",
+    "payments_cleaned": "processed",
+    "order_items_aggregated": "modeled",
+    "payments_aggregated": "modeled",
+    "fact_orders": "modeled",
+}
+
+
+def run_engine(engine: str, raw_dir: Path, output_dir: Path, storage_format: str = DEFAULT_FORMAT) -> dict:
+    """
+    Run the orders / items / payments path on an engine into output_dir.
+
+    Returns
+    -------
+    dict
+        Reject counts per rule and NaT coercions per column reported by the engine.
+    """
+    with capture_metrics() as metrics:
+        fact_df = engine_fact_orders(
+            None,
+            raw_dir / get_schema("orders").file_name,
+            raw_dir / get_schema("order_items").file_name,
+            raw_dir / get_schema("payments").file_name,
+            engine=engine,
+            processed_dir=output_dir / "processed",
+            modeled_dir=output_dir / "modeled",
+            storage_format=storage_format,
+            keys_dir=output_dir / "keys",
+        )
+        write_table(fact_df, output_dir / "modeled", "fact_orders", fmt=storage_format)
+
+    return {"rejects": metrics.rejects, "nat_coercions": metrics.nat_coercions}
+
+def compare_outputs(reference_dir: Path, candidate_dir: Path, storage_format: str = DEFAULT_FORMAT) -> list[str]:
+    """
+    Compare the tables written by two engines, as loaded by the storage layer.
+
+    Rows, columns, values and dtypes (categories of categorical columns
+    included) must match; floats may differ by FLOAT_TOLERANCE.
+
+    Returns
+    -------
+    list[str]
+        One message per mismatching table.
+    """
+    mismatches = []
+    for name, layer in PARITY_TABLES.items():
+        expected = read_table(reference_dir / layer, name, fmt=storage_format)
+        actual = read_table(candidate_dir / layer, name, fmt=storage_format)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, rtol=FLOAT_TOLERANCE)
+        except AssertionError as exc:
+            mismatches.append(f"{name}: {exc}")
+
+    return mismatches
+
+def check_parity(
+    engines: list[str],
+    raw_dir: Path,
+    work_dir: Path,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Run the reference engine and each engine on the same raw data and compare them.
+
+    Returns
+    -------
+    list[str]
+        Mismatches (tables and reject / NaT counts); empty when every engine matches.
+    """
+    print(f"Running {REFERENCE_ENGINE} ...")
+    reference_counts = run_engine(REFERENCE_ENGINE, raw_dir, work_dir / REFERENCE_ENGINE, storage_format)
+
+    mismatches = []
+    for engine in engines:
+        print(f"Running {engine} ...")
+        counts = run_engine(engine, raw_dir, work_dir / engine, storage_format)
+        for counter, expected in reference_counts.items():
+            if counts[counter] != expected:
+                mismatches.append(f"{engine}: {counter} {counts[counter]} != {expected}")
+        mismatches += [
+            f"{engine}: {message}"
+            for message in compare_outputs(work_dir / REFERENCE_ENGINE, work_dir / engine, storage_format)
+        ]
+
+    return mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every engine produces the pandas engine's outputs.")
+    parser.add_argument("--engines", nargs="+", default=[name for name in ENGINES if name != REFERENCE_ENGINE],
+                        choices=sorted(ENGINES), help="Engines compared with the pandas engine.")
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DATA_DIR, help="Raw Olist CSVs to run on.")
+    parser.add_argument("--scale", type=float, default=None,
+                        help="Run on synthetic data of this scale factor instead of --raw-dir.")
+    parser.add_argument("--format", default=DEFAULT_FORMAT, help="Storage format of the compared tables.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="parity_") as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        raw_dir = args.raw_dir
+        if args.scale is not None:
+            raw_dir = generate_olist_dataset(tmp_dir / "raw", args.scale)
+
+        mismatches = check_parity(args.engines, raw_dir, tmp_dir, args.format)
+
+    if mismatches:
+        print("\n❌ Engine outputs differ:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print(f"\n✅ {', '.join(args.engines)} match{'es' if len(args.engines) == 1 else ''} the {REFERENCE_ENGINE} engine")
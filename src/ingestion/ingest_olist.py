@@ -1,8 +1,28 @@
+import argparse
 import os
+import shutil
 import subprocess
 from pathlib import Path
 
-def download_olist_dataset(download_dir: str):
+from ingestion.raw_cache import CHECKSUMS_FILE, verify_checksums, write_checksums
+
+def copy_from_mirror(mirror_dir: Path, download_path: Path):
+    """
+    Copy the raw CSVs (and their checksums file, if any) from a local mirror.
+    """
+    mirror_path = Path(mirror_dir)
+    csv_files = sorted(mirror_path.glob("*.csv"))
+    if not csv_files:
+        raise RuntimeError(f"No CSV files found in mirror {mirror_path}.")
+
+    # Checksums recorded by an earlier fetch don't describe this copy
+    (download_path / CHECKSUMS_FILE).unlink(missing_ok=True)
+    for file in [*csv_files, mirror_path / CHECKSUMS_FILE]:
+        if file.exists():
+            shutil.copy2(file, download_path / file.name)
+    print(f"Dataset copied from mirror {mirror_path} to {download_path}.")
+
+def download_olist_dataset(download_dir: str, mirror_dir: str | None = None):
 
 
     """
@@ -12,12 +32,18 @@ def download_olist_dataset(download_dir: str):
     ----------
     download_dir : str
         Path to the directory where the dataset will be saved.
+    mirror_dir : str | None
+        Local directory holding the CSVs, copied instead of downloading
+        (e.g. for offline runs).
 
     Notes
     -----
     This function wraps the Kaggle CLI. It ensures directories exist,
     avoids re-downloading if files are already present, and handles errors
-    in a controlled manner.
+    in a controlled manner. Fetched files are verified against the
+    checksums file (SHA256SUMS) the mirror publishes, if any, and the
+    checksums of what was fetched are then recorded in it. Only the fetch
+    is verified: the raw files may change later (e.g. daily deltas).
     """
 
 
@@ -33,6 +59,13 @@ def download_olist_dataset(download_dir: str):
         print(f"Dataset already exists in {download_dir}. Skipping download.")
         return
 
+    if mirror_dir is not None:
+        copy_from_mirror(Path(mirror_dir), download_path)
+        # The copied checksums file is the mirror's: the copies must match it
+        verify_checksums(download_path)
+        write_checksums(download_path)
+        return
+
     # Construct the Kaggle "download" command
     kaggle_command = [
         'kaggle',
@@ -65,6 +98,7 @@ def download_olist_dataset(download_dir: str):
         # 1. Check if CSVs are already at the top level (most likely case)
         top_level_csvs = list(download_path.glob("*.csv"))
         if top_level_csvs:
+            write_checksums(download_path)
             print("Top-level CSV structure is already correct. ingest_olist complete")
             return
 
@@ -89,11 +123,16 @@ def download_olist_dataset(download_dir: str):
             # If folder isn't empty, we ignore it; it doesn't affect CSV availability
             pass
 
+        write_checksums(download_path)
         print("Nested folder structure normalized. ingest_olist complete.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the raw Olist dataset.")
+    parser.add_argument("--mirror", default=None, help="Local directory to copy the CSVs from instead of Kaggle.")
+    args = parser.parse_args()
+
     target_dir = "data/raw/olist"
-    download_olist_dataset(target_dir)
+    download_olist_dataset(target_dir, args.mirror)
 
 
 
@@ -0,0 +1,140 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from orchestration.cache import hash_file
+from orchestration.metrics import capture_metrics
+from schemas.registry import RAW_SCHEMAS, read_raw_table
+from storage.columnar_raw import (
+    columnar_path,
+    file_signature,
+    load_cache_manifest,
+    save_cache_manifest,
+    write_columnar,
+)
+
+RAW_DATA_DIR = Path("data/raw/olist")
+# Checksums of the raw CSVs, in `sha256sum` format
+CHECKSUMS_FILE = "SHA256SUMS"
+
+
+def read_checksums(directory: Path) -> dict[str, str]:
+    """
+    Expected sha256 of each raw file, from the checksums file of a directory (empty if none).
+    """
+    path = Path(directory) / CHECKSUMS_FILE
+    if not path.exists():
+        return {}
+
+    checksums = {}
+    for line in path.read_text().splitlines():
+        if line.strip():
+            sha256, name = line.split(maxsplit=1)
+            checksums[name.lstrip("*")] = sha256
+    return checksums
+
+def write_checksums(directory: Path) -> Path:
+    """
+    Record the sha256 of every CSV of a directory in its checksums file (after each fetch).
+    """
+    directory = Path(directory)
+    lines = [f"{hash_file(path)}  {path.name}" for path in sorted(directory.glob("*.csv"))]
+    path = directory / CHECKSUMS_FILE
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+def verify_checksums(directory: Path):
+    """
+    Check freshly fetched CSVs against the checksums file published with them (if any).
+
+    Raises
+    ------
+    RuntimeError
+        If a listed file is missing or its content differs.
+    """
+    directory = Path(directory)
+    errors = []
+    for name, expected in read_checksums(directory).items():
+        path = directory / name
+        if not path.exists():
+            errors.append(f"{name}: missing")
+        elif hash_file(path) != expected:
+            errors.append(f"{name}: checksum mismatch")
+    if errors:
+        raise RuntimeError(f"Raw files in {directory} fail verification: {'; '.join(errors)}")
+
+def build_raw_cache(raw_dir: Path = RAW_DATA_DIR, max_workers: int = 4) -> list[str]:
+    """
+    Convert the raw CSVs into memory-mappable Arrow IPC files, once per content.
+
+    Each registered raw CSV is parsed with its schema (dtypes, timestamps)
+    and stored uncompressed in raw_dir/_columnar/, from where
+    schemas.registry.read_raw_table maps it zero-copy instead of parsing the
+    CSV. A CSV whose size and mtime are unchanged since its conversion is
+    skipped; otherwise it is hashed, and only converted again if its
+    content changed. Raw files are expected to change between runs (daily
+    deltas, refreshed downloads): checksums are only verified when the
+    files are fetched (see ingestion.ingest_olist).
+
+    Parameters
+    ----------
+    raw_dir : Path
+        Directory of the raw CSVs.
+    max_workers : int
+        CSVs converted concurrently.
+
+    Returns
+    -------
+    list[str]
+        Tables that were (re)converted.
+    """
+    raw_dir = Path(raw_dir)
+    manifest = load_cache_manifest(raw_dir)
+
+    changed = []
+    for table, schema in RAW_SCHEMAS.items():
+        csv_path = raw_dir / schema.file_name
+        if not csv_path.exists():
+            continue
+        entry = manifest.get(schema.file_name)
+        converted = entry is not None and columnar_path(csv_path).exists()
+        signature = file_signature(csv_path)
+        if converted and entry["signature"] == signature:
+            continue
+
+        sha256 = hash_file(csv_path)
+        if converted and entry["sha256"] == sha256:
+            # Same content (e.g. downloaded again): only the signature moved
+            entry["signature"] = signature
+            continue
+        changed.append((table, csv_path, sha256, signature))
+
+    def convert(item):
+        table, csv_path, sha256, signature = item
+        with capture_metrics() as metrics:
+            df = read_raw_table(csv_path, table, use_cache=False)
+        write_columnar(df, csv_path)
+        return csv_path.name, {
+            "table": table,
+            "sha256": sha256,
+            "signature": signature,
+            "rows": len(df),
+            "nat_coercions": metrics.nat_coercions,
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        manifest.update(executor.map(convert, changed))
+    save_cache_manifest(raw_dir, manifest)
+
+    converted_tables = [table for table, *_ in changed]
+    print(f"Raw columnar cache: {len(converted_tables)} table(s) converted, "
+          f"{len(manifest) - len(converted_tables)} unchanged.")
+    return converted_tables
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the raw Olist CSVs into memory-mappable Arrow files.")
+    parser.add_argument("--raw-dir", type=Path, default=RAW_DATA_DIR, help="Directory of the raw CSVs.")
+    parser.add_argument("--workers", type=int, default=4, help="CSVs converted concurrently.")
+    args = parser.parse_args()
+
+    build_raw_cache(args.raw_dir, args.workers)
@@ -0,0 +1,425 @@
+import argparse
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from ingestion.raw_cache import write_checksums
+from schemas.registry import RAW_SCHEMAS
+
+RAW_DATA_DIR = Path("data/raw/olist")
+
+# Row counts of the Kaggle dataset, i.e. scale factor 1
+BASE_ORDERS = 99_441
+BASE_PRODUCTS = 32_951
+BASE_SELLERS = 3_095
+BASE_ZIP_PREFIXES = 19_015
+BASE_GEOLOCATION_ROWS = 1_000_163
+
+# Orders are generated (and appended to the CSVs) in blocks of this size,
+# so memory stays flat whatever the scale factor
+ORDERS_PER_BLOCK = 500_000
+
+FIRST_PURCHASE = pd.Timestamp("2016-09-04")
+LAST_PURCHASE = pd.Timestamp("2018-10-17")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+MARKER_FILE = "synthetic.json"
+
+# State -> (share of customers, centroid latitude, centroid longitude, cities)
+STATES = {
+    "SP": (0.420, -23.0, -47.5, ["sao paulo", "campinas", "guarulhos", "santos", "sorocaba", "ribeirao preto"]),
+    "RJ": (0.129, -22.6, -43.2, ["rio de janeiro", "niteroi", "nova iguacu", "duque de caxias"]),
+    "MG": (0.117, -19.5, -44.5, ["belo horizonte", "uberlandia", "contagem", "juiz de fora"]),
+    "RS": (0.055, -29.9, -51.8, ["porto alegre", "caxias do sul", "pelotas"]),
+    "PR": (0.051, -25.0, -50.9, ["curitiba", "londrina", "maringa"]),
+    "SC": (0.037, -27.2, -49.4, ["florianopolis", "joinville", "blumenau"]),
+    "BA": (0.034, -12.9, -40.3, ["salvador", "feira de santana"]),
+    "DF": (0.022, -15.8, -47.9, ["brasilia"]),
+    "ES": (0.020, -20.2, -40.5, ["vitoria", "vila velha"]),
+    "GO": (0.020, -16.6, -49.3, ["goiania", "anapolis"]),
+    "PE": (0.017, -8.2, -35.6, ["recife", "olinda"]),
+    "CE": (0.013, -3.9, -38.8, ["fortaleza"]),
+    "PA": (0.010, -1.9, -48.6, ["belem"]),
+    "MT": (0.009, -15.1, -56.1, ["cuiaba"]),
+    "MA": (0.008, -3.6, -44.6, ["sao luis"]),
+    "MS": (0.007, -20.6, -54.7, ["campo grande"]),
+    "PB": (0.005, -7.2, -35.6, ["joao pessoa"]),
+    "PI": (0.005, -5.4, -42.6, ["teresina"]),
+    "RN": (0.005, -5.8, -35.6, ["natal"]),
+    "AL": (0.004, -9.6, -36.0, ["maceio"]),
+    "SE": (0.004, -10.9, -37.2, ["aracaju"]),
+    "TO": (0.003, -10.2, -48.3, ["palmas"]),
+    "RO": (0.003, -9.8, -63.1, ["porto velho"]),
+    "AM": (0.002, -3.2, -60.0, ["manaus"]),
+    "AC": (0.001, -9.9, -67.8, ["rio branco"]),
+    "AP": (0.001, 0.3, -51.3, ["macapa"]),
+    "RR": (0.001, 2.6, -60.7, ["boa vista"]),
+}
+
+ORDER_STATUSES = {
+    "delivered": 0.970, "shipped": 0.011, "canceled": 0.006, "unavailable": 0.006,
+    "invoiced": 0.003, "processing": 0.003, "created": 0.0005, "approved": 0.0005,
+}
+PAYMENT_TYPES = {"credit_card": 0.74, "boleto": 0.19, "voucher": 0.055, "debit_card": 0.015}
+# Number of items / payments of an order: value -> probability
+ITEMS_PER_ORDER = {1: 0.900, 2: 0.076, 3: 0.014, 4: 0.006, 5: 0.004}
+PAYMENTS_PER_ORDER = {1: 0.970, 2: 0.022, 3: 0.005, 4: 0.003}
+N_CATEGORIES = 73
+N_TRANSLATED_CATEGORIES = 71  # two categories have no English translation, as in the Kaggle data
+
+# Share of dirty rows, per cleaning rule they should trip
+DIRTY_ROWS = {
+    "orders_approved_before_purchase": 0.001,
+    "orders_delivered_before_carrier": 0.013,
+    "orders_delivered_before_purchase": 0.0005,
+    "orders_missing_approval": 0.0016,
+    "orders_without_items": 0.008,
+    "orders_without_payments": 0.0005,
+    "items_negative_price": 0.0005,
+    "items_negative_freight": 0.0005,
+    "payments_negative_value": 0.0005,
+    "payments_negative_installments": 0.0005,
+    "payments_not_defined": 0.0005,
+    "payments_unnormalized_type": 0.005,
+    "products_missing_category": 0.0185,
+    "products_missing_dimensions": 0.001,
+    "products_zero_weight": 0.001,
+    "customers_unnormalized_text": 0.01,
+}
+
+
+def _hex_ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    Random 32-character lowercase hex identifiers, built without a Python loop.
+    """
+    nibbles = rng.integers(0, 16, size=(n, 32), dtype=np.uint8)
+    ascii_codes = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)[nibbles]
+    return ascii_codes.view("S32").ravel().astype(str)
+
+def _choice(rng: np.random.Generator, distribution: dict, n: int) -> np.ndarray:
+    """
+    Draw n values from a {value: probability} mapping (probabilities are normalized).
+    """
+    values = np.array(list(distribution))
+    weights = np.array(list(distribution.values()), dtype=float)
+    return values[rng.choice(len(values), size=n, p=weights / weights.sum())]
+
+def _flag(rng: np.random.Generator, rule: str, n: int) -> np.ndarray:
+    """
+    Boolean mask of the rows made dirty for a rule.
+    """
+    return rng.random(n) < DIRTY_ROWS[rule]
+
+def _scaled(base: int, scale_factor: float) -> int:
+    return max(1, round(base * scale_factor))
+
+def _write_block(df: pd.DataFrame, path: Path, first_block: bool):
+    df.to_csv(path, mode="w" if first_block else "a", header=first_block, index=False, date_format=DATE_FORMAT)
+
+def _zip_prefixes(rng: np.random.Generator, n_prefixes: int) -> pd.DataFrame:
+    """
+    Zip code prefixes with their state, city and centroid.
+    """
+    states = list(STATES)
+    state_weights = np.array([STATES[state][0] for state in states])
+    prefix = np.sort(rng.choice(np.arange(1_000, 100_000), size=n_prefixes, replace=False)).astype(np.int32)
+    state_codes = rng.choice(len(states), size=n_prefixes, p=state_weights / state_weights.sum())
+
+    state = np.array(states)[state_codes]
+    lat = np.array([STATES[s][1] for s in states])[state_codes] + rng.normal(0, 1.5, n_prefixes)
+    lng = np.array([STATES[s][2] for s in states])[state_codes] + rng.normal(0, 1.5, n_prefixes)
+    city = np.array([
+        STATES[s][3][i % len(STATES[s][3])]
+        for s, i in zip(state, rng.integers(0, 1_000, n_prefixes))
+    ])
+
+    return pd.DataFrame({"prefix": prefix, "state": state, "city": city, "lat": lat, "lng": lng})
+
+def _geolocation(rng: np.random.Generator, prefixes: pd.DataFrame, n_rows: int) -> pd.DataFrame:
+    """
+    Geolocation points scattered around the zip prefix centroids.
+    """
+    rows = np.concatenate([np.arange(len(prefixes)), rng.integers(0, len(prefixes), max(0, n_rows - len(prefixes)))])
+    points = prefixes.iloc[np.sort(rows)].reset_index(drop=True)
+
+    lat = points["lat"].to_numpy() + rng.normal(0, 0.02, len(points))
+    lng = points["lng"].to_numpy() + rng.normal(0, 0.02, len(points))
+    # A few points outside Brazil, as in the Kaggle data
+    outliers = rng.random(len(points)) < 0.0001
+    lat[outliers] = rng.uniform(20, 45, outliers.sum())
+    lng[outliers] = rng.uniform(-10, 10, outliers.sum())
+
+    return pd.DataFrame({
+        "geolocation_zip_code_prefix": points["prefix"],
+        "geolocation_lat": lat,
+        "geolocation_lng": lng,
+        "geolocation_city": points["city"],
+        "geolocation_state": points["state"],
+    })
+
+def _products(rng: np.random.Generator, n_products: int) -> pd.DataFrame:
+    """
+    Products with a skewed category distribution and some dirty rows.
+    """
+    category_weights = 1.0 / np.arange(1, N_CATEGORIES + 1)
+    categories = np.array([f"categoria_{i:02d}" for i in range(N_CATEGORIES)], dtype=object)
+    category = categories[rng.choice(N_CATEGORIES, size=n_products, p=category_weights / category_weights.sum())]
+    category[_flag(rng, "products_missing_category", n_products)] = None
+
+    df = pd.DataFrame({
+        "product_id": _hex_ids(rng, n_products),
+        "product_category_name": category,
+        "product_name_lenght": rng.integers(5, 77, n_products).astype(float),
+        "product_description_lenght": rng.integers(4, 4_000, n_products).astype(float),
+        "product_photos_qty": rng.integers(1, 8, n_products).astype(float),
+        "product_weight_g": np.round(rng.lognormal(6.5, 1.2, n_products)),
+        "product_length_cm": rng.integers(7, 105, n_products).astype(float),
+        "product_height_cm": rng.integers(2, 105, n_products).astype(float),
+        "product_width_cm": rng.integers(6, 118, n_products).astype(float),
+    })
+    # Products without a category have no metadata either
+    df.loc[df["product_category_name"].isna(), ["product_name_lenght", "product_description_lenght", "product_photos_qty"]] = np.nan
+    df.loc[_flag(rng, "products_missing_dimensions", n_products), ["product_weight_g", "product_length_cm"]] = np.nan
+    df.loc[_flag(rng, "products_zero_weight", n_products), "product_weight_g"] = 0.0
+
+    return df
+
+def _category_translation() -> pd.DataFrame:
+    return pd.DataFrame({
+        "product_category_name": [f"categoria_{i:02d}" for i in range(N_TRANSLATED_CATEGORIES)],
+        "product_category_name_english": [f"category_{i:02d}" for i in range(N_TRANSLATED_CATEGORIES)],
+    })
+
+def _sellers(rng: np.random.Generator, prefixes: pd.DataFrame, n_sellers: int) -> pd.DataFrame:
+    location = prefixes.iloc[rng.integers(0, len(prefixes), n_sellers)]
+    return pd.DataFrame({
+        "seller_id": _hex_ids(rng, n_sellers),
+        "seller_zip_code_prefix": location["prefix"].to_numpy(),
+        "seller_city": location["city"].to_numpy(),
+        "seller_state": location["state"].to_numpy(),
+    })
+
+def _purchase_timestamps(rng: np.random.Generator, n: int) -> pd.DatetimeIndex:
+    """
+    Purchase timestamps with a linearly growing order volume, as in the Kaggle data.
+    """
+    span_seconds = (LAST_PURCHASE - FIRST_PURCHASE).total_seconds()
+    offsets = np.sqrt(rng.random(n)) * span_seconds
+    return FIRST_PURCHASE + pd.to_timedelta(offsets.astype(np.int64), unit="s")
+
+def _order_block(
+    rng: np.random.Generator,
+    n_orders: int,
+    prefixes: pd.DataFrame,
+    product_ids: np.ndarray,
+    seller_ids: np.ndarray,
+    unique_customer_ids: np.ndarray,
+) -> dict[str, pd.DataFrame]:
+    """
+    Generate a block of orders with their customers, items, payments and reviews.
+    """
+    order_id = _hex_ids(rng, n_orders)
+    customer_id = _hex_ids(rng, n_orders)
+
+    # Customers: one row per order, repeat buyers share a customer_unique_id
+    location = prefixes.iloc[rng.integers(0, len(prefixes), n_orders)]
+    city = location["city"].to_numpy().astype(object)
+    state = location["state"].to_numpy().astype(object)
+    unnormalized = _flag(rng, "customers_unnormalized_text", n_orders)
+    city[unnormalized] = [f" {value.title()} " for value in city[unnormalized]]
+    state[unnormalized] = [value.lower() for value in state[unnormalized]]
+    customers = pd.DataFrame({
+        "customer_id": customer_id,
+        "customer_unique_id": unique_customer_ids[rng.integers(0, len(unique_customer_ids), n_orders)],
+        "customer_zip_code_prefix": location["prefix"].to_numpy(),
+        "customer_city": city,
+        "customer_state": state,
+    })
+
+    # Orders: lifecycle timestamps, then the dirty date sequences
+    purchase = _purchase_timestamps(rng, n_orders)
+    approved = purchase + pd.to_timedelta(rng.exponential(10 * 3600, n_orders).astype(np.int64), unit="s")
+    carrier = approved + pd.to_timedelta(rng.gamma(2.0, 1.5 * 86400, n_orders).astype(np.int64), unit="s")
+    delivered = carrier + pd.to_timedelta(rng.gamma(3.0, 3.0 * 86400, n_orders).astype(np.int64), unit="s")
+    estimated = purchase.normalize() + pd.to_timedelta(rng.integers(10, 40, n_orders), unit="D")
+
+    status = _choice(rng, ORDER_STATUSES, n_orders)
+    approved = approved.where(~np.isin(status, ["created"]))
+    carrier = carrier.where(np.isin(status, ["delivered", "shipped"]))
+    delivered = delivered.where(status == "delivered")
+
+    dirty = _flag(rng, "orders_approved_before_purchase", n_orders)
+    approved = approved.where(~dirty, purchase - pd.Timedelta(hours=2))
+    dirty = _flag(rng, "orders_delivered_before_carrier", n_orders) & (status == "delivered")
+    delivered = delivered.where(~dirty, carrier - pd.Timedelta(days=1))
+    dirty = _flag(rng, "orders_delivered_before_purchase", n_orders) & (status == "delivered")
+    carrier = carrier.where(~dirty, purchase - pd.Timedelta(days=3))
+    delivered = delivered.where(~dirty, purchase - pd.Timedelta(days=1))
+    approved = approved.where(~_flag(rng, "orders_missing_approval", n_orders))
+
+    orders = pd.DataFrame({
+        "order_id": order_id,
+        "customer_id": customer_id,
+        "order_status": status,
+        "order_purchase_timestamp": purchase,
+        "order_approved_at": approved,
+        "order_delivered_carrier_date": carrier,
+        "order_delivered_customer_date": delivered,
+        "order_estimated_delivery_date": estimated,
+    })
+
+    # Items: 1..5 per order, none for some unavailable / canceled orders
+    items_per_order = _choice(rng, ITEMS_PER_ORDER, n_orders)
+    items_per_order[_flag(rng, "orders_without_items", n_orders) & (status != "delivered")] = 0
+    item_order = np.repeat(np.arange(n_orders), items_per_order)
+    n_items = len(item_order)
+    # order_item_id restarts at 1 for every order
+    item_number = np.arange(n_items) - np.repeat(np.cumsum(items_per_order) - items_per_order, items_per_order) + 1
+
+    price = np.round(rng.lognormal(4.3, 0.9, n_items), 2)
+    freight = np.round(rng.gamma(2.0, 10.0, n_items), 2)
+    price[_flag(rng, "items_negative_price", n_items)] *= -1
+    freight[_flag(rng, "items_negative_freight", n_items)] *= -1
+    items = pd.DataFrame({
+        "order_id": order_id[item_order],
+        "order_item_id": item_number,
+        "product_id": product_ids[rng.integers(0, len(product_ids), n_items)],
+        "seller_id": seller_ids[rng.integers(0, len(seller_ids), n_items)],
+        "shipping_limit_date": purchase[item_order] + pd.Timedelta(days=6),
+        "price": price,
+        "freight_value": freight,
+    })
+
+    # Payments: the order total split over 1..4 payments
+    payments_per_order = _choice(rng, PAYMENTS_PER_ORDER, n_orders)
+    payments_per_order[_flag(rng, "orders_without_payments", n_orders)] = 0
+    payment_order = np.repeat(np.arange(n_orders), payments_per_order)
+    n_payments = len(payment_order)
+    sequential = np.arange(n_payments) - np.repeat(np.cumsum(payments_per_order) - payments_per_order, payments_per_order) + 1
+
+    order_total = np.bincount(item_order, weights=np.abs(price) + np.abs(freight), minlength=n_orders)
+    order_total = np.where(order_total > 0, order_total, np.round(rng.lognormal(4.5, 0.8, n_orders), 2))
+    shares = rng.random(n_payments) + 0.1
+    shares /= np.bincount(payment_order, weights=shares, minlength=n_orders)[payment_order]
+    value = np.round(order_total[payment_order] * shares, 2)
+
+    payment_type = _choice(rng, PAYMENT_TYPES, n_payments).astype(object)
+    # Extra payments of an order are mostly vouchers
+    payment_type[(sequential > 1) & (rng.random(n_payments) < 0.8)] = "voucher"
+    installments = np.where(payment_type == "credit_card", rng.integers(1, 11, n_payments), 1)
+
+    value[_flag(rng, "payments_negative_value", n_payments)] *= -1
+    installments[_flag(rng, "payments_negative_installments", n_payments)] = -1
+    payment_type[_flag(rng, "payments_not_defined", n_payments)] = "not_defined"
+    unnormalized = _flag(rng, "payments_unnormalized_type", n_payments)
+    payment_type[unnormalized] = [f" {value.title()} " for value in payment_type[unnormalized]]
+    payments = pd.DataFrame({
+        "order_id": order_id[payment_order],
+        "payment_sequential": sequential,
+        "payment_type": payment_type,
+        "payment_installments": installments,
+        "payment_value": value,
+    })
+
+    # Reviews: one per order, created the day after delivery (or the estimate)
+    review_day = delivered.where(delivered.notna(), estimated).normalize() + pd.Timedelta(days=1)
+    reviews = pd.DataFrame({
+        "review_id": _hex_ids(rng, n_orders),
+        "order_id": order_id,
+        "review_score": _choice(rng, {5: 0.58, 4: 0.19, 3: 0.08, 2: 0.03, 1: 0.12}, n_orders),
+        "review_comment_title": None,
+        "review_comment_message": None,
+        "review_creation_date": review_day,
+        "review_answer_timestamp": review_day + pd.to_timedelta(rng.integers(3_600, 5 * 86_400, n_orders), unit="s"),
+    })
+
+    return {
+        "customers": customers,
+        "orders": orders,
+        "order_items": items,
+        "payments": payments,
+        "order_reviews": reviews,
+    }
+
+def generate_olist_dataset(output_dir: Path = RAW_DATA_DIR, scale_factor: float = 1.0, seed: int = 0) -> Path:
+    """
+    Write a synthetic, Olist-shaped raw dataset at a given scale.
+
+    Every raw CSV of the Kaggle dataset is generated with the same columns
+    and roughly the same distributions, with referential integrity between
+    orders, customers, items, payments, products and sellers. A small share
+    of rows is deliberately dirty (see DIRTY_ROWS) so the cleaning rules
+    have something to reject. Orders are generated in blocks, so memory
+    does not grow with the scale factor. The output is deterministic for a
+    given (scale_factor, seed), and nothing is downloaded.
+
+    Parameters
+    ----------
+    output_dir : Path
+        Directory of the raw CSV files.
+    scale_factor : float
+        1 generates as many orders as the Kaggle dataset (~100k), 10 ten
+        times as many, etc. Zip prefixes and geolocation points describe
+        Brazil, not the order volume, so they only scale down.
+    seed : int
+        Seed of the random generator.
+
+    Returns
+    -------
+    Path
+        output_dir.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    geo_scale = min(scale_factor, 1.0)
+
+    prefixes = _zip_prefixes(rng, _scaled(BASE_ZIP_PREFIXES, geo_scale))
+    _write_block(_geolocation(rng, prefixes, _scaled(BASE_GEOLOCATION_ROWS, geo_scale)),
+                 output_dir / RAW_SCHEMAS["geolocation"].file_name, True)
+
+    products = _products(rng, _scaled(BASE_PRODUCTS, scale_factor))
+    _write_block(products, output_dir / RAW_SCHEMAS["products"].file_name, True)
+    _write_block(_category_translation(), output_dir / RAW_SCHEMAS["category_translation"].file_name, True)
+
+    sellers = _sellers(rng, prefixes, _scaled(BASE_SELLERS, scale_factor))
+    _write_block(sellers, output_dir / RAW_SCHEMAS["sellers"].file_name, True)
+
+    n_orders = _scaled(BASE_ORDERS, scale_factor)
+    # ~3% of the customers order more than once
+    unique_customer_ids = _hex_ids(rng, max(1, round(n_orders * 0.966)))
+    product_ids = products["product_id"].to_numpy()
+    seller_ids = sellers["seller_id"].to_numpy()
+
+    for block_start in range(0, n_orders, ORDERS_PER_BLOCK):
+        block = _order_block(
+            rng, min(ORDERS_PER_BLOCK, n_orders - block_start),
+            prefixes, product_ids, seller_ids, unique_customer_ids,
+        )
+        for table, df in block.items():
+            _write_block(df, output_dir / RAW_SCHEMAS[table].file_name, block_start == 0)
+
+    # A generated dataset is published like a download: with its checksums
+    write_checksums(output_dir)
+    (output_dir / MARKER_FILE).write_text(json.dumps({"scale_factor": scale_factor, "seed": seed}))
+    print(f"Synthetic Olist dataset (scale factor {scale_factor}, {n_orders} orders) written to {output_dir}.")
+    return output_dir
+
+def is_generated(output_dir: Path, scale_factor: float, seed: int = 0) -> bool:
+    """
+    Whether output_dir already holds the synthetic dataset for these settings.
+    """
+    marker = Path(output_dir) / MARKER_FILE
+    if not marker.exists():
+        return False
+    return json.loads(marker.read_text()) == {"scale_factor": scale_factor, "seed": seed}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Olist-shaped raw dataset (offline).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale factor (1 = size of the Kaggle dataset).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--output-dir", type=Path, default=RAW_DATA_DIR, help="Directory of the raw CSV files.")
+    args = parser.parse_args()
+
+    generate_olist_dataset(args.output_dir, args.scale, args.seed)
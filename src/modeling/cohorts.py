@@ -0,0 +1,222 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from schemas.registry import enforce_schema, get_schema
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, write_table
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Optional breakdowns of the cohort table -> their dimension column
+COHORT_VARIANTS = {
+    "state": "customer_state",
+    "category": "product_category_name_english",
+}
+ORDER_ITEMS_COLUMNS = ["order_id", "product_id", "price"]
+
+def _months(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Calendar month of datetime values, as months since 1970-01.
+    """
+    return timestamps.astype("datetime64[M]").astype("int64")
+
+def cohort_cells(
+    entities: np.ndarray,
+    months: np.ndarray,
+    revenue: np.ndarray,
+    segments: pd.Series | None = None,
+) -> pd.DataFrame:
+    """
+    Retention matrix of acquisition cohorts, from activity rows, with array primitives.
+
+    An entity (e.g. a customer) belongs to the cohort of the month of its
+    first row; each of its rows falls in the cell (cohort, months since the
+    first). Entities and cells are integer codes (pd.factorize, arithmetic
+    on the month numbers), so the first month of every entity is one
+    np.minimum.at, and the distinct entities and revenue of every cell are
+    np.bincount calls over the cell codes. No pivot table is built.
+
+    Parameters
+    ----------
+    entities : np.ndarray
+        Entity of each row.
+    months : np.ndarray
+        Month of each row (see _months).
+    revenue : np.ndarray
+        Revenue of each row.
+    segments : pd.Series | None
+        Segment of each row (e.g. a state). An entity belongs to the
+        segment of (one of) its first-month rows, so cohorts are split by
+        segment at acquisition.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per non-empty cell: segment (when given), cohort_month,
+        months_since_first, cohort_size, active, revenue.
+    """
+    entity_codes, unique_entities = pd.factorize(entities)
+    n_entities = len(unique_entities)
+    if segments is None:
+        segment_codes, segment_labels = np.zeros(len(entity_codes), dtype="int64"), None
+    else:
+        segment_codes, segment_labels = pd.factorize(segments, sort=True)
+        # Missing segments get the last code
+        segment_codes = np.where(segment_codes < 0, len(segment_labels), segment_codes)
+    n_segments = int(segment_codes.max()) + 1 if len(segment_codes) else 1
+
+    first_months = np.full(n_entities, np.iinfo("int64").max)
+    np.minimum.at(first_months, entity_codes, months)
+    ages = months - first_months[entity_codes]
+    entity_segments = np.zeros(n_entities, dtype="int64")
+    first_rows = ages == 0
+    entity_segments[entity_codes[first_rows]] = segment_codes[first_rows]
+
+    first_month = int(months.min()) if len(months) else 0
+    n_months = int(months.max()) - first_month + 1 if len(months) else 1
+    n_cells = n_segments * n_months * n_months
+
+    def cell_codes(entity_codes, ages):
+        cohorts = first_months[entity_codes] - first_month
+        return (entity_segments[entity_codes] * n_months + cohorts) * n_months + ages
+
+    # An entity counts once per cell: distinct (entity, age) pairs
+    pairs = np.unique(entity_codes.astype("int64") * n_months + ages)
+    active = np.bincount(cell_codes(pairs // n_months, pairs % n_months), minlength=n_cells)
+    cell_revenue = np.bincount(cell_codes(entity_codes, ages), weights=revenue, minlength=n_cells)
+
+    cells = np.flatnonzero(active)
+    cell_ages = cells % n_months
+    cohort_codes = cells // n_months
+    cells_df = pd.DataFrame({
+        "cohort_month": np.datetime_as_string(
+            (cohort_codes % n_months + first_month).astype("datetime64[M]"), unit="M"
+        ),
+        "months_since_first": cell_ages,
+        # Every entity is active in its first month: the cohort size is the age-0 cell
+        "cohort_size": active[cells - cell_ages],
+        "active": active[cells],
+        "revenue": cell_revenue[cells],
+    })
+    if segment_labels is not None:
+        labels = np.asarray(segment_labels, dtype=object)
+        segment_values = np.append(labels, None)[cohort_codes // n_months]
+        cells_df.insert(0, "segment", segment_values)
+    return cells_df
+
+def _cohort_table(cells_df: pd.DataFrame, name: str, dimension: str | None = None) -> pd.DataFrame:
+    """
+    Lay cohort cells out as a registered cohort table.
+    """
+    df = cells_df.rename(columns={
+        "segment": dimension,
+        "cohort_size": "cohort_customers",
+        "active": "active_customers",
+    })
+    df["retention_rate"] = df["active_customers"] / df["cohort_customers"]
+    return enforce_schema(df, name)[get_schema(name).column_names]
+
+def cohort_tables(
+    fact_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    order_items_df: pd.DataFrame | None = None,
+    dim_products: pd.DataFrame | None = None,
+    variants: tuple[str, ...] = tuple(COHORT_VARIANTS),
+) -> dict[str, pd.DataFrame]:
+    """
+    Monthly acquisition-cohort retention of real customers (customer_unique_key).
+
+    A customer's cohort is the month of their first order in fact_orders;
+    a cohort cell counts the customers of the cohort active (with an order)
+    n months later, and their revenue (items value). Variants:
+      "state"    : cohorts split by the customer's state at their first order
+      "category" : per English product category, a customer's cohort is the
+                   month they first bought the category, activity and revenue
+                   are their items of the category (needs order_items_df and
+                   dim_products)
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        Table name -> cohort table (cohort_retention, cohort_retention_by_<variant>).
+    """
+    fact_df = fact_df[fact_df["order_purchase_timestamp"].notna().to_numpy()]
+    customer_positions = pd.Index(dim_customers["customer_key"]).get_indexer(fact_df["customer_key"])
+    known = customer_positions >= 0
+    fact_df, customer_positions = fact_df[known], customer_positions[known]
+
+    customers = dim_customers["customer_unique_key"].to_numpy()[customer_positions]
+    months = _months(fact_df["order_purchase_timestamp"].to_numpy())
+    revenue = fact_df["order_items_total_value"].to_numpy(dtype="float64")
+
+    tables = {"cohort_retention": _cohort_table(cohort_cells(customers, months, revenue), "cohort_retention")}
+
+    if "state" in variants:
+        states = dim_customers["customer_state"].array.take(customer_positions)
+        tables["cohort_retention_by_state"] = _cohort_table(
+            cohort_cells(customers, months, revenue, pd.Series(states)),
+            "cohort_retention_by_state", COHORT_VARIANTS["state"],
+        )
+
+    if "category" in variants:
+        if order_items_df is None or dim_products is None:
+            raise ValueError("The category cohorts need the cleaned order items and the product dimension.")
+        # Customer and month of the order of every item
+        order_positions = pd.Index(fact_df["order_id"]).get_indexer(order_items_df["order_id"])
+        product_positions = pd.Index(dim_products["product_id"]).get_indexer(order_items_df["product_id"])
+        kept = (order_positions >= 0) & (product_positions >= 0)
+        order_positions, product_positions = order_positions[kept], product_positions[kept]
+
+        categories = dim_products["product_category_name_english"].array.take(product_positions)
+        category_codes, category_labels = pd.factorize(categories)
+        # One entity per (customer, category)
+        entities = customers[order_positions].astype("int64") * max(len(category_labels), 1) + category_codes
+        tables["cohort_retention_by_category"] = _cohort_table(
+            cohort_cells(
+                entities, months[order_positions],
+                order_items_df["price"].to_numpy(dtype="float64")[kept], pd.Series(categories),
+            ),
+            "cohort_retention_by_category", COHORT_VARIANTS["category"],
+        )
+
+    return tables
+
+def build_cohort_tables(
+    fact_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    dim_products: pd.DataFrame,
+    variants: tuple[str, ...] = tuple(COHORT_VARIANTS),
+    processed_dir: Path = PROCESSED_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Rebuild the cohort tables (see cohort_tables) and write them to modeled_dir.
+
+    The cleaned items are read back from processed_dir, only with the
+    columns the category cohorts need, and only when that variant is asked for.
+
+    Returns
+    -------
+    list[str]
+        Names of the written tables.
+    """
+    order_items = None
+    if "category" in variants:
+        order_items = read_concurrently({
+            "order_items": table_read(processed_dir, "order_items_cleaned", columns=ORDER_ITEMS_COLUMNS,
+                                      fmt=storage_format),
+        })["order_items"]
+
+    tables = cohort_tables(fact_df, dim_customers, order_items, dim_products, variants)
+    for name, df in tables.items():
+        write_table(df, modeled_dir, name, fmt=storage_format)
+    return list(tables)
+
+if __name__ == "__main__":
+    modeled = read_concurrently({
+        name: table_read(MODELED_DATA_DIR, name) for name in ("fact_orders", "dim_customers", "dim_products")
+    })
+    build_cohort_tables(modeled["fact_orders"], modeled["dim_customers"], modeled["dim_products"])
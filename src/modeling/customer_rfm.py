@@ -0,0 +1,293 @@
+from pathlib import Path
+from typing import Callable
+import numpy as np
+import pandas as pd
+
+from schemas.registry import enforce_schema
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, read_table, table_path, write_table
+
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Scores run from 1 to RFM_SCORES (quintiles)
+RFM_SCORES = 5
+# Segment of each (recency score, frequency score) pair: SEGMENT_GRID[r - 1][f - 1]
+SEGMENT_GRID = (
+    ("hibernating", "hibernating", "at_risk", "at_risk", "cant_lose"),
+    ("hibernating", "hibernating", "at_risk", "at_risk", "cant_lose"),
+    ("about_to_sleep", "about_to_sleep", "need_attention", "loyal_customers", "loyal_customers"),
+    ("promising", "potential_loyalists", "potential_loyalists", "loyal_customers", "loyal_customers"),
+    ("new_customers", "potential_loyalists", "potential_loyalists", "champions", "champions"),
+)
+SEGMENTS = sorted({segment for row in SEGMENT_GRID for segment in row})
+# Running state of a customer, enough to update it from order changes and score it
+STATE_COLUMNS = [
+    "customer_unique_key",
+    "first_purchase_timestamp",
+    "last_purchase_timestamp",
+    "frequency",
+    "monetary",
+]
+# Columns of fact_orders the RFM state is computed from
+ORDER_COLUMNS = ["customer_key", "order_purchase_timestamp", "order_payment_total"]
+
+def _customer_orders(fact_df: pd.DataFrame, dim_customers: pd.DataFrame) -> pd.DataFrame:
+    """
+    Purchase timestamp and payment total of fact orders rows, with their customer_unique_key.
+
+    Orders without a purchase timestamp or a known customer are left out.
+    """
+    positions = pd.Index(dim_customers["customer_key"]).get_indexer(fact_df["customer_key"])
+    timestamps = fact_df["order_purchase_timestamp"].to_numpy(dtype="datetime64[ns]")
+    kept = (positions >= 0) & ~np.isnat(timestamps)
+    return pd.DataFrame({
+        "customer_unique_key": dim_customers["customer_unique_key"].to_numpy()[positions[kept]],
+        "order_purchase_timestamp": timestamps[kept],
+        "monetary": fact_df["order_payment_total"].to_numpy(dtype="float64")[kept],
+    })
+
+def _reduce_by_customer(rows: pd.DataFrame, signs: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    Per-customer order count, payment total and first / last purchase, with sort-based reductions.
+
+    Rows are sorted by customer once; every measure is then a single
+    ufunc.reduceat over the group boundaries. With signs, rows count +1
+    (added orders) or -1 (removed orders): counts and totals are net
+    changes, and first / last purchase only cover the added rows (NaT when
+    a customer has none). removed_first / removed_last hold the extremes of
+    the removed rows.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per customer, sorted by customer_unique_key.
+    """
+    if signs is None:
+        signs = np.ones(len(rows), dtype="int64")
+    keys = rows["customer_unique_key"].to_numpy()
+    # The order of the rows within a customer does not matter: no stable sort needed
+    order = np.argsort(keys)
+    keys, signs = keys[order], signs[order]
+    timestamps = rows["order_purchase_timestamp"].to_numpy(dtype="datetime64[ns]")[order].view("int64")
+    monetary = rows["monetary"].to_numpy(dtype="float64")[order]
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype="int64")
+    if len(starts) == 0:
+        empty_times = np.empty(0, dtype="datetime64[ns]")
+        return pd.DataFrame({
+            "customer_unique_key": keys, "first_purchase_timestamp": empty_times,
+            "last_purchase_timestamp": empty_times, "frequency": np.empty(0, dtype="int64"),
+            "monetary": np.empty(0), "removed_first": empty_times, "removed_last": empty_times,
+        })
+
+    added = signs > 0
+    never, always = np.iinfo("int64").max, np.iinfo("int64").min  # always == NaT
+    extremes = {
+        "first_purchase_timestamp": np.minimum.reduceat(np.where(added, timestamps, never), starts),
+        "last_purchase_timestamp": np.maximum.reduceat(np.where(added, timestamps, always), starts),
+        "removed_first": np.minimum.reduceat(np.where(added, never, timestamps), starts),
+        "removed_last": np.maximum.reduceat(np.where(added, always, timestamps), starts),
+    }
+    result = {
+        "customer_unique_key": keys[starts],
+        "frequency": np.add.reduceat(signs, starts),
+        "monetary": np.add.reduceat(signs * monetary, starts),
+    }
+    for name, values in extremes.items():
+        result[name] = np.where(values == never, always, values).view("datetime64[ns]")
+
+    return pd.DataFrame(result)[[*STATE_COLUMNS, "removed_first", "removed_last"]]
+
+def _quantile_scores(values: np.ndarray) -> np.ndarray:
+    """
+    Score from 1 to RFM_SCORES by quantile of each value among all values (higher is better).
+
+    The score comes from the share of values strictly below, so tied values
+    share the score of their lowest rank. It takes one argsort: in sorted
+    order, the number of values below is the position where the run of
+    equal values starts.
+    """
+    order = np.argsort(values)
+    sorted_values = values[order]
+    positions = np.arange(len(values))
+    run_starts = np.r_[True, sorted_values[1:] != sorted_values[:-1]] if len(values) else np.empty(0, dtype=bool)
+    below = np.empty(len(values), dtype="int64")
+    below[order] = np.maximum.accumulate(np.where(run_starts, positions, 0)) if len(values) else positions
+    return (1 + below * RFM_SCORES // max(len(values), 1)).astype("int8")
+
+def score_rfm(state: pd.DataFrame, as_of: pd.Timestamp | None = None) -> pd.DataFrame:
+    """
+    Recency, frequency and monetary scores and segment of every customer.
+
+    Parameters
+    ----------
+    state : pd.DataFrame
+        Running state of the customers (STATE_COLUMNS).
+    as_of : pd.Timestamp | None
+        Date the recency is measured at (default: the day after the last purchase).
+
+    Returns
+    -------
+    pd.DataFrame
+        customer_rfm rows, sorted by customer_unique_key.
+    """
+    last_purchase = state["last_purchase_timestamp"]
+    if as_of is None:
+        as_of = last_purchase.max().normalize() + pd.Timedelta(days=1) if len(state) else pd.Timestamp.now()
+    recency_days = (as_of - last_purchase).dt.days.to_numpy()
+
+    scores = {
+        # Recent customers score high: rank the negated recency
+        "recency_score": _quantile_scores(-recency_days),
+        "frequency_score": _quantile_scores(state["frequency"].to_numpy()),
+        "monetary_score": _quantile_scores(state["monetary"].to_numpy()),
+    }
+    segment_codes = np.array([[SEGMENTS.index(segment) for segment in row] for row in SEGMENT_GRID])
+    segments = pd.Categorical.from_codes(
+        segment_codes[scores["recency_score"] - 1, scores["frequency_score"] - 1], SEGMENTS
+    )
+
+    rfm = state[STATE_COLUMNS].assign(recency_days=recency_days, **scores, rfm_segment=segments)
+    return enforce_schema(rfm.sort_values("customer_unique_key", ignore_index=True), "customer_rfm")
+
+def build_customer_rfm(
+    fact_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    as_of: pd.Timestamp | None = None,
+) -> pd.DataFrame:
+    """
+    Build the RFM table: one row per real customer (customer_unique_key) with orders.
+
+    Recency is the number of days from the customer's last purchase to
+    as_of, frequency their number of orders and monetary their total
+    payments. Each is scored in quintiles over all customers (see
+    _quantile_scores); the recency and frequency scores give the segment
+    (SEGMENT_GRID).
+
+    Parameters
+    ----------
+    fact_df : pd.DataFrame
+        Fact orders (with customer_key).
+    dim_customers : pd.DataFrame
+        Customer dimension (customer_key -> customer_unique_key).
+    as_of : pd.Timestamp | None
+        Date the recency is measured at (default: the day after the last purchase).
+
+    Returns
+    -------
+    pd.DataFrame
+        customer_rfm table.
+    """
+    return score_rfm(_reduce_by_customer(_customer_orders(fact_df, dim_customers)), as_of)
+
+def refresh_customer_rfm(
+    removed_orders: pd.DataFrame,
+    added_orders: pd.DataFrame,
+    read_fact_orders: Callable[[list[str]], pd.DataFrame],
+    dim_customers: pd.DataFrame,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> int:
+    """
+    Update the stored RFM table with order changes, then score every customer again.
+
+    The stored table is the running state of each customer (order count,
+    payment total, first and last purchase). The net change of each
+    customer touched by the removed and added fact rows is applied to it;
+    other customers are not read from fact_orders. A customer whose first
+    or last purchase was removed, without an added order replacing it, is
+    recomputed from their rows of fact_orders (the only case where
+    fact_orders is read). Scores are quantiles over all customers, so they
+    are recomputed for everyone from the state (one sort per score).
+
+    Parameters
+    ----------
+    removed_orders : pd.DataFrame
+        Previous version of the changed orders (fact orders rows).
+    added_orders : pd.DataFrame
+        New version of the changed orders, and new orders.
+    read_fact_orders : Callable[[list[str]], pd.DataFrame]
+        Reads the given columns of fact_orders after the change.
+    dim_customers : pd.DataFrame
+        Customer dimension.
+    modeled_dir : Path
+        Directory of the customer_rfm table.
+    storage_format : str
+        Storage format of the table.
+
+    Returns
+    -------
+    int
+        Number of customers whose state changed.
+    """
+    if not table_path(modeled_dir, "customer_rfm", storage_format).exists():
+        rfm = build_customer_rfm(read_fact_orders(ORDER_COLUMNS), dim_customers)
+        write_table(rfm, modeled_dir, "customer_rfm", fmt=storage_format)
+        return len(rfm)
+
+    state = read_table(modeled_dir, "customer_rfm", columns=STATE_COLUMNS, fmt=storage_format)
+    removed = _customer_orders(removed_orders, dim_customers)
+    added = _customer_orders(added_orders, dim_customers)
+    changes = _reduce_by_customer(
+        pd.concat([removed, added], ignore_index=True),
+        np.r_[-np.ones(len(removed), dtype="int64"), np.ones(len(added), dtype="int64")],
+    )
+
+    positions = pd.Index(state["customer_unique_key"]).get_indexer(changes["customer_unique_key"])
+    known = positions >= 0
+    current = state.iloc[positions[known]].reset_index(drop=True)
+    changed = changes[known].reset_index(drop=True)
+
+    # A removed order at the first or last purchase leaves the customer's next extreme
+    # unknown, unless an added order is at or beyond it (e.g. an order updated in place)
+    stale = (
+        (
+            (changed["removed_first"] <= current["first_purchase_timestamp"])
+            & ~(changed["first_purchase_timestamp"] <= current["first_purchase_timestamp"])
+        )
+        | (
+            (changed["removed_last"] >= current["last_purchase_timestamp"])
+            & ~(changed["last_purchase_timestamp"] >= current["last_purchase_timestamp"])
+        )
+    ).to_numpy()
+    updated = pd.DataFrame({
+        "customer_unique_key": current["customer_unique_key"],
+        # Comparisons with NaT (no added order) are False: the stored extreme is kept
+        "first_purchase_timestamp": current["first_purchase_timestamp"].mask(
+            changed["first_purchase_timestamp"] < current["first_purchase_timestamp"],
+            changed["first_purchase_timestamp"],
+        ),
+        "last_purchase_timestamp": current["last_purchase_timestamp"].mask(
+            changed["last_purchase_timestamp"] > current["last_purchase_timestamp"],
+            changed["last_purchase_timestamp"],
+        ),
+        "frequency": current["frequency"] + changed["frequency"],
+        "monetary": current["monetary"] + changed["monetary"],
+    })
+
+    if stale.any():
+        stale_keys = updated.loc[stale, "customer_unique_key"]
+        stale_customers = dim_customers[dim_customers["customer_unique_key"].isin(stale_keys)]
+        fact_df = read_fact_orders(ORDER_COLUMNS)
+        recomputed = _reduce_by_customer(_customer_orders(
+            fact_df[fact_df["customer_key"].isin(stale_customers["customer_key"])], stale_customers
+        ))[STATE_COLUMNS]
+        # Customers left without orders have no recomputed row
+        updated = pd.concat([updated[~stale], recomputed], ignore_index=True)
+
+    unchanged = np.ones(len(state), dtype=bool)
+    unchanged[positions[known]] = False
+    new_customers = changes.loc[~known, STATE_COLUMNS]
+    state = pd.concat([state[unchanged], updated, new_customers], ignore_index=True)
+    state = state[state["frequency"] > 0]
+
+    rfm = score_rfm(state)
+    write_table(rfm, modeled_dir, "customer_rfm", fmt=storage_format)
+    return len(changes)
+
+if __name__ == "__main__":
+    modeled = read_concurrently({
+        name: table_read(MODELED_DATA_DIR, name) for name in ("fact_orders", "dim_customers")
+    })
+    rfm_df = build_customer_rfm(modeled["fact_orders"], modeled["dim_customers"])
+    write_table(rfm_df, MODELED_DATA_DIR, "customer_rfm")
@@ -1,8 +1,19 @@
 from pathlib import Path
 import pandas as pd
 
+from schemas.registry import enforce_schema
+from schemas.timestamps import parse_timestamps
+from storage.tables import read_table, write_table
+
 MODELED_DATA_DIR = Path("data/modeled/olist")
-def build_date_dimension(fact_orders_path: Path) -> pd.DataFrame:
+
+def year_month(dates: pd.Series) -> pd.Series:
+    """
+    Calendar month key ("YYYY-MM") of datetime values, as used by dim_date.
+    """
+    return dates.dt.to_period("M").astype(str)
+
+def build_date_dimension(fact_df: pd.DataFrame) -> pd.DataFrame:
 
     """
     Build a date dimension based on order_purchase_timestamp
@@ -10,23 +21,22 @@ def build_date_dimension(fact_orders_path: Path) -> pd.DataFrame:
 
     Parameters
     ----------
-    fact_orders_path : Path
-        Path to the fact_orders CSV file.
+    fact_df : pd.DataFrame
+        Fact orders dataframe.
 
     Returns
     -------
     pd.DataFrame
         Date dimension dataframe (one row per calendar day).
     """
-    # Load fact_orders to determine date range
-    df = pd.read_csv(fact_orders_path)
-    df["order_purchase_timestamp"] = pd.to_datetime(
-        df["order_purchase_timestamp"], errors="coerce"
-    )
+    # Parse into a local series: fact_df may be shared with other steps
+    purchase_ts = fact_df["order_purchase_timestamp"]
+    if not pd.api.types.is_datetime64_any_dtype(purchase_ts):
+        purchase_ts = parse_timestamps(purchase_ts)
 
     # Determine date range from fact_orders
-    min_date = df["order_purchase_timestamp"].min().date()
-    max_date = df["order_purchase_timestamp"].max().date()
+    min_date = purchase_ts.min().date()
+    max_date = purchase_ts.max().date()
 
     # Create date range
     date_range = pd.date_range(start=min_date, end=max_date, freq="D")
@@ -41,22 +51,63 @@ def build_date_dimension(fact_orders_path: Path) -> pd.DataFrame:
     date_dim["month"] = date_dim["date"].dt.month
     date_dim["month_name"] = date_dim["date"].dt.month_name()
     date_dim["year"] = date_dim["date"].dt.year
-    date_dim["year_month"] = date_dim["date"].dt.to_period("M").astype(str)
+    date_dim["year_month"] = year_month(date_dim["date"])
     date_dim["day_of_week"] = date_dim["date"].dt.dayofweek + 1  # Monday=1, Sunday=7
     date_dim["is_weekend"] = date_dim["day_of_week"].isin([6, 7])
 
     # Convert to date only (no time component)
     date_dim["date"] = date_dim["date"].dt.date
 
-    return date_dim
+    return enforce_schema(date_dim, "dim_date")
 
-if __name__ == "__main__":
-    fact_orders_path = MODELED_DATA_DIR / "fact_orders.csv"
+def extend_date_dimension(date_dim: pd.DataFrame, fact_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the days of fact_df falling outside an existing date dimension.
 
-    MODELED_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    date_dim_df = build_date_dimension(fact_orders_path)
+    Parameters
+    ----------
+    date_dim : pd.DataFrame
+        Existing date dimension.
+    fact_df : pd.DataFrame
+        New or updated fact orders rows.
 
-    output_path = MODELED_DATA_DIR / "dim_date.csv"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    date_dim_df.to_csv(output_path, index=False)
\ No newline at end of file
+    Returns
+    -------
+    pd.DataFrame
+        date_dim itself when its range already covers fact_df, otherwise the
+        extended dimension (still one row per calendar day, sorted).
+    """
+    purchase_ts = fact_df["order_purchase_timestamp"].dropna()
+    if purchase_ts.empty:
+        return date_dim
+    if date_dim.empty:
+        return build_date_dimension(fact_df)
+
+    first_day = pd.Timestamp(date_dim["date"].min())
+    last_day = pd.Timestamp(date_dim["date"].max())
+    new_first_day = purchase_ts.min().normalize()
+    new_last_day = purchase_ts.max().normalize()
+
+    # Missing day ranges before and after the existing dimension
+    extensions = []
+    if new_first_day < first_day:
+        extensions.append((new_first_day, first_day - pd.Timedelta(days=1)))
+    if new_last_day > last_day:
+        extensions.append((last_day + pd.Timedelta(days=1), new_last_day))
+    if not extensions:
+        return date_dim
+
+    new_days = [
+        build_date_dimension(pd.DataFrame({"order_purchase_timestamp": [start, end]}))
+        for start, end in extensions
+    ]
+    date_dim = pd.concat([date_dim, *new_days], ignore_index=True)
+    date_dim = date_dim.sort_values("date", ignore_index=True)
+
+    return enforce_schema(date_dim, "dim_date")
+
+if __name__ == "__main__":
+    fact_df = read_table(MODELED_DATA_DIR, "fact_orders", columns=["order_purchase_timestamp"])
+    date_dim_df = build_date_dimension(fact_df)
+
+    write_table(date_dim_df, MODELED_DATA_DIR, "dim_date")
\ No newline at end of file
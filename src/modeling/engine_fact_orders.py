@@ -0,0 +1,83 @@
+from pathlib import Path
+import pandas as pd
+
+from engines.base import get_engine
+from modeling.order_aggregation import ORDER_ITEMS_MEASURES, PAYMENTS_MEASURES
+from modeling.geolocation import attach_order_distances
+from modeling.surrogate_keys import KEYS_DIR, add_surrogate_keys
+from storage.tables import DEFAULT_FORMAT
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+def engine_fact_orders(
+    order_distances: pd.DataFrame | None,
+    orders_path: Path,
+    order_items_path: Path,
+    payments_path: Path,
+    engine: str = "duckdb",
+    memory_limit_mb: int | None = None,
+    processed_dir: Path = PROCESSED_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+    keys_dir: Path = KEYS_DIR,
+    rejects_dir: Path | None = None,
+) -> pd.DataFrame:
+    """
+    Clean, aggregate and model orders, items and payments on an execution engine.
+
+    The flow (clean the three tables, aggregate items and payments per
+    order, join them to the orders) is the same on every engine; each
+    engine only implements the operations (see engines.base). The cleaned
+    and aggregated tables are written by the engine; only fact_orders (one
+    row per order) is loaded into pandas, for the downstream steps.
+
+    Parameters
+    ----------
+    order_distances : pd.DataFrame | None
+        Mean customer -> seller distance per order (see modeling.geolocation);
+        None leaves seller_distance_km missing.
+    orders_path, order_items_path, payments_path : Path
+        Raw CSV files.
+    engine : str
+        Engine name (see engines.base.ENGINES).
+    memory_limit_mb : int | None
+        Memory the engine may use before spilling to disk (out-of-core engines).
+    processed_dir : Path
+        Directory of the cleaned tables.
+    modeled_dir : Path
+        Directory of the aggregated tables.
+    storage_format : str
+        Storage format of the written tables.
+    keys_dir : Path
+        Directory of the surrogate key maps.
+    rejects_dir : Path | None
+        When given, the engine writes the rows rejected by the cleaning
+        rules there, with their reason codes.
+
+    Returns
+    -------
+    pd.DataFrame
+        Fact orders dataframe.
+    """
+    with get_engine(engine, memory_limit_mb=memory_limit_mb) as backend:
+        orders = backend.clean(orders_path, "orders", rejects_dir)
+        order_items = backend.clean(order_items_path, "order_items", rejects_dir)
+        payments = backend.clean(payments_path, "payments", rejects_dir)
+
+        order_items_aggregated = backend.aggregate_per_order(order_items, ORDER_ITEMS_MEASURES, "order_items_aggregated")
+        payments_aggregated = backend.aggregate_per_order(payments, PAYMENTS_MEASURES, "payments_aggregated")
+        fact_orders = backend.fact_orders(orders, order_items_aggregated, payments_aggregated)
+
+        for relation, directory, name in (
+            (orders, processed_dir, "orders_cleaned"),
+            (order_items, processed_dir, "order_items_cleaned"),
+            (payments, processed_dir, "payments_cleaned"),
+            (order_items_aggregated, modeled_dir, "order_items_aggregated"),
+            (payments_aggregated, modeled_dir, "payments_aggregated"),
+        ):
+            backend.write(relation, directory, name, storage_format)
+
+        fact_df = backend.to_pandas(fact_orders, "fact_orders")
+
+    return add_surrogate_keys(attach_order_distances(fact_df, order_distances), "fact_orders", keys_dir)
@@ -0,0 +1,73 @@
+from pathlib import Path
+import pandas as pd
+
+from modeling.surrogate_keys import KEYS_DIR, add_surrogate_keys
+from schemas.registry import read_raw_table, validate_columns
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import write_table
+
+RAW_DATA_DIR = Path("data/raw/olist")
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+def build_customer_dimension(customers_df: pd.DataFrame, keys_dir: Path = KEYS_DIR) -> pd.DataFrame:
+    """
+    Build the customer dimension: cleaned customers with their surrogate keys.
+
+    Parameters
+    ----------
+    customers_df : pd.DataFrame
+        Cleaned customers.
+    keys_dir : Path
+        Directory of the key maps.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per customer_id, with customer_key (joins fact_orders) and
+        customer_unique_key (one per real customer).
+    """
+    return add_surrogate_keys(customers_df, "dim_customers", keys_dir)
+
+def build_product_dimension(products_df: pd.DataFrame, keys_dir: Path = KEYS_DIR) -> pd.DataFrame:
+    """
+    Build the product dimension: cleaned products with their surrogate key.
+    """
+    return add_surrogate_keys(products_df, "dim_products", keys_dir)
+
+def build_seller_dimension(sellers_path: Path, keys_dir: Path = KEYS_DIR) -> pd.DataFrame:
+    """
+    Build the seller dimension from the raw sellers, with their surrogate key.
+
+    Parameters
+    ----------
+    sellers_path : Path
+        Path to the raw sellers CSV file.
+    keys_dir : Path
+        Directory of the key maps.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per seller_id.
+    """
+    df = read_raw_table(sellers_path, "sellers")
+    validate_columns(df, "sellers")
+
+    if df["seller_id"].duplicated().any():
+        raise ValueError("Duplicate seller_id values found in sellers dataset.")
+
+    # Same text formats as the customers
+    df["seller_city"] = df["seller_city"].astype(str).str.lower().str.strip()
+    df["seller_state"] = df["seller_state"].astype(str).str.upper().str.strip()
+
+    return add_surrogate_keys(df, "dim_sellers", keys_dir)
+
+if __name__ == "__main__":
+    cleaned = read_concurrently({
+        name: table_read(PROCESSED_DATA_DIR, name) for name in ("customers_cleaned", "products_cleaned")
+    })
+    write_table(build_customer_dimension(cleaned["customers_cleaned"]), MODELED_DATA_DIR, "dim_customers")
+    write_table(build_product_dimension(cleaned["products_cleaned"]), MODELED_DATA_DIR, "dim_products")
+    write_table(build_seller_dimension(RAW_DATA_DIR / "olist_sellers_dataset.csv"),
+                MODELED_DATA_DIR, "dim_sellers")
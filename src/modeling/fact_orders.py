@@ -1,13 +1,54 @@
 from pathlib import Path
 import pandas as pd
 
+from modeling.date_dimension import year_month
+from modeling.geolocation import attach_order_distances
+from modeling.order_aggregation import order_measures
+from modeling.surrogate_keys import KEYS_DIR, add_surrogate_keys
+from schemas.registry import enforce_schema
+from schemas.timestamps import parse_timestamps
+from storage.partitions import write_partitioned_table
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, write_table
+
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 MODELED_DATA_DIR = Path("data/modeled/olist")
 
-def fact_orders(orders_df: pd.DataFrame, order_items_df: pd.DataFrame, payments_df: pd.DataFrame) -> pd.DataFrame:
+# Columns of the fact table built from the cleaned tables, before surrogate keys
+FINAL_COLUMNS = [
+    "order_id",
+    "customer_id",
+    "order_status",
+    "order_purchase_timestamp",
+    "delivery_duration_days",
+    "delivery_delay_days",
+    "order_items_count",
+    "order_items_total_value",
+    "order_freight_total",
+    "order_payment_total",
+    "payment_methods_count",
+    "used_voucher",
+]
+
+def fact_orders(
+    orders_df: pd.DataFrame,
+    order_items_df: pd.DataFrame,
+    payments_df: pd.DataFrame,
+    order_distances: pd.DataFrame | None = None,
+    keys_dir: Path | None = KEYS_DIR,
+) -> pd.DataFrame:
     """
     Create a fact orders dataframe by merging orders, order items aggregation, and payments aggregation data.
 
+    Parameters
+    ----------
+    order_distances : pd.DataFrame | None
+        Mean customer -> seller distance per order (see modeling.geolocation);
+        None leaves seller_distance_km missing.
+    keys_dir : Path | None
+        Directory of the surrogate key maps; None keeps the natural IDs
+        (order_id, customer_id), e.g. in worker processes.
+
     Returns
     -------
     pd.DataFrame
@@ -16,6 +57,49 @@ def fact_orders(orders_df: pd.DataFrame, order_items_df: pd.DataFrame, payments_
     fact_df = orders_df.merge(order_items_df, on="order_id", how="left")
     fact_df = fact_df.merge(payments_df, on="order_id", how="left")
 
+    return _finalize_fact_orders(fact_df, keys_dir, order_distances)
+
+def fact_orders_from_cleaned(
+    orders_df: pd.DataFrame,
+    order_items_df: pd.DataFrame,
+    payments_df: pd.DataFrame,
+    order_distances: pd.DataFrame | None = None,
+    keys_dir: Path | None = KEYS_DIR,
+) -> pd.DataFrame:
+    """
+    Create the fact orders dataframe straight from the cleaned tables.
+
+    Same output as fact_orders() on the aggregated tables, but the item and
+    payment measures are computed in one pass aligned with the orders rows
+    (see modeling.order_aggregation), so no merge is needed.
+
+    Parameters
+    ----------
+    order_distances : pd.DataFrame | None
+        Mean customer -> seller distance per order; None leaves it missing.
+    keys_dir : Path | None
+        Directory of the surrogate key maps; None keeps the natural IDs.
+
+    Returns
+    -------
+    pd.DataFrame
+        Fact orders dataframe.
+    """
+    order_columns = [column for column in FINAL_COLUMNS if column in orders_df.columns]
+    measures_df = order_measures(orders_df, order_items_df, payments_df)
+
+    fact_df = pd.concat([orders_df[order_columns], measures_df], axis=1).reset_index(drop=True)
+
+    return _finalize_fact_orders(fact_df, keys_dir, order_distances)
+
+def _finalize_fact_orders(fact_df: pd.DataFrame, keys_dir: Path | None = KEYS_DIR,
+                          order_distances: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Fill orders without items or payments and enforce the fact table types and columns.
+
+    Without keys_dir the result keeps the engine contract (FINAL_COLUMNS, natural
+    IDs, no distance): the caller keys the rows and adds the distances.
+    """
     numeric_fill_zero = [
     "order_items_count",
     "order_items_total_value",
@@ -31,59 +115,81 @@ def fact_orders(orders_df: pd.DataFrame, order_items_df: pd.DataFrame, payments_
     .astype("boolean")
     .fillna(False)
     )
-
-
-
-
     # Convert used_voucher to boolean
 
     fact_df["order_items_count"] = fact_df["order_items_count"].astype(int)
     fact_df["payment_methods_count"] = fact_df["payment_methods_count"].astype(int)
     # Enforcing correct data types
 
-    fact_df["order_purchase_timestamp"] = pd.to_datetime(
-    fact_df["order_purchase_timestamp"], errors="coerce"
-    )
-    # Ensure order_purchase_timestamp is in datetime format
-
-    final_columns = [
-    "order_id",
-    "customer_id",
-    "order_status",
-    "order_purchase_timestamp",
-    "delivery_duration_days",
-    "delivery_delay_days",
-    "order_items_count",
-    "order_items_total_value",
-    "order_freight_total",
-    "order_payment_total",
-    "payment_methods_count",
-    "used_voucher",
-    ]
+    if not pd.api.types.is_datetime64_any_dtype(fact_df["order_purchase_timestamp"]):
+        fact_df["order_purchase_timestamp"] = parse_timestamps(fact_df["order_purchase_timestamp"])
+    # Ensure order_purchase_timestamp is in datetime format (already parsed by clean_orders)
+
+    fact_df = fact_df[FINAL_COLUMNS]
+    if keys_dir is None:
+        return enforce_schema(fact_df, "fact_orders")
+
+    fact_df = attach_order_distances(fact_df, order_distances)
+    # order_key / customer_key from the persisted key maps (customer_id is replaced by its key)
+    return add_surrogate_keys(fact_df, "fact_orders", keys_dir)
+
+def write_fact_orders_partitions(
+    fact_df: pd.DataFrame,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+    max_workers: int = 4,
+    replaced_months: list[str] | None = None,
+) -> list[str]:
+    """
+    Write fact_orders partitioned by purchase month (year_month, as in dim_date).
+
+    Partitions are written to modeled_dir/fact_orders/year_month=YYYY-MM/
+    with a partition index for pruning (see storage.partitions); only
+    partitions whose rows changed since the previous write are rewritten.
+
+    Parameters
+    ----------
+    fact_df : pd.DataFrame
+        Fact orders dataframe.
+    modeled_dir : Path
+        Directory of the modeled tables.
+    storage_format : str
+        Storage format of the partition files.
+    max_workers : int
+        Partitions written concurrently.
+    replaced_months : list[str] | None
+        Months whose rows fact_df holds, the other partitions being kept
+        (None: fact_df is the whole table).
 
-    fact_df = fact_df[final_columns]
+    Returns
+    -------
+    list[str]
+        Months whose partition was (re)written.
+    """
+    purchase_ts = fact_df["order_purchase_timestamp"]
+    written = write_partitioned_table(
+        fact_df,
+        modeled_dir,
+        "fact_orders",
+        partition_values=year_month(purchase_ts).where(purchase_ts.notna()),
+        partition_column="year_month",
+        timestamp_column="order_purchase_timestamp",
+        fmt=storage_format,
+        max_workers=max_workers,
+        replaced_partitions=replaced_months,
+    )
+    print(f"Rewrote {len(written)} fact_orders partitions.")
 
-    return fact_df
+    return written
 
 if __name__ == "__main__":
-    orders_path = PROCESSED_DATA_DIR / "orders_cleaned.csv"
-    orders_df = pd.read_csv(orders_path)
-
-    order_items_path = MODELED_DATA_DIR / "order_items_aggregated.csv"
-    order_items_df = pd.read_csv(order_items_path)
-
-    payments_path = MODELED_DATA_DIR / "payments_aggregated.csv"
-    payments_df = pd.read_csv(payments_path)
-
-    fact_df = fact_orders(
-    orders_df=orders_df,
-    order_items_df=order_items_df,
-    payments_df=payments_df
-    )
-    MODELED_DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    output_path = MODELED_DATA_DIR / "fact_orders.csv"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    fact_df.to_csv(output_path, index=False)
+    inputs = read_concurrently({
+        "orders_df": table_read(PROCESSED_DATA_DIR, "orders_cleaned"),
+        "order_items_df": table_read(MODELED_DATA_DIR, "order_items_aggregated"),
+        "payments_df": table_read(MODELED_DATA_DIR, "payments_aggregated"),
+        "order_distances": table_read(MODELED_DATA_DIR, "order_distances"),
+    })
+
+    fact_df = fact_orders(**inputs)
+    write_table(fact_df, MODELED_DATA_DIR, "fact_orders")
 
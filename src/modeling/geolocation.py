@@ -0,0 +1,360 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cleaning.rules import apply_cleaning_rules
+from orchestration.metrics import capture_metrics
+from schemas.registry import enforce_schema
+from storage.concurrent_io import raw_table_read, read_concurrently, table_read
+from storage.tables import write_table
+
+RAW_DATA_DIR = Path("data/raw/olist")
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Mean Earth radius (IUGG), in km
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+# Side of the cells of the spatial index, in degrees (~55 km of latitude)
+GRID_CELL_DEGREES = 0.5
+# Columns of the raw tables the distances need
+ORDERS_COLUMNS = ["order_id", "customer_id"]
+ORDER_ITEMS_COLUMNS = ["order_id", "seller_id", "price", "freight_value"]
+
+
+def haversine_km(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Great-circle distance between points given in degrees, element-wise.
+
+    Any argument may be a scalar or an array (broadcast by numpy); the
+    distance is missing where a coordinate is.
+    """
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(values, dtype="float64")) for values in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _take(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """
+    values[positions] as floats, NaN where the position is -1 (unknown).
+    """
+    taken = np.full(len(positions), np.nan)
+    known = positions >= 0
+    taken[known] = values[positions[known]]
+    return taken
+
+
+def locate(zip_prefixes: pd.Series, centroids: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Latitude and longitude of the centroid of each zip code prefix (one hash lookup per row).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Latitudes and longitudes, NaN for prefixes without a centroid.
+    """
+    positions = pd.Index(centroids["geolocation_zip_code_prefix"]).get_indexer(zip_prefixes)
+    return (
+        _take(centroids["geolocation_lat"].to_numpy(dtype="float64"), positions),
+        _take(centroids["geolocation_lng"].to_numpy(dtype="float64"), positions),
+    )
+
+
+class SpatialIndex:
+    """
+    Uniform latitude / longitude grid over a set of points, for radius and nearest-point queries.
+
+    Points are sorted by grid cell (row-major), with the offset of each cell
+    in that order: the points of a run of cells in one grid row are a single
+    contiguous slice, so a query gathers its candidates with one slice per
+    grid row it spans and computes their distances in one vectorized call.
+    Points with a missing coordinate are not indexed.
+
+    Parameters
+    ----------
+    lat, lng : np.ndarray
+        Coordinates of the points, in degrees.
+    labels : np.ndarray | None
+        Label of each point returned by the queries (default: its position).
+    cell_degrees : float
+        Side of the grid cells, in degrees.
+    """
+
+    def __init__(self, lat: np.ndarray, lng: np.ndarray, labels: np.ndarray | None = None,
+                 cell_degrees: float = GRID_CELL_DEGREES):
+        lat = np.asarray(lat, dtype="float64")
+        lng = np.asarray(lng, dtype="float64")
+        self.labels = np.arange(len(lat)) if labels is None else np.asarray(labels)
+        self.cell_degrees = cell_degrees
+
+        known = np.flatnonzero(~(np.isnan(lat) | np.isnan(lng)))
+        self.lat, self.lng = lat[known], lng[known]
+        self.origin = (self.lat.min(), self.lng.min()) if len(known) else (0.0, 0.0)
+        rows, columns = self._cells(self.lat, self.lng)
+        self.n_rows = int(rows.max()) + 1 if len(known) else 1
+        self.n_columns = int(columns.max()) + 1 if len(known) else 1
+
+        cell_ids = rows * self.n_columns + columns
+        order = np.argsort(cell_ids, kind="stable")
+        self.lat, self.lng, self.positions = self.lat[order], self.lng[order], known[order]
+        # Points of cell c: [cell_starts[c], cell_starts[c + 1]) of the sorted points
+        self.cell_starts = np.searchsorted(cell_ids[order], np.arange(self.n_rows * self.n_columns + 1))
+        # A degree of longitude is shortest at the latitude farthest from the equator
+        max_abs_lat = max(abs(self.origin[0]), abs(self.origin[0] + self.n_rows * cell_degrees))
+        self._min_cell_km = cell_degrees * KM_PER_DEGREE * np.cos(np.radians(min(max_abs_lat, 89.0)))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _cells(self, lat, lng) -> tuple[np.ndarray, np.ndarray]:
+        rows = np.floor((np.asarray(lat) - self.origin[0]) / self.cell_degrees).astype("int64")
+        columns = np.floor((np.asarray(lng) - self.origin[1]) / self.cell_degrees).astype("int64")
+        return rows, columns
+
+    def _candidates(self, first_row: int, last_row: int, first_column: int, last_column: int) -> np.ndarray:
+        """
+        Sorted-point indices in a block of cells (clipped to the grid).
+        """
+        first_row, last_row = max(first_row, 0), min(last_row, self.n_rows - 1)
+        first_column, last_column = max(first_column, 0), min(last_column, self.n_columns - 1)
+        if first_row > last_row or first_column > last_column:
+            return np.empty(0, dtype="int64")
+        slices = [
+            np.arange(self.cell_starts[row * self.n_columns + first_column],
+                      self.cell_starts[row * self.n_columns + last_column + 1])
+            for row in range(first_row, last_row + 1)
+        ]
+        return np.concatenate(slices)
+
+    def _result(self, candidates: np.ndarray, distances: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        order = np.argsort(distances, kind="stable")
+        return self.labels[self.positions[candidates[order]]], distances[order]
+
+    def within(self, lat: float, lng: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Points within radius_km of a location.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Labels of the points and their distances in km, nearest first.
+        """
+        lat_degrees = radius_km / KM_PER_DEGREE
+        farthest_lat = min(abs(lat) + lat_degrees, 89.0)
+        lng_degrees = min(radius_km / (KM_PER_DEGREE * np.cos(np.radians(farthest_lat))), 180.0)
+
+        (first_row, last_row), (first_column, last_column) = self._cells(
+            [lat - lat_degrees, lat + lat_degrees], [lng - lng_degrees, lng + lng_degrees]
+        )
+        candidates = self._candidates(first_row, last_row, first_column, last_column)
+        distances = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+        inside = distances <= radius_km
+        return self._result(candidates[inside], distances[inside])
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The k points nearest to a location.
+
+        Rings of cells around the location's cell are added until k points
+        are found and no point outside the searched block can be closer than
+        the k-th one (a point outside the block is at least as many whole
+        cells away as the block's half-width).
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Labels of the points and their distances in km, nearest first
+            (fewer than k when the index holds fewer points).
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return self.labels[:0], np.empty(0)
+
+        row, column = (int(value) for value in self._cells(lat, lng))
+        # Start from the grid when the location is outside it
+        ring = max(0, -row, row - self.n_rows + 1, -column, column - self.n_columns + 1)
+        while True:
+            candidates = self._candidates(row - ring, row + ring, column - ring, column + ring)
+            covers_grid = (row - ring <= 0 and row + ring >= self.n_rows - 1
+                           and column - ring <= 0 and column + ring >= self.n_columns - 1)
+            if len(candidates) >= k:
+                distances = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+                kth = np.partition(distances, k - 1)[k - 1]
+                if covers_grid or kth <= ring * self._min_cell_km:
+                    nearest = np.argpartition(distances, k - 1)[:k]
+                    return self._result(candidates[nearest], distances[nearest])
+            ring += 1
+
+
+def seller_index(dim_sellers: pd.DataFrame, centroids: pd.DataFrame) -> SpatialIndex:
+    """
+    Spatial index of the sellers at the centroid of their zip code prefix, labelled by seller_id.
+    """
+    lat, lng = locate(dim_sellers["seller_zip_code_prefix"], centroids)
+    return SpatialIndex(lat, lng, labels=dim_sellers["seller_id"].to_numpy())
+
+
+def nearest_distances_km(lat: np.ndarray, lng: np.ndarray, index: SpatialIndex) -> np.ndarray:
+    """
+    Distance from each location to the nearest point of a spatial index.
+
+    Locations are deduplicated first (customers share the centroid of their
+    zip code prefix), so the index is queried once per distinct location.
+    The distance is missing where a coordinate is, or when the index is empty.
+    """
+    distances = np.full(len(lat), np.nan)
+    known = ~(np.isnan(lat) | np.isnan(lng))
+    if not known.any() or len(index) == 0:
+        return distances
+
+    locations, inverse = np.unique(np.column_stack([lat[known], lng[known]]), axis=0, return_inverse=True)
+    nearest = np.array([index.nearest(location_lat, location_lng)[1][0] for location_lat, location_lng in locations])
+    distances[known] = nearest[inverse.reshape(-1)]
+    return distances
+
+
+def order_distances(
+    order_items_df: pd.DataFrame,
+    orders_df: pd.DataFrame,
+    customers_df: pd.DataFrame,
+    sellers_df: pd.DataFrame,
+    centroids: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Mean customer -> seller distance of the items of each order, and distance to the nearest seller.
+
+    Each item is joined to its order's customer and to its seller by hash
+    lookups (pd.Index.get_indexer), both located at their zip code prefix
+    centroid; the haversine distances of all items are computed at once and
+    averaged per order with np.bincount. The customer's nearest seller (any
+    seller, see seller_index) gives the shortest distance the order could
+    have shipped over.
+
+    Parameters
+    ----------
+    order_items_df : pd.DataFrame
+        Order items (order_id, seller_id).
+    orders_df : pd.DataFrame
+        Orders (order_id, customer_id).
+    customers_df : pd.DataFrame
+        Customers (customer_id, customer_zip_code_prefix).
+    sellers_df : pd.DataFrame
+        Sellers (seller_id, seller_zip_code_prefix).
+    centroids : pd.DataFrame
+        Zip code prefix centroids (see cleaning.geolocation_cleaning).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per order with items, sorted by order_id; the distance is
+        missing when no item has both a customer and a seller location, and
+        the nearest seller distance when the customer has no location.
+    """
+    customer_lat, customer_lng = locate(customers_df["customer_zip_code_prefix"], centroids)
+    seller_lat, seller_lng = locate(sellers_df["seller_zip_code_prefix"], centroids)
+
+    # Item -> order -> customer, and item -> seller, as positions (-1 when unknown)
+    order_positions = pd.Index(orders_df["order_id"]).get_indexer(order_items_df["order_id"])
+    customer_positions = np.full(len(order_items_df), -1)
+    known_orders = order_positions >= 0
+    customer_positions[known_orders] = pd.Index(customers_df["customer_id"]).get_indexer(
+        orders_df["customer_id"].to_numpy()[order_positions[known_orders]]
+    )
+    seller_positions = pd.Index(sellers_df["seller_id"]).get_indexer(order_items_df["seller_id"])
+
+    item_customer_lat = _take(customer_lat, customer_positions)
+    item_customer_lng = _take(customer_lng, customer_positions)
+    distances = haversine_km(
+        item_customer_lat, item_customer_lng,
+        _take(seller_lat, seller_positions), _take(seller_lng, seller_positions),
+    )
+
+    codes, order_ids = pd.factorize(order_items_df["order_id"], sort=True)
+    known = ~np.isnan(distances)
+    counts = np.bincount(codes[known], minlength=len(order_ids))
+    totals = np.bincount(codes[known], weights=distances[known], minlength=len(order_ids))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_distances = np.where(counts > 0, totals / counts, np.nan)
+
+    # Items of an order share its customer: locate it from the order's first item
+    first_items = np.unique(codes, return_index=True)[1]
+    nearest_distances = nearest_distances_km(
+        item_customer_lat[first_items], item_customer_lng[first_items], seller_index(sellers_df, centroids),
+    )
+
+    return enforce_schema(
+        pd.DataFrame({
+            "order_id": order_ids,
+            "seller_distance_km": mean_distances,
+            "nearest_seller_km": nearest_distances,
+        }),
+        "order_distances",
+    )
+
+
+def build_order_distances(
+    customers_df: pd.DataFrame,
+    dim_sellers: pd.DataFrame,
+    centroids: pd.DataFrame,
+    orders_path: Path,
+    order_items_path: Path,
+) -> pd.DataFrame:
+    """
+    Order distances (see order_distances) of the cleaned order items.
+
+    Orders and items are read from the raw files (only the needed columns),
+    so the table does not depend on how the fact table is built (pandas,
+    streaming, sharded, engine or incremental run). The item cleaning rules
+    are re-applied; their rejects are already counted by the item cleaning.
+
+    Parameters
+    ----------
+    customers_df : pd.DataFrame
+        Cleaned customers.
+    dim_sellers : pd.DataFrame
+        Seller dimension.
+    centroids : pd.DataFrame
+        Zip code prefix centroids.
+    orders_path, order_items_path : Path
+        Raw orders and order items CSV files.
+
+    Returns
+    -------
+    pd.DataFrame
+        Mean customer -> seller distance per order.
+    """
+    raw = read_concurrently({
+        "orders": raw_table_read(orders_path, "orders", usecols=ORDERS_COLUMNS),
+        "order_items": raw_table_read(order_items_path, "order_items", usecols=ORDER_ITEMS_COLUMNS),
+    })
+    with capture_metrics():
+        order_items = apply_cleaning_rules(raw["order_items"], "order_items")
+
+    return order_distances(order_items, raw["orders"], customers_df, dim_sellers, centroids)
+
+
+def attach_order_distances(fact_df: pd.DataFrame, distances: pd.DataFrame | None) -> pd.DataFrame:
+    """
+    Add the seller_distance_km column to fact orders rows (missing for orders without a distance).
+    """
+    values = np.full(len(fact_df), np.nan, dtype="float32")
+    if distances is not None and len(distances):
+        positions = pd.Index(distances["order_id"]).get_indexer(fact_df["order_id"])
+        known = positions >= 0
+        values[known] = distances["seller_distance_km"].to_numpy(dtype="float32", na_value=np.nan)[positions[known]]
+    return fact_df.assign(seller_distance_km=values)
+
+
+if __name__ == "__main__":
+    inputs = read_concurrently({
+        "customers_df": table_read(PROCESSED_DATA_DIR, "customers_cleaned"),
+        "dim_sellers": table_read(MODELED_DATA_DIR, "dim_sellers"),
+        "centroids": table_read(PROCESSED_DATA_DIR, "geolocation_centroids"),
+    })
+    distances_df = build_order_distances(
+        **inputs,
+        orders_path=RAW_DATA_DIR / "olist_orders_dataset.csv",
+        order_items_path=RAW_DATA_DIR / "olist_order_items_dataset.csv",
+    )
+    write_table(distances_df, MODELED_DATA_DIR, "order_distances")
@@ -0,0 +1,288 @@
+import json
+from functools import partial
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from cleaning.order_items_cleaning import clean_order_items_chunk
+from cleaning.orders_cleaning import clean_orders_chunk
+from cleaning.payments_cleaning import clean_payments_chunk
+from cleaning.rules import REJECTS_DIR, REJECTS_FORMAT, rejects_writer
+from modeling.customer_rfm import refresh_customer_rfm
+from modeling.date_dimension import build_date_dimension, extend_date_dimension, year_month
+from modeling.fact_orders import fact_orders_from_cleaned, write_fact_orders_partitions
+from modeling.rollups import STATE_DIR as ROLLUPS_STATE_DIR, refresh_rollups
+from modeling.surrogate_keys import KEYS_DIR
+from orchestration.metrics import capture_metrics
+from schemas.registry import get_schema, read_raw_table
+from storage.concurrent_io import Read, read_concurrently
+from storage.partitions import load_partition_index, read_partitioned_table
+from storage.tables import DEFAULT_FORMAT, TABLE_FORMATS, read_table, table_path, write_table
+
+RAW_DATA_DIR = Path("data/raw/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+STATE_DIR = Path("data/cache/olist/incremental")
+
+# Orders purchased within this many days before the watermark may still change
+# (approval, shipping and delivery dates are filled in after the purchase)
+DEFAULT_LOOKBACK_DAYS = 60
+# Rows per chunk when scanning raw items and payments for delta orders
+SCAN_CHUNK_ROWS = 500_000
+
+def _window_start(watermark: pd.Timestamp, lookback_days: int) -> pd.Timestamp:
+    """
+    First day of the orders that may still change (whole days, for the daily rollups).
+    """
+    return (watermark - pd.Timedelta(days=lookback_days)).normalize()
+
+def _load_state(state_dir: Path) -> tuple[pd.Timestamp | None, pd.Series]:
+    """
+    Load the watermark and the per-order content hashes of the last refresh.
+    """
+    watermark_path = state_dir / "watermark.json"
+    if not watermark_path.exists():
+        return None, pd.Series(dtype="uint64")
+
+    watermark = pd.Timestamp(json.loads(watermark_path.read_text())["order_purchase_timestamp"])
+    order_state = read_table(state_dir, "order_state", fmt="parquet")
+
+    return watermark, order_state.set_index("order_id")["state_hash"]
+
+def _save_state(state_dir: Path, watermark: pd.Timestamp, order_hashes: pd.Series):
+    """
+    Persist the watermark and the per-order content hashes.
+    """
+    order_state = order_hashes.rename("state_hash").rename_axis("order_id").reset_index()
+    write_table(order_state, state_dir, "order_state", fmt="parquet")
+    (state_dir / "watermark.json").write_text(
+        json.dumps({"order_purchase_timestamp": watermark.isoformat()})
+    )
+
+def _rows_for_orders(raw_path: Path, table: str, order_ids: pd.Index) -> pd.DataFrame:
+    """
+    Scan a raw child table in chunks, keeping only the rows of the given orders.
+    """
+    chunks = [
+        chunk[chunk["order_id"].isin(order_ids)]
+        for chunk in read_raw_table(raw_path, table, chunksize=SCAN_CHUNK_ROWS)
+    ]
+    if not chunks:
+        return read_raw_table(raw_path, table, nrows=0)
+    return pd.concat(chunks, ignore_index=True)
+
+def _order_hashes(orders: pd.DataFrame, *children: pd.DataFrame) -> pd.Series:
+    """
+    Content hash of each order: its raw row plus all its item and payment rows.
+
+    Child row hashes are added up per order (wrapping uint64 sums), so the
+    hash does not depend on the order of the rows in the raw files.
+    """
+    order_index = pd.Index(orders["order_id"])
+    hashes = pd.util.hash_pandas_object(orders, index=False).to_numpy()
+
+    for child in children:
+        codes = order_index.get_indexer(child["order_id"])
+        known = codes >= 0
+        child_hashes = pd.util.hash_pandas_object(child, index=False).to_numpy()
+        np.add.at(hashes, codes[known], child_hashes[known])
+
+    return pd.Series(hashes, index=order_index, dtype="uint64")
+
+def _read_fact_orders(modeled_dir: Path) -> pd.DataFrame | None:
+    """
+    Whole stored fact_orders (a single file from a full run, or its month partitions), if any.
+    """
+    try:
+        return read_table(modeled_dir, "fact_orders")
+    except FileNotFoundError:
+        return None
+
+def _clean_delta(clean_chunk, rows: pd.DataFrame, table: str, delta_ids: pd.Index, rejects_dir: Path | None) -> pd.DataFrame:
+    """
+    Clean the rows of the delta orders, upserting their rejected rows into the reject table.
+
+    The previous rejects of the delta orders are replaced; those of the
+    other orders are kept.
+    """
+    if rejects_dir is None:
+        return clean_chunk(rows)
+
+    with rejects_writer(table, rejects_dir) as rejects:
+        if table_path(rejects_dir, f"{table}_rejects", REJECTS_FORMAT).exists():
+            previous = read_table(rejects_dir, f"{table}_rejects", fmt=REJECTS_FORMAT)
+            rejects.write(previous[~previous["order_id"].isin(delta_ids)])
+        return clean_chunk(rows, rejects=rejects)
+
+def refresh_fact_orders(
+    dim_customers: pd.DataFrame | None = None,
+    dim_products: pd.DataFrame | None = None,
+    order_distances: pd.DataFrame | None = None,
+    raw_dir: Path = RAW_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    state_dir: Path = STATE_DIR,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    storage_format: str = DEFAULT_FORMAT,
+    keys_dir: Path = KEYS_DIR,
+    rollups_state_dir: Path = ROLLUPS_STATE_DIR,
+    rejects_dir: Path | None = REJECTS_DIR,
+) -> int:
+    """
+    Upsert new and changed orders into fact_orders, and extend dim_date.
+
+    Orders purchased after the stored watermark are new. Orders purchased in
+    the lookback window before it are compared with their stored content
+    hash (order row + item rows + payment rows) to find the changed ones.
+    Older orders are considered settled. Only the delta orders are cleaned
+    and aggregated; they replace their previous version in fact_orders
+    (orders that no longer pass cleaning are removed). Without state, every
+    order is part of the delta.
+
+    fact_orders is stored partitioned by purchase month (see
+    modeling.fact_orders.write_fact_orders_partitions). Previous versions
+    of the delta orders are all in the window, so a refresh only reads the
+    partitions of the window's months and rewrites those whose rows
+    changed; a single-file copy left by a full run is removed, as it would
+    go stale. The raw files are complete snapshots without a change log, so
+    they are still scanned whole (from their columnar cache) to find the
+    delta.
+
+    When the customer and product dimensions are given, the BI rollups are
+    refreshed too, for the days of the window only (see modeling.rollups),
+    and so is the RFM table, for the customers of the delta orders only
+    (see modeling.customer_rfm).
+
+    Parameters
+    ----------
+    dim_customers, dim_products : pd.DataFrame | None
+        Customer and product dimensions, to maintain the rollups and the RFM table.
+    order_distances : pd.DataFrame | None
+        Mean customer -> seller distance per order, for the delta orders
+        (see modeling.geolocation).
+    raw_dir : Path
+        Directory of the raw Olist CSV files.
+    modeled_dir : Path
+        Directory of fact_orders and dim_date.
+    state_dir : Path
+        Directory of the watermark and order hash state.
+    lookback_days : int
+        Size of the window of orders that may still change.
+    storage_format : str
+        Storage format of the modeled tables.
+    keys_dir : Path
+        Directory of the surrogate key maps (delta orders keep their keys).
+    rollups_state_dir : Path
+        Directory of the per-day content hashes of the rollups.
+    rejects_dir : Path | None
+        Directory of the reject tables, where the rejected rows of the delta
+        orders replace their previous version (None leaves them untouched).
+
+    Returns
+    -------
+    int
+        Number of delta orders.
+    """
+    watermark, stored_hashes = _load_state(state_dir)
+
+    orders = read_raw_table(raw_dir / get_schema("orders").file_name, "orders")
+    purchase_ts = orders["order_purchase_timestamp"]
+    window_start = None
+    if watermark is not None:
+        window_start = _window_start(watermark, lookback_days)
+        orders = orders[purchase_ts >= window_start]
+
+    candidate_ids = pd.Index(orders["order_id"])
+    # Items and payments are scanned concurrently
+    children = read_concurrently({
+        table: Read(_rows_for_orders, (raw_dir / get_schema(table).file_name, table, candidate_ids))
+        for table in ("order_items", "payments")
+    })
+    order_items, payments = children["order_items"], children["payments"]
+
+    candidate_hashes = _order_hashes(orders, order_items, payments)
+    # Compare as uint64 arrays: reindexing would turn missing hashes into floats
+    stored_positions = pd.Index(stored_hashes.index).get_indexer(candidate_hashes.index)
+    previous_hashes = stored_hashes.to_numpy()[np.maximum(stored_positions, 0)] if len(stored_hashes) else 0
+    is_delta = (stored_positions < 0) | (previous_hashes != candidate_hashes.to_numpy())
+    delta_ids = candidate_hashes.index[is_delta]
+
+    if len(delta_ids) == 0:
+        print("No new or changed orders since the last refresh.")
+        return 0
+
+    delta_fact = fact_orders_from_cleaned(
+        _clean_delta(clean_orders_chunk, orders[orders["order_id"].isin(delta_ids)], "orders", delta_ids, rejects_dir),
+        _clean_delta(clean_order_items_chunk, order_items[order_items["order_id"].isin(delta_ids)], "order_items",
+                     delta_ids, rejects_dir),
+        _clean_delta(clean_payments_chunk, payments[payments["order_id"].isin(delta_ids)], "payments",
+                     delta_ids, rejects_dir),
+        order_distances,
+        keys_dir=keys_dir,
+    )
+
+    # Upsert: drop the previous version of every delta order, append the new one
+    index = load_partition_index(modeled_dir, "fact_orders")
+    replaced_months = None
+    if window_start is not None and index["partitions"] and index["format"] == storage_format:
+        # Only the partitions of the window's months are read and replaced
+        month_start = window_start.to_period("M").start_time
+        stored_fact = read_partitioned_table(modeled_dir, "fact_orders", start=month_start)
+        replaced_months = sorted({
+            value for value, entry in index["partitions"].items()
+            if entry["max_timestamp"] is not None and pd.Timestamp(entry["max_timestamp"]) >= month_start
+        } | set(year_month(delta_fact["order_purchase_timestamp"])))
+    else:
+        # First refresh (or partitions in another format): the whole table is rewritten
+        stored_fact = _read_fact_orders(modeled_dir)
+    if stored_fact is not None:
+        is_previous = stored_fact["order_id"].isin(delta_ids)
+        previous_fact = stored_fact[is_previous]
+        fact_df = pd.concat([stored_fact[~is_previous], delta_fact], ignore_index=True)
+    else:
+        previous_fact = delta_fact.iloc[:0]
+        fact_df = delta_fact
+    write_fact_orders_partitions(fact_df, modeled_dir, storage_format, replaced_months=replaced_months)
+    for fmt in TABLE_FORMATS:
+        table_path(modeled_dir, "fact_orders", fmt).unlink(missing_ok=True)
+
+    # dim_date only grows when the delta extends the date range
+    if table_path(modeled_dir, "dim_date", storage_format).exists():
+        date_dim = read_table(modeled_dir, "dim_date", fmt=storage_format)
+        extended_dim = extend_date_dimension(date_dim, delta_fact)
+        if extended_dim is not date_dim:
+            write_table(extended_dim, modeled_dir, "dim_date", fmt=storage_format)
+    else:
+        purchase_dates = read_table(modeled_dir, "fact_orders", columns=["order_purchase_timestamp"])
+        write_table(build_date_dimension(purchase_dates), modeled_dir, "dim_date", fmt=storage_format)
+
+    if dim_customers is not None and dim_products is not None:
+        # Every order of the window days was scanned: their rollup rows can be recomputed
+        window_fact = fact_df
+        if window_start is not None:
+            window_fact = fact_df[fact_df["order_purchase_timestamp"] >= window_start]
+        with capture_metrics():
+            # Rejects of the delta orders are already counted
+            window_items = clean_order_items_chunk(order_items)
+            window_payments = clean_payments_chunk(payments)
+        refresh_rollups(
+            window_fact, window_items, window_payments, dim_customers, dim_products,
+            since=window_start, modeled_dir=modeled_dir, state_dir=rollups_state_dir,
+            storage_format=storage_format,
+        )
+        # Only the customers of the delta orders are updated
+        refresh_customer_rfm(previous_fact, delta_fact, partial(read_table, modeled_dir, "fact_orders"),
+                             dim_customers, modeled_dir=modeled_dir, storage_format=storage_format)
+
+    # Keep hashes only for orders that can still change
+    new_watermark = purchase_ts.max() if watermark is None else max(watermark, purchase_ts.max())
+    kept_hashes = stored_hashes.drop(candidate_hashes.index, errors="ignore")
+    order_hashes = pd.concat([kept_hashes, candidate_hashes]) if len(kept_hashes) else candidate_hashes
+    window_ids = orders.loc[
+        orders["order_purchase_timestamp"] >= _window_start(new_watermark, lookback_days), "order_id"
+    ]
+    _save_state(state_dir, new_watermark, order_hashes[order_hashes.index.isin(window_ids)])
+
+    print(f"Upserted {len(delta_ids)} new or changed orders into fact_orders.")
+    return len(delta_ids)
+
+if __name__ == "__main__":
+    refresh_fact_orders()
@@ -0,0 +1,265 @@
+import math
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from schemas.registry import enforce_schema, get_schema
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, write_table
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Share of the orders a pair must appear in to be kept
+DEFAULT_MIN_SUPPORT = 2e-5
+# A pair seen in a single order is noise, whatever the number of orders
+MIN_PAIR_ORDERS = 2
+# Associated items kept per item, by decreasing lift
+DEFAULT_TOP_K = 10
+# Orders whose item pairs are enumerated at once (bounds the memory of the pair codes)
+DEFAULT_CHUNK_ORDERS = 100_000
+ORDER_ITEMS_COLUMNS = ["order_id", "product_id"]
+
+
+@dataclass(frozen=True)
+class IncidenceMatrix:
+    """
+    Sparse binary order x item matrix in CSR layout (numpy arrays).
+
+    The items of order r are indices[indptr[r]:indptr[r + 1]], sorted and
+    distinct.
+
+    Attributes
+    ----------
+    indptr : np.ndarray
+        Row offsets (n_rows + 1).
+    indices : np.ndarray
+        Item codes of the non-zero cells, row by row.
+    n_columns : int
+        Number of items.
+    """
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    n_columns: int
+
+    @classmethod
+    def from_pairs(cls, rows: np.ndarray, columns: np.ndarray, n_rows: int, n_columns: int) -> "IncidenceMatrix":
+        """
+        Build the matrix from (row, column) codes; repeated pairs count once.
+        """
+        cells = np.unique(rows.astype("int64") * n_columns + columns)
+        indptr = np.searchsorted(cells, np.arange(n_rows + 1, dtype="int64") * n_columns)
+        return cls(indptr, (cells % n_columns).astype("int32"), n_columns)
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.indptr) - 1
+
+    def column_counts(self) -> np.ndarray:
+        """
+        Number of rows of each column (item support, in orders).
+        """
+        return np.bincount(self.indices, minlength=self.n_columns)
+
+    def keep_columns(self, kept: np.ndarray) -> "IncidenceMatrix":
+        """
+        Same matrix without the cells of the columns not kept (column codes unchanged).
+        """
+        cells_kept = kept[self.indices]
+        indptr = np.r_[0, np.cumsum(cells_kept)][self.indptr]
+        return IncidenceMatrix(indptr, self.indices[cells_kept], self.n_columns)
+
+
+def _row_pairs(matrix: IncidenceMatrix, first_row: int, last_row: int) -> np.ndarray:
+    """
+    Codes (a * n_columns + b, a < b) of the item pairs of every row in [first_row, last_row).
+
+    A cell at position k of a row of s cells pairs with the s - 1 - k cells
+    after it; the pairs are enumerated for all rows at once with np.repeat.
+    """
+    start, end = matrix.indptr[first_row], matrix.indptr[last_row]
+    sizes = np.diff(matrix.indptr[first_row:last_row + 1])
+    row_ends = np.repeat(matrix.indptr[first_row + 1:last_row + 1], sizes)
+    positions = np.arange(start, end)
+    # Cells after each cell in its row
+    followers = row_ends - positions - 1
+    left = np.repeat(positions, followers)
+    # 1, 2, ... followers for each left cell
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(followers) - followers, followers) + 1
+    right = left + offsets
+    return matrix.indices[left].astype("int64") * matrix.n_columns + matrix.indices[right]
+
+
+def cooccurrences(matrix: IncidenceMatrix, chunk_rows: int = DEFAULT_CHUNK_ORDERS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Number of rows every item pair appears in together (the upper triangle of XᵀX).
+
+    Rows are processed in chunks: only the distinct pairs of a chunk and
+    the running distinct pairs are held in memory, not every pair occurrence.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Sorted pair codes (a * n_columns + b, a < b) and their counts.
+    """
+    codes, counts = np.empty(0, dtype="int64"), np.empty(0, dtype="int64")
+    for first_row in range(0, matrix.n_rows, chunk_rows):
+        chunk_codes, chunk_counts = np.unique(
+            _row_pairs(matrix, first_row, min(first_row + chunk_rows, matrix.n_rows)), return_counts=True
+        )
+        codes, inverse = np.unique(np.r_[codes, chunk_codes], return_inverse=True)
+        counts = np.bincount(inverse, weights=np.r_[counts, chunk_counts], minlength=len(codes)).astype("int64")
+    return codes, counts
+
+
+def association_rules(
+    matrix: IncidenceMatrix,
+    min_support: float = DEFAULT_MIN_SUPPORT,
+    top_k: int = DEFAULT_TOP_K,
+    chunk_rows: int = DEFAULT_CHUNK_ORDERS,
+) -> pd.DataFrame:
+    """
+    Top-k consequents of every item by lift, from the pair co-occurrences.
+
+    For a pair (a, b) seen together in n_ab of the N orders:
+    support = n_ab / N, confidence(a -> b) = n_ab / n_a and
+    lift = n_ab * N / (n_a * n_b). Pairs below the minimum support are
+    pruned, and so are, before any pair is enumerated, the items below it
+    (a pair is never more frequent than its items).
+
+    Returns
+    -------
+    pd.DataFrame
+        antecedent, consequent (item codes), pair_orders, support,
+        confidence, lift and rank (1 = highest lift) of every kept rule,
+        sorted by antecedent and rank.
+    """
+    n_orders = matrix.n_rows
+    min_orders = max(MIN_PAIR_ORDERS, math.ceil(min_support * n_orders))
+    item_orders = matrix.column_counts()
+    codes, pair_orders = cooccurrences(matrix.keep_columns(item_orders >= min_orders), chunk_rows)
+    frequent = pair_orders >= min_orders
+    codes, pair_orders = codes[frequent], pair_orders[frequent]
+
+    # Both directions of every pair
+    first, second = codes // matrix.n_columns, codes % matrix.n_columns
+    antecedents, consequents = np.r_[first, second], np.r_[second, first]
+    pair_orders = np.r_[pair_orders, pair_orders]
+    confidence = pair_orders / item_orders[antecedents]
+    lift = confidence * n_orders / item_orders[consequents]
+
+    # Rank within each antecedent: lift, then pair orders, then consequent code
+    order = np.lexsort((consequents, -pair_orders, -lift, antecedents))
+    antecedents = antecedents[order]
+    group_starts = np.flatnonzero(np.r_[True, antecedents[1:] != antecedents[:-1]]) if len(order) else order
+    ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)])) + 1
+    kept = ranks <= top_k
+    order = order[kept]
+
+    return pd.DataFrame({
+        "antecedent": antecedents[kept],
+        "consequent": consequents[order],
+        "pair_orders": pair_orders[order],
+        "support": pair_orders[order] / max(n_orders, 1),
+        "confidence": confidence[order],
+        "lift": lift[order],
+        "rank": ranks[kept],
+    })
+
+
+def _association_table(rules: pd.DataFrame, labels, name: str, columns: tuple[str, str]) -> pd.DataFrame:
+    """
+    Replace the item codes of association rules by their labels, as a registered table.
+    """
+    labels = np.asarray(labels)
+    df = rules.assign(**{
+        columns[0]: labels[rules["antecedent"].to_numpy()],
+        columns[1]: labels[rules["consequent"].to_numpy()],
+    })
+    return enforce_schema(df, name)[get_schema(name).column_names]
+
+
+def market_basket_tables(
+    order_items_df: pd.DataFrame,
+    dim_products: pd.DataFrame,
+    min_support: float = DEFAULT_MIN_SUPPORT,
+    top_k: int = DEFAULT_TOP_K,
+    chunk_orders: int = DEFAULT_CHUNK_ORDERS,
+) -> dict[str, pd.DataFrame]:
+    """
+    Product and category association tables, from the order x product and order x category matrices.
+
+    Items are encoded once: orders by pd.factorize, products by their
+    position in dim_products (items of products missing from it are left
+    out, their orders still count), categories by their code in the English category names.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        product_associations (product keys) and category_associations
+        (English category names).
+    """
+    # Every order with items counts in N, even if none of its products is known
+    order_codes, order_ids = pd.factorize(order_items_df["order_id"])
+    product_positions = pd.Index(dim_products["product_id"]).get_indexer(order_items_df["product_id"])
+    known = product_positions >= 0
+    order_codes, product_positions = order_codes[known], product_positions[known]
+
+    categories = pd.Categorical(dim_products["product_category_name_english"])
+    category_codes = categories.codes[product_positions]
+    categorized = category_codes >= 0
+
+    matrices = {
+        "product_associations": (
+            IncidenceMatrix.from_pairs(order_codes, product_positions, len(order_ids), len(dim_products)),
+            dim_products["product_key"].to_numpy(),
+            ("product_key", "associated_product_key"),
+        ),
+        "category_associations": (
+            IncidenceMatrix.from_pairs(order_codes[categorized], category_codes[categorized],
+                                       len(order_ids), len(categories.categories)),
+            categories.categories.to_numpy(),
+            ("product_category_name_english", "associated_category_name_english"),
+        ),
+    }
+    return {
+        name: _association_table(association_rules(matrix, min_support, top_k, chunk_orders), labels, name, columns)
+        for name, (matrix, labels, columns) in matrices.items()
+    }
+
+
+def build_market_basket(
+    dim_products: pd.DataFrame,
+    min_support: float = DEFAULT_MIN_SUPPORT,
+    top_k: int = DEFAULT_TOP_K,
+    chunk_orders: int = DEFAULT_CHUNK_ORDERS,
+    processed_dir: Path = PROCESSED_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Rebuild the product and category association tables (see market_basket_tables).
+
+    The cleaned items are read back from processed_dir, only with their
+    order_id and product_id.
+
+    Returns
+    -------
+    list[str]
+        Names of the written tables.
+    """
+    order_items = read_concurrently({
+        "order_items": table_read(processed_dir, "order_items_cleaned", columns=ORDER_ITEMS_COLUMNS, fmt=storage_format),
+    })["order_items"]
+
+    tables = market_basket_tables(order_items, dim_products, min_support, top_k, chunk_orders)
+    for name, df in tables.items():
+        write_table(df, modeled_dir, name, fmt=storage_format)
+    return list(tables)
+
+
+if __name__ == "__main__":
+    build_market_basket(read_concurrently({"dim_products": table_read(MODELED_DATA_DIR, "dim_products")})["dim_products"])
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+# Per-order measures: output column -> (source column, operation[, operand])
+#   "count"     : non-null values of the source column
+#   "sum"       : sum of the non-null values of the source column
+#   "any_equal" : whether any value of the source column equals the operand
+#   "count_distinct" : distinct non-null values of the source column
+ORDER_ITEMS_MEASURES = {
+    "order_items_count": ("order_item_id", "count"),
+    "order_items_total_value": ("price", "sum"),
+    "order_freight_total": ("freight_value", "sum"),
+}
+PAYMENTS_MEASURES = {
+    "order_payment_total": ("payment_value", "sum"),
+    "payment_methods_count": ("payment_type", "count"),
+    "used_voucher": ("payment_type", "any_equal", "voucher"),
+}
+
+
+def aggregate_by_codes(
+    df: pd.DataFrame,
+    codes: np.ndarray,
+    n_groups: int,
+    measures: dict[str, tuple],
+) -> pd.DataFrame:
+    """
+    Compute per-group measures from integer group codes with array primitives.
+
+    Counts, sums and any_equal are a single np.bincount over the rows;
+    count_distinct first reduces the rows to their distinct (group, value)
+    pairs with np.unique (a sort), then counts them with np.bincount. No
+    Python code runs per group. Rows with a negative code (unknown key)
+    are ignored.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows to aggregate.
+    codes : np.ndarray
+        Group code of each row, in [0, n_groups) or -1.
+    n_groups : int
+        Number of groups; the result has exactly this many rows.
+    measures : dict[str, tuple]
+        Output column -> (source column, operation[, operand]).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per group code, in code order (RangeIndex).
+    """
+    known = codes >= 0
+    if not known.all():
+        df = df.loc[known]
+        codes = codes[known]
+
+    result = {}
+    for name, (column, operation, *operand) in measures.items():
+        values = df[column]
+
+        if operation == "count":
+            result[name] = np.bincount(codes[values.notna().to_numpy()], minlength=n_groups)
+        elif operation == "sum":
+            weights = values.to_numpy(dtype="float64", na_value=np.nan)
+            weights = np.where(np.isnan(weights), 0.0, weights)
+            result[name] = np.bincount(codes, weights=weights, minlength=n_groups)
+        elif operation == "any_equal":
+            matches = values.eq(operand[0]).to_numpy(dtype=bool, na_value=False)
+            result[name] = np.bincount(codes[matches], minlength=n_groups) > 0
+        elif operation == "count_distinct":
+            value_codes, uniques = pd.factorize(values)
+            present = value_codes >= 0
+            # Distinct (group, value) pairs, as one int64 per pair
+            pairs = np.unique(codes[present].astype("int64") * max(len(uniques), 1) + value_codes[present])
+            result[name] = np.bincount(pairs // max(len(uniques), 1), minlength=n_groups)
+        else:
+            raise ValueError(f"Unknown aggregation operation: {operation!r}")
+
+    return pd.DataFrame(result)
+
+
+def aggregate_per_order(df: pd.DataFrame, measures: dict[str, tuple]) -> pd.DataFrame:
+    """
+    Aggregate rows to one row per order_id, sorted by order_id.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows with an order_id column.
+    measures : dict[str, tuple]
+        Output column -> (source column, operation[, operand]).
+
+    Returns
+    -------
+    pd.DataFrame
+        order_id followed by the measures.
+    """
+    codes, order_ids = pd.factorize(df["order_id"], sort=True)
+    agg_df = aggregate_by_codes(df, codes, len(order_ids), measures)
+    agg_df.insert(0, "order_id", order_ids)
+
+    return agg_df
+
+
+def order_measures(
+    orders_df: pd.DataFrame,
+    order_items_df: pd.DataFrame,
+    payments_df: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Compute all per-order item and payment measures, aligned with orders_df.
+
+    order_id is hashed once, into an index over the distinct order_ids of
+    the orders table; items and payments are encoded against it, and the
+    measures are taken back to the orders rows, so they come out
+    row-aligned with orders_df and can be attached without a merge. Orders
+    rows sharing an order_id get the same measures, as with a merge.
+
+    Parameters
+    ----------
+    orders_df : pd.DataFrame
+        Cleaned orders.
+    order_items_df : pd.DataFrame
+        Cleaned order items.
+    payments_df : pd.DataFrame
+        Cleaned payments.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per order, in orders_df order and with its index. Orders
+        without items or payments get zero counts and totals.
+    """
+    # Codes of the orders rows into the distinct order_ids (get_indexer needs unique values)
+    order_codes, order_ids = pd.factorize(orders_df["order_id"])
+    order_index = pd.Index(order_ids)
+    n_orders = len(order_index)
+
+    items = aggregate_by_codes(
+        order_items_df, order_index.get_indexer(order_items_df["order_id"]), n_orders, ORDER_ITEMS_MEASURES
+    )
+    payments = aggregate_by_codes(
+        payments_df, order_index.get_indexer(payments_df["order_id"]), n_orders, PAYMENTS_MEASURES
+    )
+
+    measures_df = pd.concat([items, payments], axis=1).take(order_codes)
+    measures_df.index = orders_df.index
+
+    return measures_df
@@ -1,6 +1,10 @@
 from pathlib import Path
 import pandas as pd
 
+from modeling.order_aggregation import ORDER_ITEMS_MEASURES, aggregate_per_order
+from schemas.registry import enforce_schema
+from storage.tables import read_table, write_table
+
 MODELED_DATA_DIR = Path("data/modeled/olist")
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 
@@ -13,21 +17,15 @@ def order_items_aggregation(df : pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         Aggregated order items dataframe with total_items, total_value and freight value per order_id.
     """
-    agg_df = df.groupby("order_id").agg(
-        order_items_count=pd.NamedAgg(column="order_item_id", aggfunc="count"),
-        order_items_total_value=pd.NamedAgg(column="price", aggfunc="sum"),
-        order_freight_total=pd.NamedAgg(column="freight_value", aggfunc="sum"),
-    ).reset_index()
+    agg_df = aggregate_per_order(df, ORDER_ITEMS_MEASURES)
 
-    return agg_df
+    return enforce_schema(agg_df, "order_items_aggregated")
 
 if __name__ == "__main__":
-    order_item_path = PROCESSED_DATA_DIR / "order_items_cleaned.csv"
-
-    agg_df = pd.read_csv(order_item_path)
+    agg_df = read_table(
+        PROCESSED_DATA_DIR, "order_items_cleaned",
+        columns=["order_id", "order_item_id", "price", "freight_value"],
+    )
     agg_df = order_items_aggregation(agg_df)
-    
-    output_path = MODELED_DATA_DIR / "order_items_aggregated.csv"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    agg_df.to_csv(output_path, index=False)
\ No newline at end of file
+
+    write_table(agg_df, MODELED_DATA_DIR, "order_items_aggregated")
\ No newline at end of file
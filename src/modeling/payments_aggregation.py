@@ -1,6 +1,10 @@
 from pathlib import Path
 import pandas as pd
 
+from modeling.order_aggregation import PAYMENTS_MEASURES, aggregate_per_order
+from schemas.registry import enforce_schema
+from storage.tables import read_table, write_table
+
 PROCESSED_DATA_DIR = Path("data/processed/olist")
 MODELED_DATA_DIR = Path("data/modeled/olist")
 
@@ -13,28 +17,15 @@ def payments_aggregation(df : pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         Aggregated payments dataframe with total_payment_value and payment_count per order_id.
     """
-    agg_df = (
-    df.groupby("order_id")
-      .agg(
-          order_payment_total=("payment_value", "sum"),
-          payment_methods_count=("payment_type", "count"),
-          used_voucher=("payment_type", lambda x: "voucher" in x.values),
-      )
-      .reset_index()
-    )
-
+    agg_df = aggregate_per_order(df, PAYMENTS_MEASURES)
 
-    return agg_df
+    return enforce_schema(agg_df, "payments_aggregated")
 
 if __name__ == "__main__":
-    payments_path = PROCESSED_DATA_DIR / "payments_cleaned.csv"
-    MODELED_DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-    agg_df = pd.read_csv(payments_path)
+    agg_df = read_table(
+        PROCESSED_DATA_DIR, "payments_cleaned",
+        columns=["order_id", "payment_type", "payment_value"],
+    )
     agg_df = payments_aggregation(agg_df)
 
-    
-    output_path = MODELED_DATA_DIR / "payments_aggregated.csv"
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    agg_df.to_csv(output_path, index=False)
\ No newline at end of file
+    write_table(agg_df, MODELED_DATA_DIR, "payments_aggregated")
\ No newline at end of file
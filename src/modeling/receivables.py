@@ -0,0 +1,189 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from schemas.registry import enforce_schema, get_schema
+from storage.concurrent_io import read_concurrently, table_read
+from storage.partitions import PartitionedTableWriter
+from storage.tables import DEFAULT_FORMAT, TableWriter, write_table
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Installment rows expanded and written at once (bounds the memory of the expansion)
+DEFAULT_CHUNK_ROWS = 1_000_000
+PAYMENTS_COLUMNS = ["order_id", "payment_sequential", "payment_type", "payment_installments", "payment_value"]
+
+def expand_installments(payments_df: pd.DataFrame, purchase_months: np.ndarray) -> pd.DataFrame:
+    """
+    One row per installment of every payment, with array arithmetic only.
+
+    A payment of n installments (0 counts as 1) is paid in n equal parts,
+    the k-th due in the k-th month from the purchase month (the first in
+    the purchase month itself). Rows are np.repeat of the payments, and
+    each row's installment number is its offset from the first row of its
+    payment.
+
+    Parameters
+    ----------
+    payments_df : pd.DataFrame
+        Cleaned payments.
+    purchase_months : np.ndarray
+        Purchase month of each payment's order, as months since 1970-01.
+
+    Returns
+    -------
+    pd.DataFrame
+        payment_installments rows, in payment order.
+    """
+    counts = np.maximum(payments_df["payment_installments"].to_numpy(dtype="int64"), 1)
+    payment_rows = np.repeat(np.arange(len(payments_df)), counts)
+    first_rows = np.cumsum(counts) - counts
+    installment_numbers = np.arange(len(payment_rows)) - np.repeat(first_rows, counts) + 1
+    due_months = purchase_months[payment_rows] + installment_numbers - 1
+
+    return pd.DataFrame({
+        "order_id": payments_df["order_id"].array.take(payment_rows),
+        "payment_sequential": payments_df["payment_sequential"].to_numpy()[payment_rows],
+        "payment_type": payments_df["payment_type"].array.take(payment_rows),
+        "installment_number": installment_numbers,
+        "payment_installments": counts[payment_rows],
+        "due_date": due_months.astype("datetime64[M]").astype("datetime64[ns]"),
+        "installment_value": (payments_df["payment_value"].to_numpy(dtype="float64") / counts)[payment_rows],
+    })
+
+def monthly_receivables(
+    purchase_months: np.ndarray,
+    counts: np.ndarray,
+    installment_values: np.ndarray,
+    type_codes: np.ndarray,
+    n_types: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Installments due and their value per (month, payment type), without expanding the payments.
+
+    A payment adds its installment value (and 1 installment) to every month
+    from its purchase month to the month of its last installment: +value at
+    the first month and -value after the last one in a difference array,
+    then a running sum over the months of each type. Time and memory are
+    linear in the payments and the months, and the result does not depend
+    on how the installments are chunked.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Installments count and expected inflow, shape (n_months, n_types),
+        months counted from the first purchase month.
+    """
+    first_month = int(purchase_months.min()) if len(purchase_months) else 0
+    starts = purchase_months - first_month
+    n_months = int((starts + counts).max()) if len(starts) else 0
+    # One extra month for the -value after the last installments
+    size = (n_months + 1) * n_types
+    start_cells, end_cells = starts * n_types + type_codes, (starts + counts) * n_types + type_codes
+    due = np.bincount(start_cells, minlength=size) - np.bincount(end_cells, minlength=size)
+    values = np.nan_to_num(installment_values)
+    inflow = np.bincount(start_cells, weights=values, minlength=size) - np.bincount(end_cells, weights=values,
+                                                                                     minlength=size)
+    return (
+        np.cumsum(due.reshape(-1, n_types), axis=0)[:n_months],
+        np.cumsum(inflow.reshape(-1, n_types), axis=0)[:n_months],
+    )
+
+def _chunk_bounds(counts: np.ndarray, chunk_rows: int) -> np.ndarray:
+    """
+    Payment positions splitting the payments into chunks of about chunk_rows installments.
+
+    A chunk ends at the last payment whose installments end before the next
+    multiple of chunk_rows (a single larger payment is a chunk of its own).
+    There is always at least one (possibly empty) chunk.
+    """
+    ends = np.cumsum(counts)
+    total = int(ends[-1]) if len(ends) else 0
+    cuts = np.searchsorted(ends, np.arange(chunk_rows, total, chunk_rows), side="right")
+    return np.r_[0, np.unique(np.r_[cuts[cuts > 0], len(counts)])]
+
+def build_receivables(
+    fact_df: pd.DataFrame,
+    partitioned: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    processed_dir: Path = PROCESSED_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Expand the cleaned payments into installments and aggregate the expected monthly inflow.
+
+    The expansion multiplies the rows (up to 24 installments per payment),
+    so it is never held in memory as a whole: payments are expanded in
+    chunks of about chunk_rows installments (see expand_installments), and
+    every chunk is appended to payment_installments, a single streamed file
+    or, with partitioned, Hive-style partitions by due month
+    (payment_installments/due_month=YYYY-MM/). The month x payment type
+    receivables_monthly table comes from the payments directly (see
+    monthly_receivables). Time and memory are linear in the rows.
+
+    Payments are dated by their order's purchase timestamp in fact_orders;
+    payments of orders missing from it or without a purchase timestamp are
+    left out. The cleaned payments are read back from processed_dir.
+
+    Returns
+    -------
+    list[str]
+        Names of the written tables.
+    """
+    payments = read_concurrently({
+        "payments": table_read(processed_dir, "payments_cleaned", columns=PAYMENTS_COLUMNS, fmt=storage_format),
+    })["payments"]
+
+    order_positions = pd.Index(fact_df["order_id"]).get_indexer(payments["order_id"])
+    purchase_timestamps = fact_df["order_purchase_timestamp"].to_numpy()
+    dated = order_positions >= 0
+    dated[dated] = ~np.isnat(purchase_timestamps[order_positions[dated]])
+    payments = payments[dated].reset_index(drop=True)
+    purchase_months = purchase_timestamps[order_positions[dated]].astype("datetime64[M]").astype("int64")
+
+    counts = np.maximum(payments["payment_installments"].to_numpy(dtype="int64"), 1)
+    type_codes, payment_types = pd.factorize(payments["payment_type"], sort=True)
+    # Missing payment types get the last code
+    n_types = len(payment_types) + 1
+    type_codes = np.where(type_codes < 0, len(payment_types), type_codes)
+    installments_count, expected_inflow = monthly_receivables(
+        purchase_months, counts, payments["payment_value"].to_numpy(dtype="float64") / counts, type_codes, n_types,
+    )
+    first_month = int(purchase_months.min()) if len(payments) else 0
+    month_labels = np.datetime_as_string(
+        (np.arange(len(installments_count)) + first_month).astype("datetime64[M]"), unit="M"
+    ).astype(object)
+
+    if partitioned:
+        writer = PartitionedTableWriter(modeled_dir, "payment_installments", "due_month", "due_date", storage_format)
+    else:
+        writer = TableWriter(modeled_dir, "payment_installments", storage_format)
+    with writer:
+        bounds = _chunk_bounds(counts, chunk_rows)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            installments = expand_installments(payments.iloc[start:end], purchase_months[start:end])
+            if partitioned:
+                month_codes = installments["due_date"].to_numpy().astype("datetime64[M]").astype("int64") - first_month
+                writer.write(installments, month_labels[month_codes])
+            else:
+                writer.write(installments)
+
+    months, types = np.nonzero(installments_count)
+    type_labels = np.append(np.asarray(payment_types, dtype=object), None)
+    receivables = pd.DataFrame({
+        "due_month": month_labels[months],
+        "payment_type": type_labels[types],
+        "installments_count": installments_count[months, types],
+        "expected_inflow": expected_inflow[months, types],
+    })
+    receivables = enforce_schema(receivables, "receivables_monthly")[get_schema("receivables_monthly").column_names]
+    write_table(receivables, modeled_dir, "receivables_monthly", fmt=storage_format)
+    return ["payment_installments", "receivables_monthly"]
+
+if __name__ == "__main__":
+    fact_orders = read_concurrently({
+        "fact_orders": table_read(MODELED_DATA_DIR, "fact_orders", columns=["order_id", "order_purchase_timestamp"]),
+    })["fact_orders"]
+    build_receivables(fact_orders)
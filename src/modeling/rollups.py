@@ -0,0 +1,309 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from modeling.date_dimension import year_month
+from modeling.order_aggregation import aggregate_by_codes
+from schemas.registry import enforce_schema
+from storage.concurrent_io import get_io_pool, read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, read_table, table_path, write_table
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+STATE_DIR = Path("data/cache/olist/rollups")
+
+# Rollup -> (dimensions besides the day, measures as in modeling.order_aggregation)
+# Every measure is additive over days, so the monthly tables are sums of the
+# daily ones. orders_count of categories / payment types counts the orders
+# having at least one item / payment of the group: it adds up over days and
+# states, not over categories or payment types (an order may have several).
+ROLLUPS = {
+    "orders": (("customer_state",), {
+        "orders_count": ("order_id", "count"),
+        "items_count": ("order_items_count", "sum"),
+        "items_total_value": ("order_items_total_value", "sum"),
+        "freight_total": ("order_freight_total", "sum"),
+        "payment_total": ("order_payment_total", "sum"),
+        "voucher_orders": ("used_voucher", "sum"),
+        "delivered_orders": ("delivery_duration_days", "count"),
+        "delivery_duration_days_sum": ("delivery_duration_days", "sum"),
+        "delivery_delay_count": ("delivery_delay_days", "count"),
+        "delivery_delay_days_sum": ("delivery_delay_days", "sum"),
+    }),
+    "categories": (("customer_state", "product_category_name_english"), {
+        "orders_count": ("order_id", "count_distinct"),
+        "items_count": ("order_id", "count"),
+        "items_total_value": ("price", "sum"),
+        "freight_total": ("freight_value", "sum"),
+    }),
+    "payments": (("customer_state", "payment_type"), {
+        "orders_count": ("order_id", "count_distinct"),
+        "payments_count": ("order_id", "count"),
+        "payment_total": ("payment_value", "sum"),
+    }),
+}
+# Columns of the cleaned child tables the rollups need
+ORDER_ITEMS_COLUMNS = ["order_id", "product_id", "price", "freight_value"]
+PAYMENTS_COLUMNS = ["order_id", "payment_type", "payment_value"]
+
+def rollup_sources(
+    fact_df: pd.DataFrame,
+    order_items_df: pd.DataFrame,
+    payments_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    dim_products: pd.DataFrame,
+) -> dict[str, pd.DataFrame]:
+    """
+    Rows of each rollup, with their purchase day and dimension values.
+
+    Orders get the state of their customer through customer_key; items and
+    payments get the day and state of their order, and items the English
+    category of their product. Orders without a purchase date, and items or
+    payments of orders missing from fact_df, are left out.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        Rollup name -> rows with a "date" column (day, datetime64), the
+        rollup dimensions and the measure source columns.
+    """
+    dated = fact_df["order_purchase_timestamp"].notna().to_numpy()
+    fact_df = fact_df[dated]
+    # Integer join on the surrogate key; customers missing from the dimension get no state
+    customer_positions = pd.Index(dim_customers["customer_key"]).get_indexer(fact_df["customer_key"])
+    orders = pd.DataFrame({
+        "date": fact_df["order_purchase_timestamp"].dt.normalize().to_numpy(),
+        "customer_state": dim_customers["customer_state"].array.take(customer_positions, allow_fill=True),
+        **{column: fact_df[column].array for column, *_ in ROLLUPS["orders"][1].values()},
+    })
+
+    # Day and state of the order of every child row (order_id is encoded once)
+    order_index = pd.Index(fact_df["order_id"])
+
+    def order_attributes(child_df):
+        positions = order_index.get_indexer(child_df["order_id"])
+        known = positions >= 0
+        child_df = child_df[known]
+        positions = positions[known]
+        return child_df, {
+            "date": orders["date"].to_numpy()[positions],
+            "customer_state": orders["customer_state"].array.take(positions),
+            "order_id": child_df["order_id"].array,
+        }
+
+    order_items_df, attributes = order_attributes(order_items_df)
+    product_positions = pd.Index(dim_products["product_id"]).get_indexer(order_items_df["product_id"])
+    categories = pd.DataFrame({
+        **attributes,
+        "product_category_name_english": dim_products["product_category_name_english"].array.take(
+            product_positions, allow_fill=True,
+        ),
+        "price": order_items_df["price"].array,
+        "freight_value": order_items_df["freight_value"].array,
+    })
+
+    payments_df, attributes = order_attributes(payments_df)
+    payments = pd.DataFrame({
+        **attributes,
+        "payment_type": payments_df["payment_type"].array,
+        "payment_value": payments_df["payment_value"].array,
+    })
+
+    return {"orders": orders, "categories": categories, "payments": payments}
+
+def aggregate_daily(rows: pd.DataFrame, rollup: str) -> pd.DataFrame:
+    """
+    Aggregate the rows of a rollup to one row per day and dimension values.
+
+    Group codes come from one groupby; every measure is then computed with
+    np.bincount over the codes (and np.unique for distinct counts, see
+    modeling.order_aggregation.aggregate_by_codes).
+    """
+    dimensions, measures = ROLLUPS[rollup]
+    grouped = rows.groupby(["date", *dimensions], observed=True, dropna=False, sort=True)
+    agg_df = aggregate_by_codes(rows, grouped.ngroup().to_numpy(), grouped.ngroups, measures)
+
+    return pd.concat([grouped.size().index.to_frame(index=False), agg_df], axis=1)
+
+def _to_monthly(daily_df: pd.DataFrame, rollup: str) -> pd.DataFrame:
+    """
+    Sum daily rollup rows into monthly ones.
+    """
+    dimensions, measures = ROLLUPS[rollup]
+    monthly_df = daily_df.assign(year_month=year_month(daily_df["date"]))
+    monthly_df = monthly_df.groupby(["year_month", *dimensions], observed=True, dropna=False, sort=True)[
+        list(measures)
+    ].sum().reset_index()
+
+    return enforce_schema(monthly_df, f"rollup_{rollup}_monthly")
+
+def _day_hashes(sources: dict[str, pd.DataFrame]) -> pd.Series:
+    """
+    Content hash of each day: all the rows of all the rollups falling on it.
+
+    Row hashes are added up per day (wrapping uint64 sums), so the hash does
+    not depend on row order; it changes when a row, or the state / category
+    it is attributed to, changes.
+    """
+    days = pd.DatetimeIndex(np.unique(np.concatenate([rows["date"].to_numpy() for rows in sources.values()])))
+    hashes = np.zeros(len(days), dtype="uint64")
+    for name, rows in sources.items():
+        row_hashes = pd.util.hash_pandas_object(rows.assign(_rollup=name), index=False).to_numpy()
+        np.add.at(hashes, days.get_indexer(rows["date"]), row_hashes)
+
+    return pd.Series(hashes, index=days, dtype="uint64")
+
+def _load_day_hashes(state_dir: Path) -> pd.Series:
+    if not table_path(state_dir, "day_hashes", "parquet").exists():
+        return pd.Series(dtype="uint64", index=pd.DatetimeIndex([]))
+    day_hashes = read_table(state_dir, "day_hashes", fmt="parquet")
+    return day_hashes.set_index("date")["state_hash"]
+
+def refresh_rollups(
+    fact_df: pd.DataFrame,
+    order_items_df: pd.DataFrame,
+    payments_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    dim_products: pd.DataFrame,
+    since: pd.Timestamp | None = None,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    state_dir: Path = STATE_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Bring the daily and monthly rollup tables up to date, one day at a time.
+
+    Each day has a content hash of its source rows. Only the days that are
+    new, changed or gone since the last refresh are aggregated again; their
+    rows replace the previous ones in the daily tables, and the months they
+    fall in are summed again from the daily tables. Other rows are kept.
+
+    Parameters
+    ----------
+    fact_df : pd.DataFrame
+        Fact orders (with customer_key).
+    order_items_df, payments_df : pd.DataFrame
+        Cleaned order items and payments (at least ORDER_ITEMS_COLUMNS / PAYMENTS_COLUMNS).
+    dim_customers, dim_products : pd.DataFrame
+        Customer and product dimensions (state, English category).
+    since : pd.Timestamp | None
+        When given, the sources only cover the days from this one on (e.g.
+        an incremental refresh window): earlier days are left as they are.
+    modeled_dir : Path
+        Directory of the rollup tables.
+    state_dir : Path
+        Directory of the per-day content hashes.
+    storage_format : str
+        Storage format of the rollup tables.
+
+    Returns
+    -------
+    list[str]
+        Days (YYYY-MM-DD) whose rollup rows were recomputed or removed.
+    """
+    sources = rollup_sources(fact_df, order_items_df, payments_df, dim_customers, dim_products)
+    if since is not None:
+        sources = {name: rows[rows["date"] >= since] for name, rows in sources.items()}
+
+    day_hashes = _day_hashes(sources)
+    stored_hashes = _load_day_hashes(state_dir)
+    if not all(
+        table_path(modeled_dir, f"rollup_{rollup}_{grain}", storage_format).exists()
+        for rollup in ROLLUPS for grain in ("daily", "monthly")
+    ):
+        # Missing tables: rebuild every day the sources cover
+        stored_hashes = stored_hashes.iloc[:0]
+
+    in_scope = stored_hashes.index >= since if since is not None else np.ones(len(stored_hashes), dtype=bool)
+    # Compare as uint64 arrays: reindexing would turn missing hashes into floats
+    stored_positions = stored_hashes.index.get_indexer(day_hashes.index)
+    previous_hashes = stored_hashes.to_numpy()[np.maximum(stored_positions, 0)] if len(stored_hashes) else 0
+    changed_days = day_hashes.index[(stored_positions < 0) | (previous_hashes != day_hashes.to_numpy())]
+    removed_days = stored_hashes.index[in_scope & ~stored_hashes.index.isin(day_hashes.index)]
+    stale_days = changed_days.union(removed_days)
+
+    if stale_days.empty:
+        print("Rollups are up to date.")
+        return []
+
+    stale_months = set(year_month(stale_days.to_series()))
+    stored = {}
+    if len(stored_hashes):
+        # Every stored rollup table is loaded at once
+        stored = read_concurrently({
+            name: table_read(modeled_dir, name, fmt=storage_format)
+            for rollup in ROLLUPS for name in (f"rollup_{rollup}_daily", f"rollup_{rollup}_monthly")
+        })
+
+    io_pool, writes = get_io_pool(), []
+    for rollup, rows in sources.items():
+        daily_name, monthly_name = f"rollup_{rollup}_daily", f"rollup_{rollup}_monthly"
+        recomputed = aggregate_daily(rows[rows["date"].isin(changed_days)], rollup)
+
+        if stored:
+            daily_df = stored[daily_name]
+            daily_df["date"] = pd.to_datetime(daily_df["date"])
+            daily_df = pd.concat([daily_df[~daily_df["date"].isin(stale_days)], recomputed], ignore_index=True)
+            monthly_df = stored[monthly_name]
+            monthly_df = monthly_df[~monthly_df["year_month"].astype(str).isin(stale_months)]
+        else:
+            daily_df = recomputed
+            monthly_df = None
+
+        dimensions, _ = ROLLUPS[rollup]
+        daily_df = daily_df.sort_values(["date", *dimensions], ignore_index=True)
+        months = year_month(daily_df["date"])
+        new_monthly = _to_monthly(daily_df[months.isin(stale_months).to_numpy()], rollup)
+        monthly_df = new_monthly if monthly_df is None else pd.concat([monthly_df, new_monthly], ignore_index=True)
+        monthly_df = monthly_df.sort_values(["year_month", *dimensions], ignore_index=True)
+
+        daily_df["date"] = daily_df["date"].dt.date
+        writes += [
+            io_pool.write_in_background(enforce_schema(daily_df, daily_name), modeled_dir, daily_name, storage_format),
+            io_pool.write_in_background(enforce_schema(monthly_df, monthly_name), modeled_dir, monthly_name, storage_format),
+        ]
+
+    # The day hashes are only saved once every table is written
+    for write in writes:
+        write.result()
+
+    # Keep the hashes of the days out of scope, replace the others
+    day_hashes = pd.concat([stored_hashes[~in_scope], day_hashes]) if len(stored_hashes) else day_hashes
+    write_table(
+        day_hashes.rename("state_hash").rename_axis("date").reset_index(), state_dir, "day_hashes", fmt="parquet",
+    )
+
+    print(f"Refreshed rollups for {len(stale_days)} days.")
+    return [day.strftime("%Y-%m-%d") for day in stale_days]
+
+def build_rollups(
+    fact_df: pd.DataFrame,
+    dim_customers: pd.DataFrame,
+    dim_products: pd.DataFrame,
+    processed_dir: Path = PROCESSED_DATA_DIR,
+    modeled_dir: Path = MODELED_DATA_DIR,
+    state_dir: Path = STATE_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+) -> list[str]:
+    """
+    Refresh the rollups from fact_orders and the stored cleaned items and payments.
+
+    The cleaned items and payments are read back from processed_dir (every
+    execution mode writes them there before fact_orders is built), only
+    with the columns the rollups need. See refresh_rollups.
+    """
+    stored = read_concurrently({
+        "order_items": table_read(processed_dir, "order_items_cleaned", columns=ORDER_ITEMS_COLUMNS, fmt=storage_format),
+        "payments": table_read(processed_dir, "payments_cleaned", columns=PAYMENTS_COLUMNS, fmt=storage_format),
+    })
+
+    return refresh_rollups(
+        fact_df, stored["order_items"], stored["payments"], dim_customers, dim_products,
+        modeled_dir=modeled_dir, state_dir=state_dir, storage_format=storage_format,
+    )
+
+if __name__ == "__main__":
+    modeled = read_concurrently({
+        name: table_read(MODELED_DATA_DIR, name) for name in ("fact_orders", "dim_customers", "dim_products")
+    })
+    build_rollups(modeled["fact_orders"], modeled["dim_customers"], modeled["dim_products"])
@@ -0,0 +1,280 @@
+import csv
+import io
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+
+from cleaning.order_items_cleaning import clean_order_items_chunk
+from cleaning.orders_cleaning import clean_orders_chunk
+from cleaning.payments_cleaning import clean_payments_chunk
+from cleaning.rules import rejects_writer, write_rejects
+from modeling.fact_orders import fact_orders_from_cleaned
+from modeling.order_items_aggregation import order_items_aggregation
+from modeling.payments_aggregation import payments_aggregation
+from modeling.geolocation import attach_order_distances
+from modeling.surrogate_keys import KEYS_DIR, add_surrogate_keys
+from orchestration.metrics import capture_metrics, record_bytes_read, record_nat_coercions, record_rejects
+from schemas.registry import SCHEMAS, enforce_schema, get_schema, read_raw_table
+from storage.concurrent_io import read_concurrently, table_read
+from storage.tables import DEFAULT_FORMAT, read_table, table_path, write_table
+
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+
+# Raw tables joined on order_id, sharded together
+SHARDED_TABLES = ("orders", "order_items", "payments")
+# Position of a raw row in its file: byte range index * ROW_RANGE_STRIDE + row within the range
+ROW_COLUMN = "_row"
+ROW_RANGE_STRIDE = 1 << 40
+
+def default_shards() -> int:
+    return os.cpu_count() or 1
+
+def shard_of(order_ids: pd.Series, n_shards: int) -> pd.Series:
+    """
+    Shard of each order_id (the same hash streaming mode buckets with).
+    """
+    return pd.util.hash_pandas_object(order_ids, index=False) % n_shards
+
+def _byte_ranges(csv_path: Path, n_ranges: int) -> list[tuple[int, int]]:
+    """
+    Split a CSV (header excluded) into byte ranges ending on line boundaries.
+
+    The sharded raw files have no quoted line breaks, so every line is a row.
+    """
+    size = Path(csv_path).stat().st_size
+    with open(csv_path, "rb") as f:
+        f.readline()
+        boundaries = [f.tell()]
+        for i in range(1, n_ranges):
+            f.seek(max(boundaries[-1], size * i // n_ranges))
+            f.readline()
+            boundaries.append(min(f.tell(), size))
+    boundaries.append(size)
+
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+def _read_header(csv_path: Path, table: str) -> list[str]:
+    """
+    Column names of a raw CSV, from its header line, checked against the registered schema.
+
+    Raises
+    ------
+    ValueError
+        If registered columns are missing from the header.
+    """
+    with open(csv_path, newline="") as f:
+        header = next(csv.reader(f), [])
+    schema = get_schema(table)
+    missing_columns = set(schema.column_names) - set(header)
+    if missing_columns:
+        raise ValueError(f"Missing columns in {schema.label} dataset: {missing_columns}")
+    return header
+
+def _partition_range(
+    csv_path: Path,
+    table: str,
+    names: list[str],
+    range_index: int,
+    start: int,
+    end: int,
+    n_shards: int,
+    shard_dir: Path,
+) -> dict[str, int]:
+    """
+    Parse one byte range of a raw CSV and write its rows to per-shard files.
+
+    The range has no header line: its columns are named after the file's
+    header (names), so files with reordered columns parse as in a
+    single-process run.
+
+    Returns the timestamp values coerced to NaT per column, for the parent process.
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    with capture_metrics() as metrics:
+        df = read_raw_table(io.BytesIO(data), table, header=None, names=names)
+    df[ROW_COLUMN] = range_index * ROW_RANGE_STRIDE + pd.RangeIndex(len(df))
+    shards = shard_of(df["order_id"], n_shards).to_numpy()
+
+    for shard, rows in df.groupby(shards, sort=False):
+        write_table(rows, shard_dir / f"shard_{shard}", f"{table}_{range_index:05d}", fmt="parquet")
+
+    return metrics.nat_coercions
+
+def _read_shard(shard_dir: Path, table: str, n_ranges: int) -> pd.DataFrame:
+    """
+    Read the raw rows of a table in a shard, in raw file order.
+    """
+    parts = [
+        read_table(shard_dir, f"{table}_{range_index:05d}", fmt="parquet")
+        for range_index in range(n_ranges)
+        if table_path(shard_dir, f"{table}_{range_index:05d}", "parquet").exists()
+    ]
+    if not parts:
+        return enforce_schema(pd.DataFrame(columns=[*get_schema(table).column_names, ROW_COLUMN]), table)
+    return enforce_schema(pd.concat(parts, ignore_index=True), table)
+
+def _process_shard(shard_dir: Path, n_ranges: dict[str, int]) -> dict[str, int]:
+    """
+    Clean, aggregate and model the orders of one shard.
+
+    Outputs, rejected rows included, are written next to the shard's raw
+    rows; the counts of rows rejected by each cleaning rule are returned to
+    the parent process.
+    """
+    output_dir = shard_dir / "output"
+    with capture_metrics() as metrics:
+        with rejects_writer("orders", output_dir) as rejects:
+            orders = clean_orders_chunk(_read_shard(shard_dir, "orders", n_ranges["orders"]), rejects=rejects)
+        with rejects_writer("order_items", output_dir) as rejects:
+            order_items = clean_order_items_chunk(
+                _read_shard(shard_dir, "order_items", n_ranges["order_items"]), rejects=rejects,
+            )
+        with rejects_writer("payments", output_dir) as rejects:
+            payments = clean_payments_chunk(_read_shard(shard_dir, "payments", n_ranges["payments"]), rejects=rejects)
+
+    # Surrogate keys are assigned by the parent process, which owns the key maps
+    fact_df = fact_orders_from_cleaned(orders, order_items, payments, keys_dir=None)
+    # fact_orders has one row per cleaned order, in the same order
+    fact_df[ROW_COLUMN] = orders[ROW_COLUMN].to_numpy()
+
+    outputs = {
+        "orders_cleaned": orders,
+        "order_items_cleaned": order_items,
+        "payments_cleaned": payments,
+        "order_items_aggregated": order_items_aggregation(order_items),
+        "payments_aggregated": payments_aggregation(payments),
+        "fact_orders": fact_df,
+    }
+    for name, df in outputs.items():
+        write_table(df, output_dir, name, fmt="parquet")
+
+    return metrics.rejects
+
+def _combine_shards(shard_dirs: list[Path], name: str) -> pd.DataFrame:
+    """
+    Concatenate a shard output and restore the row order of the single-process run.
+    """
+    outputs = read_concurrently({
+        shard: table_read(shard_dir / "output", name, fmt="parquet") for shard, shard_dir in enumerate(shard_dirs)
+    })
+    parts = [outputs[shard] for shard in range(len(shard_dirs))]
+    # A single-process run gets the sorted categories of the whole file: their union over the shards
+    for column in parts[0].select_dtypes("category").columns:
+        categories = sorted(set().union(*(part[column].cat.categories for part in parts)))
+        for part in parts:
+            part[column] = part[column].cat.set_categories(categories)
+    df = pd.concat(parts, ignore_index=True)
+
+    if ROW_COLUMN in df.columns:
+        # Cleaned tables, reject tables and fact_orders follow the raw file order
+        df = df.sort_values(ROW_COLUMN, ignore_index=True).drop(columns=ROW_COLUMN)
+    else:
+        # Aggregations are sorted by order_id
+        df = df.sort_values("order_id", ignore_index=True)
+
+    return enforce_schema(df, name) if name in SCHEMAS else df
+
+def sharded_fact_orders(
+    order_distances: pd.DataFrame | None,
+    orders_path: Path,
+    order_items_path: Path,
+    payments_path: Path,
+    n_shards: int | None = None,
+    processed_dir: Path | None = PROCESSED_DATA_DIR,
+    modeled_dir: Path | None = MODELED_DATA_DIR,
+    storage_format: str = DEFAULT_FORMAT,
+    keys_dir: Path = KEYS_DIR,
+    rejects_dir: Path | None = None,
+) -> pd.DataFrame:
+    """
+    Clean, aggregate and model orders, items and payments on all cores.
+
+    The three raw files are hash-partitioned by order_id into n_shards
+    shards (each file is parsed in parallel byte ranges); every shard then
+    runs the cleaning rules, both aggregations and fact_orders in its own
+    process. An order and all its items and payments land in the same
+    shard, with their rows in raw file order, so the combined outputs are
+    identical to the single-process run.
+
+    Parameters
+    ----------
+    order_distances : pd.DataFrame | None
+        Mean customer -> seller distance per order (see modeling.geolocation);
+        None leaves seller_distance_km missing.
+    orders_path, order_items_path, payments_path : Path
+        Raw CSV files.
+    n_shards : int | None
+        Number of shards and worker processes (default: one per CPU).
+    processed_dir : Path | None
+        When given, the cleaned orders, items and payments are written there.
+    modeled_dir : Path | None
+        When given, the two aggregated tables are written there.
+    storage_format : str
+        Storage format of the written tables.
+    keys_dir : Path
+        Directory of the surrogate key maps.
+    rejects_dir : Path | None
+        When given, the rows rejected by the cleaning rules are written
+        there, with their reason codes.
+
+    Returns
+    -------
+    pd.DataFrame
+        Fact orders dataframe.
+    """
+    n_shards = n_shards or default_shards()
+    raw_paths = dict(zip(SHARDED_TABLES, (orders_path, order_items_path, payments_path)))
+    # Fresh interpreters: forking a process with running threads is unsafe
+    context = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory(prefix="shards_") as tmp_dir, \
+            ProcessPoolExecutor(max_workers=n_shards, mp_context=context) as executor:
+        tmp_dir = Path(tmp_dir)
+        shard_dirs = [tmp_dir / f"shard_{shard}" for shard in range(n_shards)]
+
+        # 1. Hash-partition the raw rows, one task per byte range of each file
+        n_ranges, tasks = {}, []
+        for table, raw_path in raw_paths.items():
+            record_bytes_read(raw_path)
+            names = _read_header(raw_path, table)
+            ranges = _byte_ranges(raw_path, n_shards)
+            n_ranges[table] = len(ranges)
+            tasks += [
+                executor.submit(_partition_range, raw_path, table, names, i, start, end, n_shards, tmp_dir)
+                for i, (start, end) in enumerate(ranges)
+            ]
+        for task in tasks:
+            for column, count in task.result().items():
+                record_nat_coercions(column, count)
+
+        # 2. Clean, aggregate and model each shard
+        for rejects in executor.map(_process_shard, shard_dirs, [n_ranges] * n_shards):
+            for rule, count in rejects.items():
+                record_rejects(rule, count)
+
+        # 3. Combine the shard outputs
+        outputs = {
+            name: _combine_shards(shard_dirs, name)
+            for name in ("orders_cleaned", "order_items_cleaned", "payments_cleaned",
+                         "order_items_aggregated", "payments_aggregated", "fact_orders")
+        }
+        if rejects_dir is not None:
+            for table in SHARDED_TABLES:
+                write_rejects(_combine_shards(shard_dirs, f"{table}_rejects"), table, rejects_dir)
+
+    for name in ("orders_cleaned", "order_items_cleaned", "payments_cleaned"):
+        if processed_dir is not None:
+            write_table(outputs[name], processed_dir, name, fmt=storage_format)
+    for name in ("order_items_aggregated", "payments_aggregated"):
+        if modeled_dir is not None:
+            write_table(outputs[name], modeled_dir, name, fmt=storage_format)
+
+    fact_df = attach_order_distances(outputs["fact_orders"], order_distances)
+    return add_surrogate_keys(fact_df, "fact_orders", keys_dir)
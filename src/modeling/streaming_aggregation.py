@@ -0,0 +1,211 @@
+import math
+import tempfile
+from pathlib import Path
+import pandas as pd
+
+from cleaning.order_items_cleaning import clean_order_items_chunk
+from cleaning.payments_cleaning import clean_payments_chunk
+from cleaning.rules import rejects_writer
+from modeling.order_items_aggregation import order_items_aggregation
+from modeling.payments_aggregation import payments_aggregation
+from schemas.registry import read_raw_table
+from storage.tables import DEFAULT_FORMAT, TableWriter, read_table, table_path
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+# Rows sampled to estimate the size of one raw row
+SAMPLE_ROWS = 10_000
+# A chunk is held several times at once: raw rows, filter masks, cleaned rows, aggregates
+WORKING_SET_FACTOR = 4
+MIN_CHUNK_ROWS = 1_000
+
+def plan_chunks(csv_path: Path, table: str, memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB) -> tuple[int, int]:
+    """
+    Size the chunks and order_id buckets of a streamed CSV within a memory budget.
+
+    Parameters
+    ----------
+    csv_path : Path
+        Raw CSV file to be streamed.
+    table : str
+        Registered raw table name, for the in-memory dtypes.
+    memory_budget_mb : int
+        Memory allowed for one chunk (or one bucket) and its intermediate copies.
+
+    Returns
+    -------
+    tuple[int, int]
+        Rows read per chunk, and number of order_id buckets.
+    """
+    sample = read_raw_table(csv_path, table, nrows=SAMPLE_ROWS)
+    if sample.empty:
+        return MIN_CHUNK_ROWS, 1
+
+    bytes_per_row = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    chunk_rows = max(MIN_CHUNK_ROWS, int(budget_bytes / (bytes_per_row * WORKING_SET_FACTOR)))
+
+    # Estimate the total row count from the file size and the sample's text size
+    sample_csv_bytes = len(sample.to_csv(index=False).encode())
+    estimated_rows = Path(csv_path).stat().st_size * len(sample) / sample_csv_bytes
+    n_buckets = max(1, math.ceil(estimated_rows / chunk_rows))
+
+    return chunk_rows, n_buckets
+
+def _stream_aggregation(
+    raw_path: Path,
+    raw_table: str,
+    clean_chunk,
+    aggregate,
+    aggregate_columns: list[str],
+    memory_budget_mb: int,
+    cleaned_output_dir: Path | None,
+    cleaned_table: str,
+    storage_format: str,
+    rejects_dir: Path | None,
+) -> pd.DataFrame:
+    """
+    Clean a raw CSV chunk by chunk, then aggregate it bucket by bucket.
+
+    The columns needed by the aggregation are spilled to temporary files
+    bucketed by a hash of order_id. Each order therefore lands in exactly one bucket, with its
+    rows in file order, so the per-bucket aggregates are disjoint and
+    bit-identical to the in-memory aggregation: combining them is a
+    concatenation. Merging per-chunk partial sums instead would not be,
+    since float additions done in a different order round differently.
+    Rejected rows are appended to the reject table chunk by chunk.
+    """
+    chunk_rows, n_buckets = plan_chunks(raw_path, raw_table, memory_budget_mb)
+
+    with tempfile.TemporaryDirectory(prefix=f"{cleaned_table}_") as spill_dir:
+        spill_dir = Path(spill_dir)
+        bucket_writers = [TableWriter(spill_dir, f"bucket_{i}", "parquet") for i in range(n_buckets)]
+        output_writer = None
+        if cleaned_output_dir is not None:
+            output_writer = TableWriter(cleaned_output_dir, cleaned_table, storage_format)
+        rejects = rejects_writer(raw_table, rejects_dir) if rejects_dir is not None else None
+        writers = bucket_writers + [writer for writer in (output_writer, rejects) if writer is not None]
+
+        try:
+            for chunk in read_raw_table(raw_path, raw_table, chunksize=chunk_rows):
+                cleaned = clean_chunk(chunk, rejects=rejects)
+                if cleaned.empty:
+                    continue
+                if output_writer is not None:
+                    output_writer.write(cleaned)
+
+                spilled = cleaned[aggregate_columns]
+                buckets = pd.util.hash_pandas_object(spilled["order_id"], index=False) % n_buckets
+                for bucket, rows in spilled.groupby(buckets.to_numpy(), sort=False):
+                    bucket_writers[bucket].write(rows)
+        except BaseException:
+            for writer in writers:
+                writer.close(commit=False)
+            raise
+
+        for writer in writers:
+            writer.close()
+
+        aggregates = [
+            aggregate(read_table(spill_dir, f"bucket_{i}", fmt="parquet"))
+            for i in range(n_buckets)
+            if table_path(spill_dir, f"bucket_{i}", "parquet").exists()
+        ]
+
+    if not aggregates:
+        return aggregate(clean_chunk(read_raw_table(raw_path, raw_table, nrows=0)))
+
+    return (
+        pd.concat(aggregates, ignore_index=True)
+        .sort_values("order_id", ignore_index=True)
+    )
+
+def stream_order_items_aggregation(
+    order_items_path: Path,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    cleaned_output_dir: Path | None = None,
+    storage_format: str = DEFAULT_FORMAT,
+    rejects_dir: Path | None = None,
+) -> pd.DataFrame:
+    """
+    Clean and aggregate the raw order_items file with bounded memory.
+
+    Same result as order_items_aggregation(clean_order_items(order_items_path)),
+    but the raw file is read in chunks and aggregated in order_id buckets,
+    both sized from the memory budget.
+
+    Parameters
+    ----------
+    order_items_path : Path
+        Path to the raw order_items CSV file.
+    memory_budget_mb : int
+        Memory allowed for one chunk (or one bucket) and its intermediate copies.
+    cleaned_output_dir : Path | None
+        When given, cleaned rows are also written there, chunk by chunk.
+    storage_format : str
+        Storage format of the cleaned table.
+    rejects_dir : Path | None
+        When given, rejected rows are written there with their reason codes, chunk by chunk.
+
+    Returns
+    -------
+    pd.DataFrame
+        Aggregated order items dataframe, one row per order_id.
+    """
+    return _stream_aggregation(
+        order_items_path,
+        "order_items",
+        clean_order_items_chunk,
+        order_items_aggregation,
+        ["order_id", "order_item_id", "price", "freight_value"],
+        memory_budget_mb,
+        cleaned_output_dir,
+        "order_items_cleaned",
+        storage_format,
+        rejects_dir,
+    )
+
+def stream_payments_aggregation(
+    payments_path: Path,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    cleaned_output_dir: Path | None = None,
+    storage_format: str = DEFAULT_FORMAT,
+    rejects_dir: Path | None = None,
+) -> pd.DataFrame:
+    """
+    Clean and aggregate the raw payments file with bounded memory.
+
+    Same result as payments_aggregation(clean_payments(payments_path)),
+    but the raw file is read in chunks and aggregated in order_id buckets,
+    both sized from the memory budget.
+
+    Parameters
+    ----------
+    payments_path : Path
+        Path to the raw payments CSV file.
+    memory_budget_mb : int
+        Memory allowed for one chunk (or one bucket) and its intermediate copies.
+    cleaned_output_dir : Path | None
+        When given, cleaned rows are also written there, chunk by chunk.
+    storage_format : str
+        Storage format of the cleaned table.
+    rejects_dir : Path | None
+        When given, rejected rows are written there with their reason codes, chunk by chunk.
+
+    Returns
+    -------
+    pd.DataFrame
+        Aggregated payments dataframe, one row per order_id.
+    """
+    return _stream_aggregation(
+        payments_path,
+        "payments",
+        clean_payments_chunk,
+        payments_aggregation,
+        ["order_id", "payment_type", "payment_value"],
+        memory_budget_mb,
+        cleaned_output_dir,
+        "payments_cleaned",
+        storage_format,
+        rejects_dir,
+    )
@@ -0,0 +1,111 @@
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from schemas.registry import KEY, SURROGATE_KEYS, enforce_schema, get_schema
+from storage.tables import read_table, table_path, write_table
+
+KEYS_DIR = Path("data/modeled/olist/keys")
+# Key maps are pipeline state: always Parquet, whatever the format of the tables
+KEY_MAP_FORMAT = "parquet"
+
+# Steps run concurrently on threads: one writer per key map at a time
+_KEY_MAP_LOCKS = {natural_column: threading.Lock() for natural_column in SURROGATE_KEYS}
+
+def key_map_name(natural_column: str) -> str:
+    """
+    Stored table name of the key map of a natural ID column (e.g. "order_key_map").
+    """
+    return f"{SURROGATE_KEYS[natural_column]}_map"
+
+def load_key_map(natural_column: str, keys_dir: Path = KEYS_DIR) -> pd.DataFrame:
+    """
+    Load the natural ID -> surrogate key mapping of a column (empty if none yet).
+    """
+    name = key_map_name(natural_column)
+    if not table_path(keys_dir, name, KEY_MAP_FORMAT).exists():
+        empty = pd.DataFrame({natural_column: pd.Series(dtype="object"), SURROGATE_KEYS[natural_column]: []})
+        return enforce_schema(empty, name)
+    return read_table(keys_dir, name, fmt=KEY_MAP_FORMAT)
+
+def assign_keys(values: pd.Series, natural_column: str, keys_dir: Path = KEYS_DIR) -> np.ndarray:
+    """
+    Surrogate key of each natural ID, assigning keys to IDs never seen before.
+
+    Keys are dense integers starting at 1, given in order of first
+    appearance. The mapping is persisted in keys_dir and only ever appended
+    to, so an ID keeps its key across runs, execution modes and incremental
+    loads.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Natural IDs (e.g. order_id values).
+    natural_column : str
+        Natural ID column the values belong to (a key of SURROGATE_KEYS).
+    keys_dir : Path
+        Directory of the key maps.
+
+    Returns
+    -------
+    np.ndarray
+        Surrogate key of each value, aligned with values.
+
+    Raises
+    ------
+    ValueError
+        If an ID is missing, or the keys no longer fit the key dtype.
+    """
+    if values.isna().any():
+        raise ValueError(f"Missing {natural_column} values cannot get a surrogate key")
+    key_column = SURROGATE_KEYS[natural_column]
+
+    with _KEY_MAP_LOCKS[natural_column]:
+        key_map = load_key_map(natural_column, keys_dir)
+        positions = pd.Index(key_map[natural_column]).get_indexer(values)
+
+        new_ids = pd.unique(values[positions < 0])
+        if len(new_ids):
+            next_key = len(key_map) + 1
+            if next_key + len(new_ids) > np.iinfo(KEY).max:
+                raise ValueError(f"Too many {natural_column} values for {KEY} surrogate keys")
+            new_keys = pd.DataFrame({
+                natural_column: new_ids,
+                key_column: np.arange(next_key, next_key + len(new_ids)),
+            })
+            key_map = pd.concat([key_map, enforce_schema(new_keys, key_map_name(natural_column))], ignore_index=True)
+            write_table(key_map, keys_dir, key_map_name(natural_column), fmt=KEY_MAP_FORMAT)
+            positions = pd.Index(key_map[natural_column]).get_indexer(values)
+
+    return key_map[key_column].to_numpy()[positions]
+
+def add_surrogate_keys(df: pd.DataFrame, table: str, keys_dir: Path = KEYS_DIR) -> pd.DataFrame:
+    """
+    Key the natural ID columns of a dataframe and lay it out as a registered table.
+
+    Every surrogate key column declared by the table is computed from its
+    natural ID column; natural ID columns the table does not declare (e.g.
+    customer_id in fact_orders) are dropped, their key replaces them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Rows with natural ID columns.
+    table : str
+        Registered table name (e.g. fact_orders, dim_customers).
+    keys_dir : Path
+        Directory of the key maps.
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the registered columns, in order.
+    """
+    schema = get_schema(table)
+    keys = {
+        key_column: assign_keys(df[natural_column], natural_column, keys_dir)
+        for natural_column, key_column in SURROGATE_KEYS.items()
+        if key_column in schema.column_names and natural_column in df.columns
+    }
+    return enforce_schema(df.assign(**keys)[schema.column_names], table)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable
+
+HASH_CHUNK_SIZE = 1 << 20
+# Modules under this directory are pipeline code (their source is part of the fingerprints)
+SOURCE_ROOT = Path(__file__).resolve().parents[1]
+
+
+def hash_file(path: Path) -> str:
+    """
+    Return the sha256 hex digest of a file's content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _source_module(module: ModuleType | None) -> bool:
+    source = getattr(module, "__file__", None)
+    return source is not None and Path(source).resolve().is_relative_to(SOURCE_ROOT)
+
+def code_dependencies(func: Callable) -> list[Path]:
+    """
+    Source files of the module defining func and of the repository modules it uses, transitively.
+
+    A module uses the repository modules it imports and those defining the
+    functions, classes and declarations it imports from them (cleaning
+    rules, table schemas, aggregation kernels, ...). Third-party and
+    standard library modules are left out.
+
+    Returns
+    -------
+    list[Path]
+        Sorted source files.
+    """
+    pending = [sys.modules.get(func.__module__)]
+    seen = {}
+    while pending:
+        module = pending.pop()
+        if not _source_module(module) or module.__name__ in seen:
+            continue
+        seen[module.__name__] = Path(module.__file__).resolve()
+        for value in vars(module).values():
+            used = value if isinstance(value, ModuleType) else sys.modules.get(getattr(value, "__module__", None) or "")
+            if _source_module(used) and used.__name__ not in seen:
+                pending.append(used)
+    return sorted(set(seen.values()))
+
+
+class StepCache:
+    """
+    Fingerprints of the last successful run of each pipeline step.
+
+    A step fingerprint covers the source of the module defining the step
+    function and of the repository modules it uses, transitively (so the
+    cleaning rules, schemas and kernels it relies on; see
+    code_dependencies), its parameters (files passed as parameters are hashed by
+    content) and the fingerprints of the steps it depends on. A step whose
+    fingerprint matches the recorded one, and whose outputs are still on
+    disk, does not need to run again.
+
+    The cache file is rewritten after every successful step, so a failed
+    run resumes from the first step that did not complete.
+
+    Parameters
+    ----------
+    cache_path : Path
+        JSON file holding the recorded fingerprints.
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self.steps = {}
+        self.file_hashes = {}
+
+        if self.cache_path.exists():
+            state = json.loads(self.cache_path.read_text())
+            self.steps = state.get("steps", {})
+            self.file_hashes = state.get("file_hashes", {})
+
+    def file_hash(self, path: Path) -> str:
+        """
+        Content hash of a file, reused while its size and mtime are unchanged.
+        """
+        stat = path.stat()
+        key = str(path.resolve())
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        cached = self.file_hashes.get(key)
+        if cached is not None and cached["signature"] == signature:
+            return cached["sha256"]
+
+        sha256 = hash_file(path)
+        self.file_hashes[key] = {"signature": signature, "sha256": sha256}
+        return sha256
+
+    def _param_token(self, value: Any) -> str:
+        if isinstance(value, Path) and value.is_file():
+            return f"file:{self.file_hash(value)}"
+        return repr(value)
+
+    def fingerprint(self, step, upstream_fingerprints: list[str]) -> str:
+        """
+        Compute the fingerprint of a step.
+
+        Parameters
+        ----------
+        step : Step
+            Step to fingerprint.
+        upstream_fingerprints : list[str]
+            Fingerprints of the steps producing the step inputs, in input order.
+
+        Returns
+        -------
+        str
+            Hex digest identifying this version of the step.
+        """
+        digest = hashlib.sha256()
+        digest.update(step.name.encode())
+        digest.update(step.func.__qualname__.encode())
+        for source in code_dependencies(step.func):
+            digest.update(f"{source.relative_to(SOURCE_ROOT)}:{self.file_hash(source)}".encode())
+
+        for key in sorted(step.params):
+            digest.update(f"{key}={self._param_token(step.params[key])}".encode())
+        for upstream in upstream_fingerprints:
+            digest.update(upstream.encode())
+
+        return digest.hexdigest()
+
+    def is_fresh(self, step_name: str, fingerprint: str, outputs: list[Path]) -> bool:
+        """
+        Whether a step already ran with this fingerprint and its outputs still exist.
+        """
+        entry = self.steps.get(step_name)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            return False
+        recorded = {Path(path) for path in entry["outputs"]}
+        return all(path in recorded and path.exists() for path in outputs)
+
+    def record(self, step_name: str, fingerprint: str, outputs: list[Path]):
+        """
+        Record a successful step run and persist the cache.
+        """
+        self.steps[step_name] = {
+            "fingerprint": fingerprint,
+            "outputs": [str(path) for path in outputs],
+        }
+        self.save()
+
+    def save(self):
+        """
+        Atomically rewrite the cache file.
+        """
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(f".{self.cache_path.name}.tmp")
+        tmp_path.write_text(
+            json.dumps({"steps": self.steps, "file_hashes": self.file_hashes}, indent=2)
+        )
+        os.replace(tmp_path, self.cache_path)
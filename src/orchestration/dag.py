@@ -0,0 +1,361 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from orchestration.cache import StepCache
+from orchestration.metrics import RunManifest
+from storage.concurrent_io import IOPool, get_io_pool, table_read
+from storage.partitions import INDEX_FILE
+from storage.tables import DEFAULT_FORMAT, table_path
+
+
+@dataclass(frozen=True)
+class Step:
+    """
+    One node of the pipeline graph.
+
+    Attributes
+    ----------
+    name : str
+        Unique step name, used in logs and error messages.
+    func : Callable
+        Function called with the datasets listed in ``inputs``, in order,
+        followed by ``params`` as keyword arguments.
+    inputs : tuple[str, ...]
+        Names of the datasets this step consumes.
+    params : dict[str, Any]
+        Static keyword arguments (e.g. raw file paths).
+    output : str | None
+        Name of the dataset this step produces.
+    output_dir : Path | None
+        Layer directory where the produced DataFrame is persisted.
+    reads : tuple[str, ...]
+        Stored tables the step reads back from storage itself (e.g. columns
+        of a processed table). The steps producing them (as their output or
+        in ``writes``) run first, and the step starts once those tables are
+        written. Tables no step of the graph produces are read as stored.
+    writes : dict[str, Path]
+        Tables the step writes itself besides its output (e.g. the cleaned
+        rows of a streamed aggregation), with their layer directory; they
+        are on disk when it returns, and checked like the output before the
+        step is skipped.
+    """
+
+    name: str
+    func: Callable[..., Any]
+    inputs: tuple[str, ...] = ()
+    output: str | None = None
+    output_dir: Path | None = None
+    params: dict[str, Any] = field(default_factory=dict)
+    reads: tuple[str, ...] = ()
+    writes: dict[str, Path] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class _StoredDataset:
+    """
+    Output of a skipped step, loaded from storage only if a consumer runs.
+    """
+
+    directory: Path
+    name: str
+
+
+def _table_producers(steps: list[Step]) -> dict[str, str]:
+    """
+    Map every stored table (step outputs and declared writes) to the name of the step producing it.
+
+    Raises
+    ------
+    ValueError
+        If two steps produce the same table.
+    """
+    producers = {}
+    for step in steps:
+        for table in ((step.output,) if step.output is not None else ()) + tuple(step.writes):
+            if table in producers:
+                raise ValueError(
+                    f"Dataset {table!r} is produced by both "
+                    f"{producers[table]!r} and {step.name!r}"
+                )
+            producers[table] = step.name
+    return producers
+
+
+def _upstream_steps(step: Step, producers: dict[str, str]) -> list[str]:
+    """
+    Steps producing the inputs, then the stored tables read, of a step (in declaration order).
+    """
+    return [producers[name] for name in step.inputs + step.reads if name in producers]
+
+
+def _resolve_dependencies(steps: list[Step]) -> dict[str, set[str]]:
+    """
+    Map each step name to the names of the steps producing its inputs and the stored tables it reads.
+
+    Raises
+    ------
+    ValueError
+        If two steps produce the same dataset, an input has no producer
+        (or is only written to storage), or the graph contains a cycle.
+    """
+    producers = _table_producers(steps)
+    outputs = {step.output for step in steps if step.output is not None}
+
+    dependencies = {}
+    for step in steps:
+        missing_inputs = [name for name in step.inputs if name not in outputs]
+        if missing_inputs:
+            raise ValueError(f"No step produces inputs {missing_inputs} of step {step.name!r}")
+        dependencies[step.name] = set(_upstream_steps(step, producers))
+
+    # Kahn's algorithm: every step must eventually become ready
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cycle detected between steps: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+    return dependencies
+
+
+def _output_paths(step: Step, storage_format: str, csv_exports: set[str]) -> list[Path]:
+    """
+    Files a step is expected to leave on disk: its output and the tables it writes.
+
+    A written table stored partitioned (a directory of partitions) is
+    represented by its partition index.
+    """
+    paths = []
+    if step.output_dir is not None:
+        paths.append(table_path(step.output_dir, step.output, storage_format))
+        if step.output in csv_exports and storage_format != "csv":
+            paths.append(table_path(step.output_dir, step.output, "csv"))
+    for table, directory in step.writes.items():
+        table_dir = Path(directory) / table
+        paths.append(table_dir / INDEX_FILE if table_dir.is_dir() else table_path(directory, table, storage_format))
+    return paths
+
+
+def _fingerprints(steps: list[Step], dependencies: dict[str, set[str]], cache: StepCache) -> dict[str, str]:
+    """
+    Fingerprint every step, upstream steps first.
+    """
+    steps_by_name = {step.name: step for step in steps}
+    producers = _table_producers(steps)
+    fingerprints = {}
+
+    def visit(name):
+        if name not in fingerprints:
+            for upstream in dependencies[name]:
+                visit(upstream)
+            step = steps_by_name[name]
+            upstream_fingerprints = [fingerprints[upstream] for upstream in _upstream_steps(step, producers)]
+            fingerprints[name] = cache.fingerprint(step, upstream_fingerprints)
+        return fingerprints[name]
+
+    for step in steps:
+        visit(step.name)
+    return fingerprints
+
+
+def _execute_step(
+    step: Step,
+    args: list[Any],
+    storage_format: str,
+    csv_exports: set[str],
+    io_pool: IOPool,
+    manifest: RunManifest | None = None,
+    pending_writes: list[Future] = (),
+) -> tuple[Any, Future | None]:
+    """
+    Run a step function and start persisting its DataFrame output, if any.
+    """
+    # Failed writes are reported by run_dag
+    wait(pending_writes)
+    if manifest is None:
+        return _run_step(step, args, storage_format, csv_exports, io_pool)
+
+    with manifest.track(step.name) as metrics:
+        result, write = _run_step(step, args, storage_format, csv_exports, io_pool, metrics.rows_in)
+        if isinstance(result, pd.DataFrame):
+            metrics.rows_out = len(result)
+    return result, write
+
+
+def _run_step(
+    step: Step,
+    args: list[Any],
+    storage_format: str,
+    csv_exports: set[str],
+    io_pool: IOPool,
+    rows_in: dict[str, int] | None = None,
+) -> tuple[Any, Future | None]:
+    # Inputs of skipped steps are loaded from storage concurrently
+    stored = io_pool.read_all({
+        i: table_read(arg.directory, arg.name, fmt=storage_format)
+        for i, arg in enumerate(args) if isinstance(arg, _StoredDataset)
+    })
+    args = [stored.get(i, arg) for i, arg in enumerate(args)]
+    if rows_in is not None:
+        rows_in.update({
+            name: len(arg) for name, arg in zip(step.inputs, args) if isinstance(arg, pd.DataFrame)
+        })
+    result = step.func(*args, **step.params)
+
+    write = None
+    if step.output_dir is not None and isinstance(result, pd.DataFrame):
+        # Consumers start while the output is written
+        write = io_pool.write_in_background(
+            result, step.output_dir, step.output, storage_format,
+            csv_export=step.output in csv_exports and storage_format != "csv",
+        )
+
+    return result, write
+
+
+def _done_future() -> Future:
+    future = Future()
+    future.set_result(None)
+    return future
+
+
+def run_dag(
+    steps: list[Step],
+    max_workers: int = 4,
+    storage_format: str = DEFAULT_FORMAT,
+    csv_exports: set[str] = frozenset(),
+    cache: StepCache | None = None,
+    manifest: RunManifest | None = None,
+    io_pool: IOPool | None = None,
+) -> dict[str, Any]:
+    """
+    Execute the steps in a single process, respecting their dependencies.
+
+    Datasets are handed from producer to consumer in memory. Steps whose
+    inputs are all available run concurrently on a thread pool, so
+    independent branches (e.g. the cleaning steps) overlap; pandas releases
+    the GIL in its parsers and most vectorized kernels. Step outputs are
+    written in the background on the I/O pool: consumers start as soon as
+    the producing function returns, and a step is recorded in the cache once
+    its output is on disk.
+
+    Parameters
+    ----------
+    steps : list[Step]
+        Pipeline steps, in any order.
+    max_workers : int
+        Size of the worker pool. 1 runs the steps sequentially.
+    storage_format : str
+        Format used to persist step outputs (see storage.tables.TABLE_FORMATS).
+    csv_exports : set[str]
+        Datasets additionally exported as CSV.
+    cache : StepCache | None
+        When given, steps whose fingerprint is unchanged since their last
+        successful run are skipped, and their outputs are read back from
+        storage only if a consumer has to run.
+    manifest : RunManifest | None
+        When given, per-step timings, memory, row counts, rejects and I/O
+        are recorded in it (see orchestration.metrics).
+    io_pool : IOPool | None
+        Pool reading stored inputs and writing outputs (default: the
+        process-wide pool, see storage.concurrent_io).
+
+    Returns
+    -------
+    dict[str, Any]
+        Datasets produced by the steps that ran, keyed by dataset name.
+
+    Raises
+    ------
+    RuntimeError
+        If a step or the write of its output raises; the original exception is chained.
+    """
+    io_pool = io_pool or get_io_pool()
+    dependencies = _resolve_dependencies(steps)
+    producers = _table_producers(steps)
+    steps_by_name = {step.name: step for step in steps}
+    pending = set(steps_by_name)
+    completed = set()
+    results = {}
+
+    fingerprints = {}
+    if cache is not None:
+        fingerprints = _fingerprints(steps, dependencies, cache)
+        for name in sorted(pending):
+            step = steps_by_name[name]
+            outputs = _output_paths(step, storage_format, csv_exports)
+            if outputs and cache.is_fresh(name, fingerprints[name], outputs):
+                print(f"\n⏭ Skipping {name} (unchanged)")
+                if manifest is not None:
+                    manifest.skipped(name)
+                results[step.output] = _StoredDataset(step.output_dir, step.output)
+                completed.add(name)
+        pending -= completed
+
+    # Output writes in flight, by step
+    writes = {}
+
+    def finish_writes(names):
+        for name in names:
+            try:
+                writes.pop(name).result()
+            except Exception as exc:
+                wait(writes.values())
+                raise RuntimeError(f"Pipeline failed writing the output of step: {name}") from exc
+            if cache is not None:
+                step = steps_by_name[name]
+                cache.record(name, fingerprints[name], _output_paths(step, storage_format, csv_exports))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+
+        while pending or running:
+            ready = sorted(name for name in pending if dependencies[name] <= completed)
+            for name in ready:
+                step = steps_by_name[name]
+                print(f"\n▶ Running {name}")
+                args = [results[dataset] for dataset in step.inputs]
+                # Stored tables read by the step: wait for the writes of their producers
+                pending_writes = [
+                    writes[producers[table]] for table in step.reads
+                    if table in producers and producers[table] in writes
+                ]
+                future = executor.submit(
+                    _execute_step, step, args, storage_format, csv_exports, io_pool, manifest, pending_writes,
+                )
+                running[future] = name
+                pending.discard(name)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, write = future.result()
+                except Exception as exc:
+                    # Let in-flight steps and writes finish, but schedule nothing new
+                    wait(running)
+                    wait(writes.values())
+                    raise RuntimeError(f"Pipeline failed at step: {name}") from exc
+
+                step = steps_by_name[name]
+                if step.output is not None:
+                    results[step.output] = result
+                writes[name] = write if write is not None else _done_future()
+                completed.add(name)
+
+            finish_writes([name for name, write in writes.items() if write.done()])
+
+    finish_writes(list(writes))
+
+    return {
+        dataset: result for dataset, result in results.items()
+        if not isinstance(result, _StoredDataset)
+    }
@@ -0,0 +1,357 @@
+import argparse
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+RUNS_DIR = Path("data/runs/olist")
+RSS_SAMPLE_INTERVAL = 0.01
+
+# Metrics of the step running on the current thread (steps run one per worker thread)
+_current = threading.local()
+# A step's I/O can be reported from several threads (see storage.concurrent_io)
+_record_lock = threading.Lock()
+
+
+@dataclass
+class StepMetrics:
+    """
+    Measurements of one step of a pipeline run.
+
+    Attributes
+    ----------
+    status : str
+        "ran", "skipped" (unchanged, see orchestration.cache) or "failed".
+    wall_seconds : float
+        Elapsed time of the step.
+    cpu_seconds : float
+        CPU time of the thread running the step.
+    peak_rss_mb : float
+        Peak resident memory of the process while the step ran (shared
+        with the steps running concurrently).
+    rows_in : dict[str, int]
+        Rows of each input dataset.
+    rows_out : int | None
+        Rows of the output dataset.
+    rejects : dict[str, int]
+        Rows failing each cleaning rule (a row failing several counts for each).
+    nat_coercions : dict[str, int]
+        Timestamp values of each column that could not be parsed (set to NaT).
+    bytes_read : int
+        Size of the raw and stored files read.
+    bytes_written : int
+        Size of the files written.
+    profile : str | None
+        cProfile stats file, for profiled steps.
+    error : str | None
+        Exception raised by a failed step.
+    """
+
+    status: str = "ran"
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+    rows_in: dict[str, int] = field(default_factory=dict)
+    rows_out: int | None = None
+    rejects: dict[str, int] = field(default_factory=dict)
+    nat_coercions: dict[str, int] = field(default_factory=dict)
+    bytes_read: int = 0
+    bytes_written: int = 0
+    profile: str | None = None
+    error: str | None = None
+
+
+def record_rejects(rule: str, count: int):
+    """
+    Add rows rejected by a cleaning rule to the metrics of the running step.
+
+    Does nothing outside an instrumented step (e.g. a cleaning script run on its own).
+    """
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        with _record_lock:
+            metrics.rejects[rule] = metrics.rejects.get(rule, 0) + int(count)
+
+def record_nat_coercions(column: str, count: int):
+    """
+    Add timestamp values of a column that were coerced to NaT to the metrics of the running step.
+    """
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None and count:
+        with _record_lock:
+            metrics.nat_coercions[column] = metrics.nat_coercions.get(column, 0) + int(count)
+
+def record_bytes_read(path: Path):
+    """
+    Add the size of a file read to the metrics of the running step.
+    """
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        size = Path(path).stat().st_size
+        with _record_lock:
+            metrics.bytes_read += size
+
+def record_bytes_written(path: Path):
+    """
+    Add the size of a file written to the metrics of the running step.
+    """
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        size = Path(path).stat().st_size
+        with _record_lock:
+            metrics.bytes_written += size
+
+def current_metrics() -> StepMetrics | None:
+    """
+    Metrics of the step running on the current thread (None outside an instrumented step).
+    """
+    return getattr(_current, "metrics", None)
+
+@contextmanager
+def report_to(metrics: StepMetrics | None):
+    """
+    Report the rejects and I/O of the current thread to the given step metrics.
+
+    For work a step hands to another thread (e.g. background reads and writes).
+    """
+    previous = getattr(_current, "metrics", None)
+    _current.metrics = metrics
+    try:
+        yield metrics
+    finally:
+        _current.metrics = previous
+
+@contextmanager
+def capture_metrics():
+    """
+    Collect the rejects and I/O reported on the current thread into a fresh StepMetrics.
+
+    For work done outside the step thread (e.g. in worker processes), whose
+    measurements are then reported back to the step.
+    """
+    previous = getattr(_current, "metrics", None)
+    _current.metrics = StepMetrics()
+    try:
+        yield _current.metrics
+    finally:
+        _current.metrics = previous
+
+def _rss_bytes() -> int:
+    """
+    Current resident memory of the process; the peak so far where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class RunManifest:
+    """
+    Machine-readable record of a pipeline run.
+
+    Collects the metrics of every step (see StepMetrics) and writes them,
+    with the run settings, to a JSON manifest. Process memory is sampled
+    from a background thread while steps run.
+
+    Parameters
+    ----------
+    runs_dir : Path
+        Directory of the manifests (and of the profiles of profiled steps).
+    settings : dict[str, Any]
+        Run settings recorded in the manifest (format, workers, ...).
+    profile_steps : set[str]
+        Steps run under cProfile.
+    """
+
+    def __init__(self, runs_dir: Path = RUNS_DIR, settings: dict[str, Any] | None = None,
+                 profile_steps: set[str] = frozenset()):
+        self.runs_dir = Path(runs_dir)
+        self.settings = settings or {}
+        self.profile_steps = set(profile_steps)
+        self.started_at = datetime.now(timezone.utc)
+        self.run_id = self.started_at.strftime("%Y%m%dT%H%M%S_%fZ")
+        self.status = "running"
+        self.steps: dict[str, StepMetrics] = {}
+
+        self._started = time.perf_counter()
+        self._active: list[StepMetrics] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._update_peaks()
+
+    def _update_peaks(self):
+        rss_mb = round(_rss_bytes() / 2**20, 1)
+        with self._lock:
+            for metrics in self._active:
+                metrics.peak_rss_mb = max(metrics.peak_rss_mb, rss_mb)
+
+    def skipped(self, step_name: str):
+        """
+        Record a step skipped by the step cache.
+        """
+        self.steps[step_name] = StepMetrics(status="skipped")
+
+    @contextmanager
+    def track(self, step_name: str):
+        """
+        Measure the step run inside the block, on the current thread.
+
+        Yields the StepMetrics of the step, for the caller to fill in rows.
+        """
+        metrics = StepMetrics()
+        self.steps[step_name] = metrics
+        with self._lock:
+            self._active.append(metrics)
+        _current.metrics = metrics
+
+        profiler = cProfile.Profile() if step_name in self.profile_steps else None
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        self._update_peaks()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            yield metrics
+        except Exception as exc:
+            metrics.status = "failed"
+            metrics.error = f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profile_path = self.runs_dir / self.run_id / f"{step_name}.prof"
+                profile_path.parent.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(profile_path)
+                metrics.profile = str(profile_path)
+
+            metrics.wall_seconds = round(time.perf_counter() - wall_start, 4)
+            metrics.cpu_seconds = round(time.thread_time() - cpu_start, 4)
+            self._update_peaks()
+            _current.metrics = None
+            with self._lock:
+                self._active.remove(metrics)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": round(time.perf_counter() - self._started, 4),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "settings": self.settings,
+            "steps": {name: asdict(metrics) for name, metrics in self.steps.items()},
+        }
+
+    def write(self, status: str) -> Path:
+        """
+        Stop sampling and write the manifest, also as latest.json.
+
+        Parameters
+        ----------
+        status : str
+            Final run status ("succeeded" or "failed").
+
+        Returns
+        -------
+        Path
+            Path of the manifest of this run.
+        """
+        self._stop.set()
+        self._sampler.join()
+        self.status = status
+
+        self.runs_dir.mkdir(parents=True, exist_ok=True)
+        manifest = json.dumps(self.to_dict(), indent=2)
+        path = self.runs_dir / f"{self.run_id}.json"
+        for target in (path, self.runs_dir / "latest.json"):
+            tmp_path = target.with_name(f".{target.name}.tmp")
+            tmp_path.write_text(manifest)
+            os.replace(tmp_path, target)
+        return path
+
+# Step measures compared by diff_manifests, with their unit
+DIFF_MEASURES = {
+    "wall_seconds": "s",
+    "cpu_seconds": "s",
+    "peak_rss_mb": " MB",
+    "rows_out": " rows",
+    "bytes_read": " B",
+    "bytes_written": " B",
+}
+
+def diff_manifests(old: dict[str, Any], new: dict[str, Any], threshold: float = 0.0) -> list[str]:
+    """
+    Compare the step metrics of two run manifests.
+
+    Parameters
+    ----------
+    old, new : dict[str, Any]
+        Loaded manifests.
+    threshold : float
+        Only report measures whose relative change is above this (0.1 = 10%).
+
+    Returns
+    -------
+    list[str]
+        One line per step and changed measure, reject and NaT coercion counts included.
+    """
+    lines = []
+    old_steps, new_steps = old["steps"], new["steps"]
+
+    for step_name in sorted(old_steps.keys() | new_steps.keys()):
+        if step_name not in new_steps:
+            lines.append(f"{step_name}: only in {old['run_id']}")
+            continue
+        if step_name not in old_steps:
+            lines.append(f"{step_name}: only in {new['run_id']}")
+            continue
+
+        before, after = old_steps[step_name], new_steps[step_name]
+        if before["status"] != after["status"]:
+            lines.append(f"{step_name}: status {before['status']} -> {after['status']}")
+        if "skipped" in (before["status"], after["status"]):
+            continue
+
+        for measure, unit in DIFF_MEASURES.items():
+            previous, current = before[measure] or 0, after[measure] or 0
+            change = (current - previous) / previous if previous else float(current != 0)
+            if previous != current and abs(change) > threshold:
+                lines.append(f"{step_name}: {measure} {previous}{unit} -> {current}{unit} ({change:+.0%})")
+
+        for counter in ("rejects", "nat_coercions"):
+            # Manifests written before a counter existed lack it
+            before_counts, after_counts = before.get(counter, {}), after.get(counter, {})
+            for key in sorted(before_counts.keys() | after_counts.keys()):
+                previous, current = before_counts.get(key, 0), after_counts.get(key, 0)
+                if previous != current:
+                    lines.append(f"{step_name}: {counter}[{key}] {previous} -> {current}")
+
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff the step metrics of two pipeline run manifests.")
+    parser.add_argument("old", type=Path, help="Reference manifest.")
+    parser.add_argument("new", type=Path, nargs="?", default=RUNS_DIR / "latest.json",
+                        help="Manifest to compare (default: the latest run).")
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="Hide changes smaller than this relative change (e.g. 0.1).")
+    args = parser.parse_args()
+
+    old_manifest = json.loads(args.old.read_text())
+    new_manifest = json.loads(args.new.read_text())
+    print(f"{old_manifest['run_id']} -> {new_manifest['run_id']}: "
+          f"{old_manifest['wall_seconds']}s -> {new_manifest['wall_seconds']}s")
+    for line in diff_manifests(old_manifest, new_manifest, args.threshold) or ["No differences."]:
+        print(f"  {line}")
@@ -0,0 +1,502 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from orchestration.metrics import current_metrics, record_bytes_read, report_to
+from profiling.sketches import FrequentValues, HyperLogLog, QuantileSketch, hash_values
+from schemas.registry import DATE, DATETIME, RAW_SCHEMAS, SCHEMAS, TableSchema
+from schemas.timestamps import OLIST_TIMESTAMP_FORMATS
+from storage.columnar_raw import file_signature
+from storage.tables import READ_PRIORITY, TABLE_FORMATS
+
+RAW_DATA_DIR = Path("data/raw/olist")
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+PROFILES_DIR = Path("data/profiles/olist")
+
+LAYER_DIRS = {"raw": RAW_DATA_DIR, "processed": PROCESSED_DATA_DIR, "modeled": MODELED_DATA_DIR}
+DEFAULT_LAYERS = ("raw", "processed")
+
+# Bytes of CSV parsed per batch, and rows per batch of columnar files
+CSV_BLOCK_BYTES = 16 * 2**20
+BATCH_ROWS = 256 * 1024
+QUANTILES = (0.01, 0.05, 0.1, 0.2, 0.25, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.9, 0.95, 0.99)
+# Bin edges of the stored histograms (compared by the distribution drift check)
+HISTOGRAM_QUANTILES = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+TOP_VALUES = 10
+CONFLICT_SAMPLES = 5
+# A batch with more distinct values than this share of its rows is an identifier: no frequent values
+KEY_LIKE_SHARE = 0.5
+
+# Drift thresholds: absolute null rate change, population stability index
+NULL_RATE_DRIFT = 0.05
+PSI_DRIFT = 0.2
+
+NUMBER_PATTERN = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?\s*$"
+BOOLEAN_PATTERN = r"(?i)^\s*(true|false|1|0)\s*$"
+
+
+def _schema_kind(dtype: str) -> str:
+    """
+    Kind of values (numeric, datetime, boolean, text) of a registered dtype.
+    """
+    if dtype in (DATETIME, DATE):
+        return "datetime"
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    return "text"
+
+def _arrow_kind(arrow_type: pa.DataType) -> str:
+    """
+    Kind of values of a typed (Parquet / Feather) column.
+    """
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "numeric"
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return "datetime"
+    if pa.types.is_boolean(arrow_type):
+        return "boolean"
+    return "text"
+
+def _parse(strings: pa.Array, kind: str) -> tuple[pa.Array, pa.Array | None]:
+    """
+    Convert CSV strings to their kind, vectorized in Arrow.
+
+    The whole batch is cast at once; only when that fails are the values
+    matched one pattern at a time (numbers, booleans) or format at a time
+    (timestamps, as schemas.timestamps).
+
+    Returns
+    -------
+    tuple[pa.Array, pa.Array | None]
+        Typed values (null where unparseable) and the mask of the present
+        values that don't parse (None when they all do).
+    """
+    if kind == "datetime":
+        typed = pc.strptime(strings, format=OLIST_TIMESTAMP_FORMATS[0], unit="ns", error_is_null=True)
+        for fmt in OLIST_TIMESTAMP_FORMATS[1:]:
+            if typed.null_count == strings.null_count:
+                break
+            typed = pc.coalesce(typed, pc.strptime(strings, format=fmt, unit="ns", error_is_null=True))
+        if typed.null_count == strings.null_count:
+            return typed, None
+        return typed, pc.and_(pc.is_valid(strings), pc.is_null(typed))
+
+    if kind in ("numeric", "boolean"):
+        target, pattern = (pa.float64(), NUMBER_PATTERN) if kind == "numeric" else (pa.bool_(), BOOLEAN_PATTERN)
+        try:
+            return pc.cast(strings, target), None
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            trimmed = pc.utf8_trim_whitespace(strings)
+            parses = pc.fill_null(pc.match_substring_regex(trimmed, pattern), True)
+            typed = pc.cast(pc.if_else(parses, trimmed, pa.scalar(None, pa.string())), target)
+            return typed, pc.invert(parses)
+
+    return strings, None
+
+def _infer_kind(strings: pa.Array) -> str:
+    """
+    Kind of an unregistered CSV column, from the values of its first batch.
+    """
+    present = strings.drop_null()
+    if not len(present):
+        return "text"
+    for kind in ("numeric", "datetime"):
+        if _parse(present, kind)[1] is None:
+            return kind
+    return "text"
+
+def _json_value(value):
+    """
+    JSON-serializable form of a profiled value (timestamps as ISO strings).
+    """
+    if isinstance(value, (date, pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+def _as_numbers(values, kind: str) -> np.ndarray:
+    """
+    Stored quantiles / edges as sketch values (timestamps as ns since the epoch).
+    """
+    if kind == "datetime":
+        return pd.to_datetime(pd.Series(values, dtype="object")).to_numpy().astype("int64").astype("float64")
+    return np.asarray(values, dtype="float64")
+
+
+class ColumnProfile:
+    """
+    Streaming profile of one column: counts, min / max and sketches, in bounded memory.
+
+    Parameters
+    ----------
+    kind : str
+        "numeric", "datetime", "boolean" or "text".
+    track_values : bool
+        Whether to keep the frequent values (not for continuous values).
+    """
+
+    def __init__(self, kind: str, track_values: bool = True):
+        self.kind = kind
+        self.rows = 0
+        self.nulls = 0
+        self.conflicts = 0
+        self.conflict_samples: list = []
+        self.minimum = None
+        self.maximum = None
+        self.distinct = HyperLogLog()
+        self.quantiles = QuantileSketch() if kind in ("numeric", "datetime") else None
+        self.frequent = FrequentValues() if track_values else None
+        self.key_like = False
+
+    def update(self, source: pa.Array, typed: pa.Array, conflicts: pa.Array | None = None):
+        """
+        Add a batch: source values (for null counts and conflict samples) and their typed form.
+        """
+        self.rows += len(source)
+        self.nulls += source.null_count
+        if conflicts is not None:
+            bad = pc.filter(source, conflicts)
+            self.conflicts += len(bad)
+            if len(self.conflict_samples) < CONFLICT_SAMPLES:
+                samples = bad.unique().to_pylist()[:CONFLICT_SAMPLES - len(self.conflict_samples)]
+                self.conflict_samples += [value for value in samples if value not in self.conflict_samples]
+
+        if pa.types.is_dictionary(typed.type):
+            typed = typed.dictionary_decode()
+        present = typed.drop_null()
+        if not len(present):
+            return
+
+        bounds = pc.min_max(present)
+        low, high = bounds["min"].as_py(), bounds["max"].as_py()
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+
+        self.distinct.update(hash_values(present))
+        if self.quantiles is not None:
+            if self.kind == "datetime":
+                present = present.cast(pa.timestamp("ns")).cast(pa.int64())
+            self.quantiles.update(present.to_numpy(zero_copy_only=False).astype("float64"))
+        if self.frequent is not None:
+            max_distinct = max(self.frequent.capacity, int(KEY_LIKE_SHARE * len(present)))
+            if not self.frequent.update(present, max_distinct):
+                # Identifiers: counters would only churn
+                self.frequent, self.key_like = None, True
+
+    def _from_sketch(self, values: np.ndarray) -> list:
+        if self.kind == "datetime":
+            return [_json_value(pd.Timestamp(int(value))) if np.isfinite(value) else None for value in values]
+        return [_json_value(float(value)) for value in values]
+
+    def histogram(self) -> dict[str, list] | None:
+        """
+        Shares of the values between the deciles (distinct edges), for the next drift check.
+        """
+        if self.quantiles is None or not self.quantiles.count:
+            return None
+        edges = np.unique(self.quantiles.quantiles(HISTOGRAM_QUANTILES))
+        return {
+            "edges": self._from_sketch(edges),
+            "shares": np.round(np.diff(np.r_[0.0, self.quantiles.cdf(edges), 1.0]), 6).tolist(),
+        }
+
+    def to_dict(self) -> dict[str, Any]:
+        profile = {
+            "kind": self.kind,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "null_rate": round(self.nulls / self.rows, 6) if self.rows else 0.0,
+            "type_conflicts": self.conflicts,
+            "conflict_samples": self.conflict_samples,
+            "min": _json_value(self.minimum),
+            "max": _json_value(self.maximum),
+            "distinct": self.distinct.estimate(),
+            "key_like": self.key_like,
+        }
+        if self.quantiles is not None:
+            profile["quantiles"] = dict(zip(map(str, QUANTILES), self._from_sketch(self.quantiles.quantiles(QUANTILES))))
+            profile["histogram"] = self.histogram()
+        if self.frequent is not None:
+            profile["top_values"] = [[_json_value(value), count] for value, count in self.frequent.top(TOP_VALUES)]
+            # Every value of the column, while the counters never overflowed
+            profile["values"] = (
+                sorted((_json_value(value) for value in self.frequent.counts), key=str)
+                if self.frequent.complete else None
+            )
+        return profile
+
+
+def layer_tables(layer: str, directory: Path) -> dict[str, tuple[Path, str, TableSchema | None]]:
+    """
+    Tables of a layer directory: name -> (file, format, registered schema).
+
+    Raw tables are the CSVs of the directory (named after their registered
+    raw table); processed and modeled tables are the stored tables of the
+    directory, in the format read_table would pick.
+    """
+    directory = Path(directory)
+    tables = {}
+    if layer == "raw":
+        schemas = {schema.file_name: schema for schema in RAW_SCHEMAS.values()}
+        for path in sorted(directory.glob("*.csv")):
+            schema = schemas.get(path.name)
+            tables[schema.name if schema else path.stem] = (path, "csv", schema)
+        return tables
+
+    for fmt in reversed(READ_PRIORITY):
+        for path in sorted(directory.glob(f"*{TABLE_FORMATS[fmt]}")):
+            tables[path.stem] = (path, fmt, SCHEMAS.get(path.stem))
+    return dict(sorted(tables.items()))
+
+def _record_batches(path: Path, fmt: str) -> Iterator[pa.RecordBatch]:
+    """
+    Stream a stored table as record batches (CSV values as strings).
+    """
+    if fmt == "csv":
+        with open(path, newline="") as file:
+            header = next(csv.reader(file), [])
+        batches = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in header}, strings_can_be_null=True,
+            ),
+        )
+    elif fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=BATCH_ROWS)
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    for batch in batches:
+        for start in range(0, batch.num_rows, BATCH_ROWS):
+            yield batch.slice(start, BATCH_ROWS)
+
+def profile_table(path: Path, fmt: str, schema: TableSchema | None = None) -> tuple[dict, dict[str, ColumnProfile]]:
+    """
+    Profile a stored table in a single streaming pass.
+
+    Batches are read one at a time (CSV blocks, Parquet row groups, Feather
+    record batches), so memory holds one batch and the column sketches:
+    a HyperLogLog for distinct counts, a KLL sketch for quantiles and a
+    Misra-Gries summary for the frequent values (see profiling.sketches).
+    CSV values are read as strings and converted to the kind of their
+    registered column (inferred from the first batch for unregistered
+    columns); values that don't convert are type conflicts.
+
+    Returns
+    -------
+    tuple[dict, dict[str, ColumnProfile]]
+        Table summary (file, format, signature, rows, bytes, seconds) and the column profiles.
+    """
+    started = time.perf_counter()
+    signature = file_signature(path)
+    kinds = {column.name: _schema_kind(column.dtype) for column in schema.columns} if schema else {}
+    floats = {
+        column.name for column in schema.columns
+        if column.dtype not in (DATETIME, DATE) and pd.api.types.is_float_dtype(pd.api.types.pandas_dtype(column.dtype))
+    } if schema else set()
+    columns: dict[str, ColumnProfile] = {}
+    rows = 0
+
+    for batch in _record_batches(path, fmt):
+        rows += batch.num_rows
+        for name, values in zip(batch.schema.names, batch.columns):
+            if name not in columns:
+                if fmt != "csv":
+                    arrow_type = values.type.value_type if pa.types.is_dictionary(values.type) else values.type
+                    kind, continuous = _arrow_kind(arrow_type), pa.types.is_floating(arrow_type)
+                else:
+                    kind = kinds.get(name) or _infer_kind(values)
+                    continuous = name in floats
+                columns[name] = ColumnProfile(kind, track_values=not continuous and kind != "datetime")
+            profile = columns[name]
+            typed, conflicts = _parse(values, profile.kind) if fmt == "csv" else (values, None)
+            profile.update(values, typed, conflicts)
+    record_bytes_read(path)
+
+    summary = {
+        "path": str(path),
+        "format": fmt,
+        "signature": signature,
+        "rows": rows,
+        "bytes": Path(path).stat().st_size,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    return summary, columns
+
+def population_stability(histogram: dict[str, list], profile: ColumnProfile) -> float:
+    """
+    Population stability index of a column against a stored histogram.
+
+    The current shares of the values in the stored bins come from the
+    column's quantile sketch; PSI = sum((current - stored) * ln(current / stored)),
+    with shares floored at 1e-4. Below 0.1 is usually read as stable,
+    above 0.2 as a significant shift.
+    """
+    edges = _as_numbers(histogram["edges"], profile.kind)
+    expected = np.maximum(np.asarray(histogram["shares"], dtype="float64"), 1e-4)
+    actual = np.maximum(np.diff(np.r_[0.0, profile.quantiles.cdf(edges), 1.0]), 1e-4)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def column_drift(previous: dict[str, Any], profile: ColumnProfile) -> list[str]:
+    """
+    Changes of a column since its previous profile worth looking at.
+
+    Checks the value kind, the null rate, new type conflicts, new and
+    vanished values of low-cardinality columns, and the distribution of
+    numeric and datetime values (population stability index).
+    """
+    issues = []
+    if previous["kind"] != profile.kind:
+        return [f"kind {previous['kind']} -> {profile.kind}"]
+
+    null_rate = profile.nulls / profile.rows if profile.rows else 0.0
+    if abs(null_rate - previous["null_rate"]) > NULL_RATE_DRIFT:
+        issues.append(f"null rate {previous['null_rate']:.1%} -> {null_rate:.1%}")
+
+    if profile.conflicts and not previous["type_conflicts"]:
+        issues.append(f"{profile.conflicts} values not parsing as {profile.kind} (e.g. {profile.conflict_samples})")
+
+    if previous.get("values") is not None and profile.frequent is not None:
+        before = set(previous["values"])
+        current = {_json_value(value) for value in profile.frequent.counts}
+        new_values = sorted(current - before, key=str)
+        if new_values:
+            issues.append(f"new values {new_values}")
+        if profile.frequent.complete and before - current:
+            issues.append(f"values gone {sorted(before - current, key=str)}")
+
+    if previous.get("histogram") and profile.quantiles is not None and profile.quantiles.count:
+        psi = population_stability(previous["histogram"], profile)
+        if psi > PSI_DRIFT:
+            issues.append(
+                f"distribution shift (PSI {psi:.2f}; median {previous['quantiles']['0.5']} -> "
+                f"{profile._from_sketch(profile.quantiles.quantiles([0.5]))[0]})"
+            )
+    return issues
+
+def table_drift(previous: dict[str, Any], columns: dict[str, ColumnProfile]) -> list[dict[str, str]]:
+    """
+    Drift of every column of a table against its previous profile (see column_drift).
+    """
+    drift = [
+        {"column": name, "message": "new column"} for name in columns if name not in previous["columns"]
+    ] + [
+        {"column": name, "message": "column gone"} for name in previous["columns"] if name not in columns
+    ]
+    for name, profile in columns.items():
+        if name in previous["columns"]:
+            drift += [{"column": name, "message": issue} for issue in column_drift(previous["columns"][name], profile)]
+    return drift
+
+def profile_tables(
+    layers: tuple[str, ...] = DEFAULT_LAYERS,
+    layer_dirs: dict[str, Path] = LAYER_DIRS,
+    profiles_dir: Path = PROFILES_DIR,
+    max_workers: int = 4,
+) -> list[str]:
+    """
+    Profile every table of the given layers and report drift against the previous profile.
+
+    Tables are profiled concurrently (see profile_table). The report,
+    with the drift found against the previous report's tables, is written
+    to <profiles_dir>/<profile_id>.json and latest.json. When every table
+    has the size and mtime it had in the previous report, nothing is
+    profiled again.
+
+    Parameters
+    ----------
+    layers : tuple[str, ...]
+        Layers to profile (keys of layer_dirs).
+    layer_dirs : dict[str, Path]
+        Directory of each layer.
+    profiles_dir : Path
+        Directory of the profile reports.
+    max_workers : int
+        Tables profiled concurrently.
+
+    Returns
+    -------
+    list[str]
+        Drift found, one line per table and column.
+    """
+    profiles_dir = Path(profiles_dir)
+    latest_path = profiles_dir / "latest.json"
+    previous = json.loads(latest_path.read_text()) if latest_path.exists() else None
+
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    tables = {
+        f"{layer}/{name}": entry
+        for layer in layers
+        for name, entry in layer_tables(layer, layer_dirs[layer]).items()
+    }
+    if previous and previous["tables"].keys() == tables.keys() and all(
+        previous["tables"][key].get("signature") == file_signature(path) for key, (path, *_) in tables.items()
+    ):
+        print("Profiles are up to date.")
+        return []
+    metrics = current_metrics()
+
+    def profile(entry):
+        with report_to(metrics):
+            return profile_table(*entry)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(tables, executor.map(profile, tables.values())))
+
+    report = {
+        "profile_id": started_at.strftime("%Y%m%dT%H%M%S_%fZ"),
+        "started_at": started_at.isoformat(),
+        "previous_profile_id": previous["profile_id"] if previous else None,
+        "tables": {},
+        "drift": [],
+    }
+    for key, (summary, columns) in results.items():
+        report["tables"][key] = {**summary, "columns": {name: profile.to_dict() for name, profile in columns.items()}}
+        if previous and key in previous["tables"]:
+            report["drift"] += [{"table": key, **issue} for issue in table_drift(previous["tables"][key], columns)]
+    report["wall_seconds"] = round(time.perf_counter() - started, 3)
+
+    profiles_dir.mkdir(parents=True, exist_ok=True)
+    content = json.dumps(report, indent=2)
+    for target in (profiles_dir / f"{report['profile_id']}.json", latest_path):
+        tmp_path = target.with_name(f".{target.name}.tmp")
+        tmp_path.write_text(content)
+        os.replace(tmp_path, target)
+
+    lines = [f"{issue['table']}.{issue['column']}: {issue['message']}" for issue in report["drift"]]
+    print(f"Profiled {len(results)} tables in {report['wall_seconds']}s ({len(lines)} drift issues).")
+    for line in lines:
+        print(f"  {line}")
+    return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the pipeline tables and report drift since the last profile.")
+    parser.add_argument("--layers", nargs="+", choices=sorted(LAYER_DIRS), default=list(DEFAULT_LAYERS),
+                        help="Layers whose tables are profiled.")
+    parser.add_argument("--workers", type=int, default=4, help="Tables profiled concurrently.")
+    args = parser.parse_args()
+
+    profile_tables(layers=tuple(args.layers), max_workers=args.workers)
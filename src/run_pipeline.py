@@ -1,37 +1,530 @@
-import subprocess
-import sys
+import argparse
+from pathlib import Path
 
-PIPELINE_STEPS = [
-    "src/ingestion/ingest_olist.py", # Ingest raw data
+from cleaning.customers_cleaning import clean_customers
+from cleaning.geolocation_cleaning import clean_geolocation
+from cleaning.order_items_cleaning import clean_order_items
+from cleaning.orders_cleaning import clean_orders
+from cleaning.payments_cleaning import clean_payments
+from cleaning.products_cleaning import clean_products
+from cleaning.rules import REJECTS_DIR
+from engines.base import ENGINES
+from ingestion.ingest_olist import download_olist_dataset
+from ingestion.raw_cache import build_raw_cache
+from modeling.cohorts import COHORT_VARIANTS, build_cohort_tables
+from modeling.customer_rfm import build_customer_rfm
+from modeling.date_dimension import build_date_dimension
+from modeling.engine_fact_orders import engine_fact_orders
+from modeling.entity_dimensions import build_customer_dimension, build_product_dimension, build_seller_dimension
+from modeling.fact_orders import fact_orders, fact_orders_from_cleaned, write_fact_orders_partitions
+from modeling.geolocation import build_order_distances
+from modeling.market_basket import DEFAULT_MIN_SUPPORT, DEFAULT_TOP_K, build_market_basket
+from modeling.incremental_fact_orders import DEFAULT_LOOKBACK_DAYS, STATE_DIR, refresh_fact_orders
+from modeling.order_items_aggregation import order_items_aggregation
+from modeling.payments_aggregation import payments_aggregation
+from modeling.receivables import build_receivables
+from modeling.rollups import ROLLUPS, STATE_DIR as ROLLUPS_STATE_DIR, build_rollups
+from modeling.sharded_fact_orders import sharded_fact_orders
+from modeling.streaming_aggregation import (
+    DEFAULT_MEMORY_BUDGET_MB,
+    stream_order_items_aggregation,
+    stream_payments_aggregation,
+)
+from modeling.surrogate_keys import KEYS_DIR
+from orchestration.cache import StepCache
+from orchestration.dag import Step, run_dag
+from orchestration.metrics import RUNS_DIR, RunManifest
+from profiling.profiler import DEFAULT_LAYERS, PROFILES_DIR, profile_tables
+from storage.concurrent_io import DEFAULT_IN_FLIGHT_MB, IO_WORKERS, configure_io_pool
+from storage.tables import DEFAULT_FORMAT, TABLE_FORMATS
+
+RAW_DATA_DIR = Path("data/raw/olist")
+PROCESSED_DATA_DIR = Path("data/processed/olist")
+MODELED_DATA_DIR = Path("data/modeled/olist")
+CACHE_PATH = Path("data/cache/olist/step_cache.json")
 
-    "src/cleaning/products_cleaning.py",
-    "src/cleaning/orders_cleaning.py",
-    "src/cleaning/order_items_cleaning.py",
-    "src/cleaning/payments_cleaning.py",
+
+PIPELINE_STEPS = [
+    Step("clean_products", clean_products, output="products_cleaned", output_dir=PROCESSED_DATA_DIR,
+         params={
+             "products_path": RAW_DATA_DIR / "olist_products_dataset.csv",
+             "category_translation_path": RAW_DATA_DIR / "product_category_name_translation.csv",
+             "rejects_dir": REJECTS_DIR,
+         }),
+    Step("clean_orders", clean_orders, output="orders_cleaned", output_dir=PROCESSED_DATA_DIR,
+         params={"orders_path": RAW_DATA_DIR / "olist_orders_dataset.csv", "rejects_dir": REJECTS_DIR}),
+    Step("clean_order_items", clean_order_items, output="order_items_cleaned", output_dir=PROCESSED_DATA_DIR,
+         params={"order_items_path": RAW_DATA_DIR / "olist_order_items_dataset.csv", "rejects_dir": REJECTS_DIR}),
+    Step("clean_payments", clean_payments, output="payments_cleaned", output_dir=PROCESSED_DATA_DIR,
+         params={"payments_path": RAW_DATA_DIR / "olist_order_payments_dataset.csv", "rejects_dir": REJECTS_DIR}),
     # Clean for fact tables
 
-    "src/modeling/order_items_aggregation.py",
-    "src/modeling/payments_aggregation.py",
-    "src/modeling/fact_orders.py",
+    Step("order_items_aggregation", order_items_aggregation, ("order_items_cleaned",),
+         "order_items_aggregated", MODELED_DATA_DIR),
+    Step("payments_aggregation", payments_aggregation, ("payments_cleaned",),
+         "payments_aggregated", MODELED_DATA_DIR),
+    Step("fact_orders", fact_orders_from_cleaned,
+         ("orders_cleaned", "order_items_cleaned", "payments_cleaned", "order_distances"),
+         "fact_orders", MODELED_DATA_DIR),
     # Fact tables modeling
 
-    "src/cleaning/customers_cleaning.py",
-    "src/modeling/date_dimension.py",
-    # Dimension tables modeling
+    Step("clean_customers", clean_customers, output="customers_cleaned", output_dir=PROCESSED_DATA_DIR,
+         params={"customers_path": RAW_DATA_DIR / "olist_customers_dataset.csv"}),
+    Step("build_date_dimension", build_date_dimension, ("fact_orders",), "dim_date", MODELED_DATA_DIR),
+    Step("build_customer_dimension", build_customer_dimension, ("customers_cleaned",),
+         "dim_customers", MODELED_DATA_DIR, params={"keys_dir": KEYS_DIR}),
+    Step("build_product_dimension", build_product_dimension, ("products_cleaned",),
+         "dim_products", MODELED_DATA_DIR, params={"keys_dir": KEYS_DIR}),
+    Step("build_seller_dimension", build_seller_dimension, output="dim_sellers", output_dir=MODELED_DATA_DIR,
+         params={"sellers_path": RAW_DATA_DIR / "olist_sellers_dataset.csv", "keys_dir": KEYS_DIR}),
+    # Dimension tables modeling (customers, products and sellers carry surrogate keys)
 
-    
-    
+    Step("clean_geolocation", clean_geolocation, output="geolocation_centroids", output_dir=PROCESSED_DATA_DIR,
+         params={"geolocation_path": RAW_DATA_DIR / "olist_geolocation_dataset.csv", "rejects_dir": REJECTS_DIR}),
+    Step("build_order_distances", build_order_distances, ("customers_cleaned", "dim_sellers", "geolocation_centroids"),
+         "order_distances", MODELED_DATA_DIR,
+         params={
+             "orders_path": RAW_DATA_DIR / "olist_orders_dataset.csv",
+             "order_items_path": RAW_DATA_DIR / "olist_order_items_dataset.csv",
+         }),
+    # Customer -> seller distances, from the zip code prefix centroids
+
+    Step("build_customer_rfm", build_customer_rfm, ("fact_orders", "dim_customers"), "customer_rfm", MODELED_DATA_DIR),
+    # Customer segmentation (recency / frequency / monetary scores)
 ]
 
-def run_pipeline():
-    for step in PIPELINE_STEPS:
-        print(f"\n▶ Running {step}")
-        result = subprocess.run([sys.executable, step])
+# Steps replaced by a bounded-memory equivalent in streaming mode
+STREAMED_STEPS = {
+    "clean_order_items", "order_items_aggregation",
+    "clean_payments", "payments_aggregation",
+    "fact_orders",
+}
+
+def streaming_steps(memory_budget_mb: int, storage_format: str) -> list[Step]:
+    """
+    Pipeline steps where order items and payments are cleaned and
+    aggregated chunk by chunk, within a memory budget.
+    """
+    return [step for step in PIPELINE_STEPS if step.name not in STREAMED_STEPS] + [
+        Step("stream_order_items_aggregation", stream_order_items_aggregation,
+             output="order_items_aggregated", output_dir=MODELED_DATA_DIR,
+             params={
+                 "order_items_path": RAW_DATA_DIR / "olist_order_items_dataset.csv",
+                 "memory_budget_mb": memory_budget_mb,
+                 "cleaned_output_dir": PROCESSED_DATA_DIR,
+                 "storage_format": storage_format,
+                 "rejects_dir": REJECTS_DIR,
+             },
+             writes={"order_items_cleaned": PROCESSED_DATA_DIR}),
+        Step("stream_payments_aggregation", stream_payments_aggregation,
+             output="payments_aggregated", output_dir=MODELED_DATA_DIR,
+             params={
+                 "payments_path": RAW_DATA_DIR / "olist_order_payments_dataset.csv",
+                 "memory_budget_mb": memory_budget_mb,
+                 "cleaned_output_dir": PROCESSED_DATA_DIR,
+                 "storage_format": storage_format,
+                 "rejects_dir": REJECTS_DIR,
+             },
+             writes={"payments_cleaned": PROCESSED_DATA_DIR}),
+        Step("fact_orders", fact_orders,
+             ("orders_cleaned", "order_items_aggregated", "payments_aggregated", "order_distances"),
+             "fact_orders", MODELED_DATA_DIR),
+    ]
+
+# Steps replaced by the delta refresh in incremental mode
+INCREMENTAL_STEPS = STREAMED_STEPS | {"clean_orders", "build_date_dimension", "build_customer_rfm"}
+
+# Steps replaced by the order_id-sharded multi-process step in sharded mode
+SHARDED_STEPS = STREAMED_STEPS | {"clean_orders"}
+# Tables written by the sharded and engine steps besides fact_orders
+SHARD_WRITES = {
+    **dict.fromkeys(("orders_cleaned", "order_items_cleaned", "payments_cleaned"), PROCESSED_DATA_DIR),
+    **dict.fromkeys(("order_items_aggregated", "payments_aggregated"), MODELED_DATA_DIR),
+}
+
+def sharded_steps(n_shards: int, storage_format: str) -> list[Step]:
+    """
+    Pipeline steps where orders, items and payments are cleaned, aggregated
+    and modeled in order_id shards, one process per shard.
+    """
+    return [step for step in PIPELINE_STEPS if step.name not in SHARDED_STEPS] + [
+        Step("sharded_fact_orders", sharded_fact_orders, ("order_distances",), "fact_orders", MODELED_DATA_DIR,
+             params={
+                 "orders_path": RAW_DATA_DIR / "olist_orders_dataset.csv",
+                 "order_items_path": RAW_DATA_DIR / "olist_order_items_dataset.csv",
+                 "payments_path": RAW_DATA_DIR / "olist_order_payments_dataset.csv",
+                 "n_shards": n_shards,
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+                 "keys_dir": KEYS_DIR,
+                 "rejects_dir": REJECTS_DIR,
+             },
+             writes=SHARD_WRITES),
+    ]
+
+# Steps replaced by the engine step when another engine than pandas is selected
+ENGINE_STEPS = STREAMED_STEPS | {"clean_orders"}
+
+def engine_steps(engine: str, memory_budget_mb: int, storage_format: str) -> list[Step]:
+    """
+    Pipeline steps where orders, items and payments are cleaned, aggregated
+    and modeled on another execution engine (e.g. out-of-core on DuckDB).
+    """
+    return [step for step in PIPELINE_STEPS if step.name not in ENGINE_STEPS] + [
+        Step("engine_fact_orders", engine_fact_orders, ("order_distances",), "fact_orders", MODELED_DATA_DIR,
+             params={
+                 "orders_path": RAW_DATA_DIR / "olist_orders_dataset.csv",
+                 "order_items_path": RAW_DATA_DIR / "olist_order_items_dataset.csv",
+                 "payments_path": RAW_DATA_DIR / "olist_order_payments_dataset.csv",
+                 "engine": engine,
+                 "memory_limit_mb": memory_budget_mb,
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+                 "keys_dir": KEYS_DIR,
+                 "rejects_dir": REJECTS_DIR,
+             },
+             writes=SHARD_WRITES),
+    ]
+
+def partition_steps(storage_format: str, max_workers: int) -> list[Step]:
+    """
+    Step writing the month-partitioned copy of fact_orders.
+    """
+    return [
+        Step("partition_fact_orders", write_fact_orders_partitions, ("fact_orders",),
+             params={
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+                 "max_workers": max_workers,
+             }),
+    ]
+
+def rollup_steps(storage_format: str) -> list[Step]:
+    """
+    Step refreshing the pre-aggregated BI rollups (only new or changed days are recomputed).
+    """
+    return [
+        Step("build_rollups", build_rollups, ("fact_orders", "dim_customers", "dim_products"),
+             params={
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "state_dir": ROLLUPS_STATE_DIR,
+                 "storage_format": storage_format,
+             },
+             # Cleaned items and payments are read back from processed_dir
+             reads=("order_items_cleaned", "payments_cleaned"),
+             writes=dict.fromkeys(
+                 (f"rollup_{rollup}_{grain}" for rollup in ROLLUPS for grain in ("daily", "monthly")), MODELED_DATA_DIR,
+             )),
+    ]
 
-        if result.returncode != 0:
-            raise RuntimeError(f"Pipeline failed at step: {step}")
+def cohort_steps(storage_format: str, variants: tuple[str, ...]) -> list[Step]:
+    """
+    Step rebuilding the monthly acquisition-cohort retention tables.
+    """
+    return [
+        Step("build_cohort_tables", build_cohort_tables, ("fact_orders", "dim_customers", "dim_products"),
+             params={
+                 "variants": variants,
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+             },
+             # Cleaned items are read back from processed_dir (category cohorts)
+             reads=("order_items_cleaned",),
+             writes=dict.fromkeys(
+                 ("cohort_retention", *(f"cohort_retention_by_{variant}" for variant in variants)), MODELED_DATA_DIR,
+             )),
+    ]
+
+def market_basket_steps(storage_format: str, min_support: float, top_k: int) -> list[Step]:
+    """
+    Step rebuilding the product and category association (market-basket) tables.
+    """
+    return [
+        Step("build_market_basket", build_market_basket, ("dim_products",),
+             params={
+                 "min_support": min_support,
+                 "top_k": top_k,
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+             },
+             # Cleaned items are read back from processed_dir
+             reads=("order_items_cleaned",),
+             writes=dict.fromkeys(("product_associations", "category_associations"), MODELED_DATA_DIR)),
+    ]
+
+def receivables_steps(storage_format: str, partitioned: bool) -> list[Step]:
+    """
+    Step expanding payments into installments and the monthly receivables.
+    """
+    return [
+        Step("build_receivables", build_receivables, ("fact_orders",),
+             params={
+                 "partitioned": partitioned,
+                 "processed_dir": PROCESSED_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "storage_format": storage_format,
+             },
+             # Cleaned payments are read back from processed_dir
+             reads=("payments_cleaned",),
+             # payment_installments is a directory of partitions with partitioned
+             writes=dict.fromkeys(("payment_installments", "receivables_monthly"), MODELED_DATA_DIR)),
+    ]
+
+# Tables of the processed layer (profiled once written)
+PROCESSED_TABLES = (
+    "products_cleaned", "orders_cleaned", "order_items_cleaned", "payments_cleaned", "customers_cleaned",
+    "geolocation_centroids",
+)
+
+def data_profile_steps(max_workers: int) -> list[Step]:
+    """
+    Step profiling the raw and processed tables once they are written, and reporting drift.
+    """
+    return [
+        Step("profile_tables", profile_tables,
+             params={"layers": DEFAULT_LAYERS, "profiles_dir": PROFILES_DIR, "max_workers": max_workers},
+             reads=PROCESSED_TABLES),
+    ]
+
+def incremental_steps(lookback_days: int, storage_format: str) -> list[Step]:
+    """
+    Pipeline steps where fact_orders and dim_date are upserted with the
+    orders that are new or changed since the last refresh.
+    """
+    return [step for step in PIPELINE_STEPS if step.name not in INCREMENTAL_STEPS] + [
+        Step("refresh_fact_orders", refresh_fact_orders, ("dim_customers", "dim_products", "order_distances"),
+             params={
+                 "raw_dir": RAW_DATA_DIR,
+                 "modeled_dir": MODELED_DATA_DIR,
+                 "state_dir": STATE_DIR,
+                 "lookback_days": lookback_days,
+                 "storage_format": storage_format,
+                 "keys_dir": KEYS_DIR,
+                 "rejects_dir": REJECTS_DIR,
+             }),
+    ]
+
+# Tables loaded by the Power BI report, exported as CSV on demand
+BI_TABLES = {"fact_orders", "dim_date", "dim_customers"}
+
+def run_pipeline(
+    max_workers: int = 4,
+    storage_format: str = DEFAULT_FORMAT,
+    export_csv: bool = False,
+    use_cache: bool = True,
+    streaming: bool = False,
+    memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB,
+    incremental: bool = False,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    profile_steps: set[str] = frozenset(),
+    partitioned: bool = False,
+    shards: int = 0,
+    engine: str = "pandas",
+    mirror_dir: str | None = None,
+    raw_cache: bool = True,
+    io_workers: int = IO_WORKERS,
+    io_memory_mb: int = DEFAULT_IN_FLIGHT_MB,
+    cohort_variants: tuple[str, ...] = tuple(COHORT_VARIANTS),
+    basket_min_support: float = DEFAULT_MIN_SUPPORT,
+    basket_top_k: int = DEFAULT_TOP_K,
+    data_profile: bool = True,
+):
+    # Reads and background writes of every step share one bounded pool
+    io_pool = configure_io_pool(io_workers, io_memory_mb)
+
+    # Ingest raw data (skipped when the files are already there)
+    download_olist_dataset(str(RAW_DATA_DIR), mirror_dir)
+    if raw_cache:
+        # Parse each raw CSV once into a memory-mapped Arrow file (skipped when unchanged)
+        build_raw_cache(RAW_DATA_DIR, max_workers)
+
+    steps = PIPELINE_STEPS
+    if streaming:
+        steps = streaming_steps(memory_budget_mb, storage_format)
+    if shards:
+        steps = sharded_steps(shards, storage_format)
+    if engine != "pandas":
+        steps = engine_steps(engine, memory_budget_mb, storage_format)
+    if partitioned and not incremental:
+        steps = steps + partition_steps(storage_format, max_workers)
+    if not incremental:
+        # Incremental refreshes maintain the rollups of their window themselves; the
+        # cohort, market-basket and receivables tables need the cleaned items / payments they
+        # don't write, and keep their last full build
+        steps = (
+            steps
+            + rollup_steps(storage_format)
+            + cohort_steps(storage_format, cohort_variants)
+            + market_basket_steps(storage_format, basket_min_support, basket_top_k)
+            + receivables_steps(storage_format, partitioned)
+        )
+    if incremental:
+        steps = incremental_steps(lookback_days, storage_format)
+    if data_profile:
+        steps = steps + data_profile_steps(max_workers)
+
+    # Per-step timings, memory, rows, rejects and I/O of this run
+    manifest = RunManifest(RUNS_DIR, profile_steps=profile_steps, settings={
+        "max_workers": max_workers,
+        "storage_format": storage_format,
+        "export_csv": export_csv,
+        "use_cache": use_cache,
+        "streaming": streaming,
+        "memory_budget_mb": memory_budget_mb,
+        "incremental": incremental,
+        "lookback_days": lookback_days,
+        "partitioned": partitioned,
+        "shards": shards,
+        "engine": engine,
+        "raw_cache": raw_cache,
+        "io_workers": io_workers,
+        "io_memory_mb": io_memory_mb,
+        "cohort_variants": list(cohort_variants),
+        "basket_min_support": basket_min_support,
+        "basket_top_k": basket_top_k,
+        "data_profile": data_profile,
+    })
+    status = "failed"
+    try:
+        run_dag(
+            steps,
+            max_workers=max_workers,
+            storage_format=storage_format,
+            csv_exports=BI_TABLES if export_csv else set(),
+            cache=StepCache(CACHE_PATH) if use_cache else None,
+            manifest=manifest,
+            io_pool=io_pool,
+        )
+        status = "succeeded"
+    finally:
+        manifest_path = manifest.write(status)
+        print(f"\nRun manifest written to {manifest_path}")
 
     print("\n✅ Pipeline completed successfully")
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Run the Olist pipeline end-to-end.")
+    parser.add_argument(
+        "--workers", type=int, default=4,
+        help="Number of steps allowed to run concurrently (1 = sequential).",
+    )
+    parser.add_argument(
+        "--format", choices=sorted(TABLE_FORMATS), default=DEFAULT_FORMAT,
+        help="Storage format of the processed and modeled tables.",
+    )
+    parser.add_argument(
+        "--export-csv", action="store_true",
+        help="Also export the BI tables as CSV.",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Rerun every step, ignoring the step cache.",
+    )
+    parser.add_argument(
+        "--mirror", default=None,
+        help="Copy the raw CSVs from this local directory instead of downloading them.",
+    )
+    parser.add_argument(
+        "--no-raw-cache", action="store_true",
+        help="Read the raw CSVs directly instead of their columnar (Arrow) copies.",
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Clean and aggregate order items and payments in chunks, with bounded memory.",
+    )
+    parser.add_argument(
+        "--memory-budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+        help="Memory budget of one streamed chunk (with --streaming), or of an out-of-core engine (with --engine).",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Upsert only new and changed orders into fact_orders and dim_date.",
+    )
+    parser.add_argument(
+        "--lookback-days", type=int, default=DEFAULT_LOOKBACK_DAYS,
+        help="Days before the watermark in which orders may still change (with --incremental).",
+    )
+    parser.add_argument(
+        "--shards", type=int, default=0,
+        help="Clean, aggregate and model orders / items / payments in this many "
+             "order_id shards, one process each (0 = single process).",
+    )
+    parser.add_argument(
+        "--engine", choices=sorted(ENGINES), default="pandas",
+        help="Engine cleaning, aggregating and modeling orders / items / payments "
+             "(duckdb runs out-of-core and multi-threaded).",
+    )
+    parser.add_argument(
+        "--partitioned", action="store_true",
+        help="Also write fact_orders partitioned by purchase month (only changed months are rewritten; "
+             "--incremental always stores it that way).",
+    )
+    parser.add_argument(
+        "--io-workers", type=int, default=IO_WORKERS,
+        help="Tables read or written concurrently by the I/O pool.",
+    )
+    parser.add_argument(
+        "--io-memory-mb", type=int, default=DEFAULT_IN_FLIGHT_MB,
+        help="Cap on the tables being read or waiting to be written by the I/O pool.",
+    )
+    parser.add_argument(
+        "--cohort-variants", nargs="*", choices=sorted(COHORT_VARIANTS), default=list(COHORT_VARIANTS),
+        help="Breakdowns of the cohort retention table to build besides the overall one.",
+    )
+    parser.add_argument(
+        "--basket-min-support", type=float, default=DEFAULT_MIN_SUPPORT,
+        help="Share of the orders a product or category pair must appear in to get association rules.",
+    )
+    parser.add_argument(
+        "--basket-top-k", type=int, default=DEFAULT_TOP_K,
+        help="Associated products / categories kept per product / category, by decreasing lift.",
+    )
+    parser.add_argument(
+        "--no-data-profile", action="store_true",
+        help="Skip profiling the raw and processed tables (and the drift report against the last profile).",
+    )
+    parser.add_argument(
+        "--profile", nargs="+", default=[], metavar="STEP",
+        help="Run these steps under cProfile (stats saved next to the run manifest).",
+    )
+    args = parser.parse_args()
+
+    # Each mode replaces the same orders / items / payments steps: only one can apply
+    modes = [
+        option for option, selected in (
+            ("--streaming", args.streaming),
+            ("--shards", args.shards > 0),
+            ("--engine", args.engine != "pandas"),
+            ("--incremental", args.incremental),
+        ) if selected
+    ]
+    if len(modes) > 1:
+        parser.error(f"{', '.join(modes)} select different execution modes; use at most one of them")
+
+    run_pipeline(
+        max_workers=args.workers,
+        storage_format=args.format,
+        export_csv=args.export_csv,
+        use_cache=not args.no_cache,
+        streaming=args.streaming,
+        memory_budget_mb=args.memory_budget_mb,
+        incremental=args.incremental,
+        lookback_days=args.lookback_days,
+        profile_steps=set(args.profile),
+        partitioned=args.partitioned,
+        shards=args.shards,
+        engine=args.engine,
+        mirror_dir=args.mirror,
+        raw_cache=not args.no_raw_cache,
+        io_workers=args.io_workers,
+        io_memory_mb=args.io_memory_mb,
+        cohort_variants=tuple(args.cohort_variants),
+        basket_min_support=args.basket_min_support,
+        basket_top_k=args.basket_top_k,
+        data_profile=not args.no_data_profile,
+    )
@@ -0,0 +1,553 @@
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from orchestration.metrics import record_bytes_read, record_nat_coercions
+from schemas.timestamps import parse_timestamps
+from storage.columnar_raw import open_columnar
+
+# Compact dtypes shared by the tables below
+ID = "string[pyarrow]"  # 32-char hex identifiers
+TEXT = "string[pyarrow]"
+CATEGORY = "category"  # low-cardinality labels (states, statuses, payment types, ...)
+DATETIME = "datetime64[ns]"
+DATE = "date"  # calendar dates, as datetime.date objects (object dtype; Arrow date32 in Parquet / Feather)
+MONEY = "float64"  # kept in double precision: summed into order totals
+KEY = "int32"  # surrogate keys (see modeling.surrogate_keys)
+
+# Natural ID column -> integer surrogate key column of the modeled tables
+SURROGATE_KEYS = {
+    "order_id": "order_key",
+    "customer_id": "customer_key",
+    "customer_unique_id": "customer_unique_key",
+    "product_id": "product_key",
+    "seller_id": "seller_key",
+}
+
+
+@dataclass(frozen=True)
+class Column:
+    """
+    A declared table column.
+
+    Attributes
+    ----------
+    name : str
+        Column name.
+    dtype : str
+        pandas dtype the column is loaded and stored as ("object" keeps it as
+        is, DATE holds datetime.date objects).
+    nullable : bool
+        Whether missing values are expected in the column.
+    """
+
+    name: str
+    dtype: str
+    nullable: bool = True
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Declared columns of a raw, processed or modeled table.
+
+    Attributes
+    ----------
+    name : str
+        Table name (storage name for processed and modeled tables).
+    label : str
+        Name used in error messages.
+    columns : tuple[Column, ...]
+        Declared columns, in output order.
+    file_name : str | None
+        CSV file name, for raw tables.
+    """
+
+    name: str
+    label: str
+    columns: tuple[Column, ...]
+    file_name: str | None = None
+
+    @property
+    def column_names(self) -> list[str]:
+        return [column.name for column in self.columns]
+
+    @property
+    def datetime_columns(self) -> list[str]:
+        return [column.name for column in self.columns if column.dtype == DATETIME]
+
+    def read_dtypes(self) -> dict[str, str]:
+        """
+        dtype mapping for pd.read_csv.
+
+        Datetimes are read as Arrow strings and parsed separately (see schemas.timestamps).
+        """
+        return {
+            column.name: TEXT if column.dtype == DATETIME else column.dtype
+            for column in self.columns
+            if column.dtype not in ("object", DATE)
+        }
+
+
+RAW_SCHEMAS = {
+    "customers": TableSchema("customers", "customers", (
+        Column("customer_id", ID, nullable=False),
+        Column("customer_unique_id", ID, nullable=False),
+        Column("customer_zip_code_prefix", "int32", nullable=False),
+        Column("customer_city", CATEGORY),
+        Column("customer_state", CATEGORY),
+    ), "olist_customers_dataset.csv"),
+    "orders": TableSchema("orders", "orders", (
+        Column("order_id", ID, nullable=False),
+        Column("customer_id", ID, nullable=False),
+        Column("order_status", CATEGORY),
+        Column("order_purchase_timestamp", DATETIME),
+        Column("order_approved_at", DATETIME),
+        Column("order_delivered_carrier_date", DATETIME),
+        Column("order_delivered_customer_date", DATETIME),
+        Column("order_estimated_delivery_date", DATETIME),
+    ), "olist_orders_dataset.csv"),
+    "order_items": TableSchema("order_items", "order_items", (
+        Column("order_id", ID, nullable=False),
+        Column("order_item_id", "int32", nullable=False),
+        Column("product_id", ID, nullable=False),
+        Column("seller_id", ID, nullable=False),
+        Column("shipping_limit_date", DATETIME),
+        Column("price", MONEY),
+        Column("freight_value", MONEY),
+    ), "olist_order_items_dataset.csv"),
+    "payments": TableSchema("payments", "payments", (
+        Column("order_id", ID, nullable=False),
+        Column("payment_sequential", "int32", nullable=False),
+        Column("payment_type", CATEGORY),
+        Column("payment_installments", "int32", nullable=False),
+        Column("payment_value", MONEY),
+    ), "olist_order_payments_dataset.csv"),
+    "products": TableSchema("products", "products", (
+        Column("product_id", ID, nullable=False),
+        Column("product_category_name", TEXT),
+        Column("product_name_lenght", "float32"),
+        Column("product_description_lenght", "float32"),
+        Column("product_photos_qty", "float32"),
+        Column("product_weight_g", "float32"),
+        Column("product_length_cm", "float32"),
+        Column("product_height_cm", "float32"),
+        Column("product_width_cm", "float32"),
+    ), "olist_products_dataset.csv"),
+    "category_translation": TableSchema("category_translation", "category translation", (
+        Column("product_category_name", TEXT, nullable=False),
+        Column("product_category_name_english", TEXT, nullable=False),
+    ), "product_category_name_translation.csv"),
+    "sellers": TableSchema("sellers", "sellers", (
+        Column("seller_id", ID, nullable=False),
+        Column("seller_zip_code_prefix", "int32", nullable=False),
+        Column("seller_city", CATEGORY),
+        Column("seller_state", CATEGORY),
+    ), "olist_sellers_dataset.csv"),
+    "geolocation": TableSchema("geolocation", "geolocation", (
+        Column("geolocation_zip_code_prefix", "int32", nullable=False),
+        Column("geolocation_lat", "float64"),
+        Column("geolocation_lng", "float64"),
+        Column("geolocation_city", CATEGORY),
+        Column("geolocation_state", CATEGORY),
+    ), "olist_geolocation_dataset.csv"),
+    "order_reviews": TableSchema("order_reviews", "order reviews", (
+        Column("review_id", ID, nullable=False),
+        Column("order_id", ID, nullable=False),
+        Column("review_score", "int8"),
+        Column("review_comment_title", TEXT),
+        Column("review_comment_message", TEXT),
+        Column("review_creation_date", DATETIME),
+        Column("review_answer_timestamp", DATETIME),
+    ), "olist_order_reviews_dataset.csv"),
+}
+
+PROCESSED_SCHEMAS = {
+    "customers_cleaned": TableSchema("customers_cleaned", "customers_cleaned", (
+        Column("customer_id", ID, nullable=False),
+        Column("customer_unique_id", ID, nullable=False),
+        Column("customer_zip_code_prefix", "int32", nullable=False),
+        Column("customer_city", CATEGORY),
+        Column("customer_state", CATEGORY),
+    )),
+    "orders_cleaned": TableSchema("orders_cleaned", "orders_cleaned", (
+        *RAW_SCHEMAS["orders"].columns,
+        Column("delivery_duration_days", "float32"),
+        Column("delivery_delay_days", "float32"),
+    )),
+    "order_items_cleaned": TableSchema("order_items_cleaned", "order_items_cleaned", RAW_SCHEMAS["order_items"].columns),
+    "payments_cleaned": TableSchema("payments_cleaned", "payments_cleaned", RAW_SCHEMAS["payments"].columns),
+    "products_cleaned": TableSchema("products_cleaned", "products_cleaned", (
+        Column("product_id", ID, nullable=False),
+        Column("product_category_name", CATEGORY, nullable=False),
+        *RAW_SCHEMAS["products"].columns[2:],
+        Column("product_category_name_english", CATEGORY, nullable=False),
+    )),
+    # One centroid per zip code prefix (see cleaning.geolocation_cleaning)
+    "geolocation_centroids": TableSchema("geolocation_centroids", "geolocation_centroids", (
+        Column("geolocation_zip_code_prefix", "int32", nullable=False),
+        Column("geolocation_lat", "float64", nullable=False),
+        Column("geolocation_lng", "float64", nullable=False),
+        Column("geolocation_points", "int32", nullable=False),
+    )),
+    # Rows rejected by the cleaning rules (see cleaning.rules), as read, with their reason codes
+    **{
+        f"{table}_rejects": TableSchema(f"{table}_rejects", f"{table}_rejects", (
+            *RAW_SCHEMAS[table].columns,
+            Column("reject_reasons", TEXT, nullable=False),
+        ))
+        for table in ("orders", "order_items", "payments", "products", "geolocation")
+    },
+}
+
+
+def _rollup_schemas(name: str, dimensions: tuple[Column, ...], measures: tuple[Column, ...]) -> dict:
+    """
+    Schemas of the daily and monthly rollup tables of a rollup.
+    """
+    return {
+        f"rollup_{name}_{grain}": TableSchema(f"rollup_{name}_{grain}", f"rollup_{name}_{grain}", (
+            time_column, *dimensions, *measures,
+        ))
+        for grain, time_column in (
+            ("daily", Column("date", DATE, nullable=False)),
+            ("monthly", Column("year_month", CATEGORY, nullable=False)),
+        )
+    }
+
+
+MODELED_SCHEMAS = {
+    "order_items_aggregated": TableSchema("order_items_aggregated", "order_items_aggregated", (
+        Column("order_id", ID, nullable=False),
+        Column("order_items_count", "int32", nullable=False),
+        Column("order_items_total_value", MONEY, nullable=False),
+        Column("order_freight_total", MONEY, nullable=False),
+    )),
+    "payments_aggregated": TableSchema("payments_aggregated", "payments_aggregated", (
+        Column("order_id", ID, nullable=False),
+        Column("order_payment_total", MONEY, nullable=False),
+        Column("payment_methods_count", "int32", nullable=False),
+        Column("used_voucher", "boolean", nullable=False),
+    )),
+    "fact_orders": TableSchema("fact_orders", "fact_orders", (
+        Column("order_key", KEY, nullable=False),
+        Column("order_id", ID, nullable=False),  # degenerate dimension, upsert key of incremental loads
+        Column("customer_key", KEY, nullable=False),
+        Column("order_status", CATEGORY, nullable=False),
+        Column("order_purchase_timestamp", DATETIME),
+        Column("delivery_duration_days", "float32"),
+        Column("delivery_delay_days", "float32"),
+        Column("order_items_count", "int32", nullable=False),
+        Column("order_items_total_value", MONEY, nullable=False),
+        Column("order_freight_total", MONEY, nullable=False),
+        Column("order_payment_total", MONEY, nullable=False),
+        Column("payment_methods_count", "int32", nullable=False),
+        Column("used_voucher", "boolean", nullable=False),
+        Column("seller_distance_km", "float32"),  # missing when no customer or seller location is known
+    )),
+    "dim_date": TableSchema("dim_date", "dim_date", (
+        Column("date", DATE, nullable=False),
+        Column("day", "int8", nullable=False),
+        Column("day_name", CATEGORY, nullable=False),
+        Column("month", "int8", nullable=False),
+        Column("month_name", CATEGORY, nullable=False),
+        Column("year", "int16", nullable=False),
+        Column("year_month", CATEGORY, nullable=False),
+        Column("day_of_week", "int8", nullable=False),
+        Column("is_weekend", "bool", nullable=False),
+    )),
+    "dim_customers": TableSchema("dim_customers", "dim_customers", (
+        Column("customer_key", KEY, nullable=False),
+        Column("customer_id", ID, nullable=False),
+        Column("customer_unique_key", KEY, nullable=False),
+        *PROCESSED_SCHEMAS["customers_cleaned"].columns[1:],
+    )),
+    "dim_products": TableSchema("dim_products", "dim_products", (
+        Column("product_key", KEY, nullable=False),
+        *PROCESSED_SCHEMAS["products_cleaned"].columns,
+    )),
+    "dim_sellers": TableSchema("dim_sellers", "dim_sellers", (
+        Column("seller_key", KEY, nullable=False),
+        *RAW_SCHEMAS["sellers"].columns,
+    )),
+    # Mean customer -> seller distance of each order, and customer -> nearest seller
+    # distance (see modeling.geolocation)
+    "order_distances": TableSchema("order_distances", "order_distances", (
+        Column("order_id", ID, nullable=False),
+        Column("seller_distance_km", "float32"),
+        Column("nearest_seller_km", "float32"),
+    )),
+    # Recency / frequency / monetary scores of each real customer (see modeling.customer_rfm)
+    "customer_rfm": TableSchema("customer_rfm", "customer_rfm", (
+        Column("customer_unique_key", KEY, nullable=False),
+        Column("first_purchase_timestamp", DATETIME, nullable=False),
+        Column("last_purchase_timestamp", DATETIME, nullable=False),
+        Column("frequency", "int32", nullable=False),
+        Column("monetary", MONEY, nullable=False),
+        Column("recency_days", "int32", nullable=False),
+        Column("recency_score", "int8", nullable=False),
+        Column("frequency_score", "int8", nullable=False),
+        Column("monetary_score", "int8", nullable=False),
+        Column("rfm_segment", CATEGORY, nullable=False),
+    )),
+    # Monthly acquisition-cohort retention, overall and per state / category (see modeling.cohorts)
+    **{
+        name: TableSchema(name, name, (
+            *dimensions,
+            Column("cohort_month", CATEGORY, nullable=False),  # YYYY-MM of the first purchase
+            Column("months_since_first", "int16", nullable=False),
+            Column("cohort_customers", "int32", nullable=False),
+            Column("active_customers", "int32", nullable=False),
+            Column("retention_rate", "float32", nullable=False),
+            Column("revenue", MONEY, nullable=False),
+        ))
+        for name, dimensions in (
+            ("cohort_retention", ()),
+            ("cohort_retention_by_state", (Column("customer_state", CATEGORY),)),
+            ("cohort_retention_by_category", (Column("product_category_name_english", CATEGORY),)),
+        )
+    },
+    # Top associated products / categories of each one (see modeling.market_basket)
+    **{
+        name: TableSchema(name, name, (
+            *items,
+            Column("pair_orders", "int32", nullable=False),
+            Column("support", "float32", nullable=False),
+            Column("confidence", "float32", nullable=False),
+            Column("lift", "float32", nullable=False),
+            Column("rank", "int16", nullable=False),
+        ))
+        for name, items in (
+            ("product_associations", (
+                Column("product_key", KEY, nullable=False),
+                Column("associated_product_key", KEY, nullable=False),
+            )),
+            ("category_associations", (
+                Column("product_category_name_english", CATEGORY, nullable=False),
+                Column("associated_category_name_english", CATEGORY, nullable=False),
+            )),
+        )
+    },
+    # One row per payment installment, and expected inflow per month (see modeling.receivables)
+    "payment_installments": TableSchema("payment_installments", "payment_installments", (
+        Column("order_id", ID, nullable=False),
+        Column("payment_sequential", "int32", nullable=False),
+        Column("payment_type", CATEGORY),
+        Column("installment_number", "int16", nullable=False),
+        Column("payment_installments", "int16", nullable=False),
+        Column("due_date", DATETIME, nullable=False),  # first day of the due month
+        Column("installment_value", MONEY),
+    )),
+    "receivables_monthly": TableSchema("receivables_monthly", "receivables_monthly", (
+        Column("due_month", CATEGORY, nullable=False),  # YYYY-MM
+        Column("payment_type", CATEGORY),
+        Column("installments_count", "int32", nullable=False),
+        Column("expected_inflow", MONEY, nullable=False),
+    )),
+    # BI rollups (see modeling.rollups): additive measures per day / month
+    **_rollup_schemas("orders", (Column("customer_state", CATEGORY),), (
+        Column("orders_count", "int32", nullable=False),
+        Column("items_count", "int32", nullable=False),
+        Column("items_total_value", MONEY, nullable=False),
+        Column("freight_total", MONEY, nullable=False),
+        Column("payment_total", MONEY, nullable=False),
+        Column("voucher_orders", "int32", nullable=False),
+        Column("delivered_orders", "int32", nullable=False),
+        Column("delivery_duration_days_sum", MONEY, nullable=False),
+        Column("delivery_delay_count", "int32", nullable=False),
+        Column("delivery_delay_days_sum", MONEY, nullable=False),
+    )),
+    **_rollup_schemas("categories", (
+        Column("customer_state", CATEGORY),
+        Column("product_category_name_english", CATEGORY),
+    ), (
+        Column("orders_count", "int32", nullable=False),
+        Column("items_count", "int32", nullable=False),
+        Column("items_total_value", MONEY, nullable=False),
+        Column("freight_total", MONEY, nullable=False),
+    )),
+    **_rollup_schemas("payments", (Column("customer_state", CATEGORY), Column("payment_type", CATEGORY)), (
+        Column("orders_count", "int32", nullable=False),
+        Column("payments_count", "int32", nullable=False),
+        Column("payment_total", MONEY, nullable=False),
+    )),
+    # Persisted natural ID -> surrogate key mappings
+    **{
+        f"{key}_map": TableSchema(f"{key}_map", f"{key}_map", (
+            Column(natural_column, ID, nullable=False),
+            Column(key, KEY, nullable=False),
+        ))
+        for natural_column, key in SURROGATE_KEYS.items()
+    },
+}
+
+SCHEMAS = {**RAW_SCHEMAS, **PROCESSED_SCHEMAS, **MODELED_SCHEMAS}
+
+
+def get_schema(table: str) -> TableSchema:
+    """
+    Look up the schema of a registered table.
+    """
+    if table not in SCHEMAS:
+        raise KeyError(f"No schema registered for table {table!r}")
+    return SCHEMAS[table]
+
+
+def validate_columns(df: pd.DataFrame, table: str):
+    """
+    Check that a dataframe has every column declared for a table.
+
+    Raises
+    ------
+    ValueError
+        If declared columns are missing.
+    """
+    schema = get_schema(table)
+    missing_columns = set(schema.column_names) - set(df.columns)
+    if missing_columns:
+        raise ValueError(f"Missing columns in {schema.label} dataset: {missing_columns}")
+
+
+def check_not_null(df: pd.DataFrame, table: str):
+    """
+    Check that the non-nullable columns of a table have no missing values.
+
+    Raises
+    ------
+    ValueError
+        If a non-nullable column has missing values.
+    """
+    schema = get_schema(table)
+    for column in schema.columns:
+        if not column.nullable and column.name in df.columns and df[column.name].isna().any():
+            raise ValueError(f"Missing values in non-nullable column {column.name!r} of {schema.label} dataset")
+
+
+def enforce_schema(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """
+    Cast the declared columns of a dataframe to their registered dtypes.
+
+    Columns already in the right dtype are left untouched; datetime columns
+    are parsed once with parse_timestamps (invalid values become NaT and are
+    counted in the step metrics), and date columns read back as text (CSV
+    storage) or timestamps become datetime.date objects. Undeclared columns
+    are kept.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe holding (at least) the declared columns.
+    table : str
+        Registered table name.
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with compact dtypes.
+    """
+    schema = get_schema(table)
+    casts = {}
+    for column in schema.columns:
+        if column.name not in df.columns or column.dtype == "object":
+            continue
+        values = df[column.name]
+        if column.dtype == DATE:
+            if pd.api.types.infer_dtype(values, skipna=True) not in ("date", "empty"):
+                casts[column.name] = pd.to_datetime(values).dt.date
+        elif column.dtype == DATETIME:
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                casts[column.name] = parse_timestamps(values, column.name)
+            elif values.dtype != DATETIME:
+                # Other resolutions (e.g. microseconds from Arrow / DuckDB)
+                casts[column.name] = values.astype(DATETIME)
+        elif values.dtype != pd.api.types.pandas_dtype(column.dtype):
+            casts[column.name] = values.astype(column.dtype)
+
+    if casts:
+        df = df.assign(**casts)
+    return df
+
+
+# read_csv options the columnar raw cache can serve
+CACHED_READ_OPTIONS = {"usecols", "nrows", "chunksize"}
+
+def _arrow_dtype(arrow_type):
+    """
+    Load Arrow text as the registry's ID / TEXT dtype, keeping its buffers (no Python strings).
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+    return None
+
+def _read_columnar(cached, table: str, usecols=None, nrows=None, chunksize=None):
+    """
+    Serve a read_raw_table call from the memory-mapped Arrow copy of the CSV.
+    """
+    arrow_table, entry = cached
+    file_rows = arrow_table.num_rows
+    if usecols is not None:
+        # read_csv keeps the file order of the selected columns
+        arrow_table = arrow_table.select([name for name in arrow_table.column_names if name in set(usecols)])
+    if nrows is not None:
+        arrow_table = arrow_table.slice(0, nrows)
+    else:
+        # Parsed at conversion time: report the NaT coercions as if parsed now
+        for column, count in entry["nat_coercions"].items():
+            if column in arrow_table.column_names:
+                record_nat_coercions(column, count)
+
+    def to_frame(start, rows):
+        df = arrow_table.slice(start, rows).to_pandas(types_mapper=_arrow_dtype)
+        df.index = pd.RangeIndex(start, start + len(df))
+        if len(df) < file_rows:
+            # Categories of the whole file: keep those of the rows read, sorted as read_csv does
+            for column in df.select_dtypes("category"):
+                used = df[column].cat.remove_unused_categories()
+                df[column] = used.cat.reorder_categories(sorted(used.cat.categories))
+        return enforce_schema(df, table)
+
+    if chunksize is not None:
+        return (to_frame(start, chunksize) for start in range(0, arrow_table.num_rows, chunksize))
+    return to_frame(0, arrow_table.num_rows)
+
+def read_raw_table(path: Path, table: str, use_cache: bool = True, **read_csv_kwargs):
+    """
+    Read a raw Olist CSV with its registered dtypes.
+
+    When the CSV has an up-to-date columnar copy (see ingestion.raw_cache),
+    the copy is memory-mapped instead of parsing the CSV.
+
+    Parameters
+    ----------
+    path : Path
+        Raw CSV file (or a file-like buffer).
+    table : str
+        Registered raw table name.
+    use_cache : bool
+        Whether the columnar copy may be used.
+    **read_csv_kwargs
+        Passed to pd.read_csv (e.g. usecols, nrows, chunksize).
+
+    Returns
+    -------
+    pd.DataFrame | Iterator[pd.DataFrame]
+        Typed table, or an iterator of typed chunks when chunksize is given.
+    """
+    schema = get_schema(table)
+    is_file = isinstance(path, (str, Path))
+    if use_cache and is_file and set(read_csv_kwargs) <= CACHED_READ_OPTIONS \
+            and not callable(read_csv_kwargs.get("usecols")):
+        cached = open_columnar(path)
+        if cached is not None:
+            return _read_columnar(cached, table, **read_csv_kwargs)
+
+    if is_file:
+        # Buffers (e.g. a byte range of a raw file) are accounted for by the caller
+        record_bytes_read(path)
+    reader = pd.read_csv(path, dtype=schema.read_dtypes(), **read_csv_kwargs)
+
+    if read_csv_kwargs.get("chunksize") is not None:
+        return (enforce_schema(chunk, table) for chunk in reader)
+    return enforce_schema(reader, table)
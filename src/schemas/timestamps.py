@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from orchestration.metrics import record_nat_coercions
+
+# Timestamp formats of the Olist CSVs, most frequent first
+OLIST_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+def _as_datetime64(parsed) -> np.ndarray:
+    return np.asarray(parsed.to_numpy(zero_copy_only=False), dtype="datetime64[ns]")
+
+def parse_timestamps(
+    values: pd.Series,
+    column: str | None = None,
+    formats: tuple[str, ...] = OLIST_TIMESTAMP_FORMATS,
+) -> pd.Series:
+    """
+    Parse timestamp strings, with a vectorized fast path for the known formats.
+
+    The whole column is parsed with the first format by Arrow; only the
+    rows it does not match are retried with the next formats, and only the
+    rows matching none of them go through pandas' per-value parser. Values
+    that still cannot be parsed become NaT, and their count is added to the
+    metrics of the running step. Already parsed columns are returned as is.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Timestamp strings (object or string dtype).
+    column : str | None
+        Column name the NaT coercions are reported under (default: the series name).
+    formats : tuple[str, ...]
+        strptime formats tried in order before the slow path.
+
+    Returns
+    -------
+    pd.Series
+        datetime64[ns] series aligned with values.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    column = column or values.name
+    present = values.notna().to_numpy()
+
+    try:
+        strings = pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Not text (e.g. an all-missing float column, date objects): let pandas convert it
+        parsed = pd.to_datetime(values, errors="coerce")
+        record_nat_coercions(column, (present & parsed.isna().to_numpy()).sum())
+        return parsed
+
+    result = _as_datetime64(pc.strptime(strings, format=formats[0], unit="ns", error_is_null=True))
+    unmatched = np.flatnonzero(present & np.isnat(result))
+
+    for fmt in formats[1:]:
+        if not unmatched.size:
+            break
+        retry = _as_datetime64(pc.strptime(strings.take(unmatched), format=fmt, unit="ns", error_is_null=True))
+        result[unmatched] = retry
+        unmatched = unmatched[np.isnat(retry)]
+
+    if unmatched.size:
+        # Slow path: whatever pandas can still make sense of
+        # (values with a UTC offset are converted to naive UTC, naive values are kept as is)
+        retry = pd.to_datetime(values.iloc[unmatched].astype(object), format="mixed", errors="coerce", utc=True)
+        retry = retry.dt.tz_convert(None)
+        result[unmatched] = retry.to_numpy(dtype="datetime64[ns]")
+        record_nat_coercions(column, np.isnat(result[unmatched]).sum())
+
+    return pd.Series(result, index=values.index, name=values.name)
@@ -0,0 +1,432 @@
+import argparse
+import json
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from storage.concurrent_io import read_concurrently, table_read
+from storage.columnar_raw import file_signature
+from storage.tables import READ_PRIORITY, table_path
+
+MODELED_DATA_DIR = Path("data/modeled/olist")
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 1024
+
+# KPI -> (fact_orders column, aggregation); means skip missing values
+MEASURES = {
+    "orders_count": (None, "count"),
+    "items_count": ("order_items_count", "sum"),
+    "revenue": ("order_items_total_value", "sum"),
+    "freight_total": ("order_freight_total", "sum"),
+    "payment_total": ("order_payment_total", "sum"),
+    "voucher_orders": ("used_voucher", "sum"),
+    "avg_delivery_days": ("delivery_duration_days", "mean"),
+    "avg_delay_days": ("delivery_delay_days", "mean"),
+}
+GROUP_BY = ("month", "day", "state")
+FACT_COLUMNS = [
+    "customer_key", "order_purchase_timestamp",
+    *sorted({column for column, _ in MEASURES.values() if column is not None}),
+]
+# Published tables the service answers from
+SOURCE_TABLES = ("fact_orders", "dim_customers")
+
+
+def _stored_file(directory: Path, name: str) -> Path:
+    """
+    File read for a table by read_table without an explicit format.
+    """
+    for fmt in READ_PRIORITY:
+        path = table_path(directory, name, fmt)
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No stored table {name!r} in {directory}")
+
+
+def _group_index(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row positions grouped by value (CSR layout): positions sorted by value,
+    then by position, and the offset of each group.
+    """
+    order = np.argsort(values, kind="stable")
+    offsets = np.searchsorted(values[order], np.arange(values.max() + 2 if len(values) else 1))
+    return order, offsets
+
+
+class OrderIndex:
+    """
+    fact_orders held in memory, sorted by purchase time, with lookup indexes.
+
+    - purchase time: rows are sorted by order_purchase_timestamp (missing
+      last), so a date range is a contiguous slice found by binary search;
+    - customer_key and customer state: hash indexes (a pandas Index over
+      the keys) pointing into a CSR array of sorted row positions.
+
+    Measures are numpy arrays aligned with the sorted rows; month, day and
+    state are integer codes, so grouped aggregates are bincounts.
+
+    Parameters
+    ----------
+    fact_df : pd.DataFrame
+        fact_orders (at least FACT_COLUMNS).
+    dim_customers : pd.DataFrame
+        Customer dimension (customer_key, customer_state).
+    """
+
+    def __init__(self, fact_df: pd.DataFrame, dim_customers: pd.DataFrame):
+        fact_df = fact_df.sort_values("order_purchase_timestamp", kind="stable", na_position="last")
+        purchase_ts = fact_df["order_purchase_timestamp"]
+        self.n_rows = len(fact_df)
+        self.n_dated = int(purchase_ts.notna().sum())
+        self.timestamps = purchase_ts.to_numpy(dtype="datetime64[ns]")[:self.n_dated]
+
+        self.values = {
+            column: fact_df[column].to_numpy(dtype="float64", na_value=np.nan)
+            for column, _ in MEASURES.values() if column is not None
+        }
+
+        # Time groups of the dated rows; undated rows only match unfiltered queries
+        months = purchase_ts.dt.to_period("M")
+        month_codes, self.months = pd.factorize(months, sort=True)
+        day_codes, self.days = pd.factorize(purchase_ts.dt.normalize(), sort=True)
+        self.codes = {"month": month_codes, "day": day_codes}
+        self.labels = {
+            "month": self.months.astype(str).to_numpy(),
+            "day": self.days.strftime("%Y-%m-%d").to_numpy(),
+        }
+
+        # Customer state of each order, through an integer lookup on customer_key
+        customer_keys = fact_df["customer_key"].to_numpy()
+        dim_keys = dim_customers["customer_key"].to_numpy()
+        state_codes, states = pd.factorize(dim_customers["customer_state"].astype(str), sort=True)
+        lookup = np.full(max(customer_keys.max(initial=0), dim_keys.max(initial=0)) + 1, -1)
+        lookup[dim_keys] = state_codes
+        self.codes["state"] = lookup[customer_keys]
+        self.labels["state"] = np.asarray(states, dtype=object)
+        self.states = pd.Index(states)
+
+        # Orders of customers missing from the dimension are grouped last, under no state
+        self._state_positions, self._state_offsets = _group_index(
+            np.where(self.codes["state"] < 0, len(states), self.codes["state"])
+        )
+
+        unique_customers, customer_codes = np.unique(customer_keys, return_inverse=True)
+        self.customers = pd.Index(unique_customers)
+        self._customer_positions, self._customer_offsets = _group_index(customer_codes)
+
+    def _lookup(self, index: pd.Index, value, positions: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        code = index.get_indexer([value])[0]
+        if code < 0:
+            return positions[:0]
+        return positions[offsets[code]:offsets[code + 1]]
+
+    def select(self, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None,
+               state: str | None = None, customer_key: int | None = None) -> np.ndarray | slice:
+        """
+        Sorted positions of the rows matching the filters (a slice for a date range alone).
+
+        start and end are inclusive days; rows without a purchase date are
+        only selected when neither is given.
+        """
+        lo, hi = 0, self.n_rows
+        if start is not None or end is not None:
+            hi = self.n_dated
+            if start is not None:
+                lo = int(np.searchsorted(self.timestamps, start.normalize().to_datetime64(), "left"))
+            if end is not None:
+                next_day = (end.normalize() + pd.Timedelta(days=1)).to_datetime64()
+                hi = int(np.searchsorted(self.timestamps, next_day, "left"))
+
+        candidates = None
+        if state is not None:
+            candidates = self._lookup(self.states, state, self._state_positions, self._state_offsets)
+        if customer_key is not None:
+            rows = self._lookup(self.customers, customer_key, self._customer_positions, self._customer_offsets)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+        if candidates is None:
+            return slice(lo, max(lo, hi))
+
+        # Candidate positions are sorted: the date range is a slice of them too
+        return candidates[np.searchsorted(candidates, lo):np.searchsorted(candidates, hi)]
+
+    def aggregate(self, rows: np.ndarray | slice, measures: list[str], by: str | None = None) -> list[dict]:
+        """
+        KPIs of the selected rows, overall or per month / day / state.
+        """
+        if by is None:
+            n_selected = rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+            codes, labels = np.zeros(n_selected, dtype=np.int64), np.array([None], dtype=object)
+        else:
+            codes, labels = self.codes[by][rows], self.labels[by]
+        # Undated or stateless rows have no group
+        kept = codes >= 0
+        codes = codes[kept]
+        n_groups = len(labels)
+
+        counts = np.bincount(codes, minlength=n_groups)
+        results = {}
+        for measure in measures:
+            column, operation = MEASURES[measure]
+            if operation == "count":
+                results[measure] = counts
+                continue
+            values = self.values[column][rows][kept]
+            present = ~np.isnan(values)
+            sums = np.bincount(codes[present], weights=values[present], minlength=n_groups)
+            if operation == "sum":
+                results[measure] = sums
+            else:
+                present_counts = np.bincount(codes[present], minlength=n_groups)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    results[measure] = sums / present_counts
+
+        groups = np.flatnonzero(counts) if by is not None else np.array([0])
+        return [
+            {
+                **({by: labels[group]} if by is not None else {}),
+                **{measure: _json_number(results[measure][group]) for measure in measures},
+            }
+            for group in groups
+        ]
+
+
+def _json_number(value):
+    value = float(value)
+    if math.isnan(value):
+        return None
+    return int(value) if value.is_integer() and abs(value) < 2**53 else value
+
+
+class LRUCache:
+    """
+    Least-recently-used mapping of query keys to results, with hit counts.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class MetricsQueryService:
+    """
+    Read-only KPI queries on the published modeled tables.
+
+    fact_orders and dim_customers are loaded once into an OrderIndex; query
+    results are kept in an LRU cache. Before answering, the service checks
+    the size and modification time of the table files (a few stat calls):
+    when the pipeline has published new outputs, the tables are reloaded and
+    the cache is emptied.
+
+    Parameters
+    ----------
+    modeled_dir : Path
+        Directory of the modeled tables.
+    cache_size : int
+        Query results kept in the LRU cache.
+    """
+
+    def __init__(self, modeled_dir: Path = MODELED_DATA_DIR, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.modeled_dir = Path(modeled_dir)
+        self.cache = LRUCache(cache_size)
+        self.index = None
+        self.signatures = None
+        self.loaded_at = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _current_signatures(self) -> dict[str, list[int]]:
+        return {name: file_signature(_stored_file(self.modeled_dir, name)) for name in SOURCE_TABLES}
+
+    def refresh(self) -> bool:
+        """
+        Reload the tables if the pipeline published new ones since they were loaded.
+
+        Returns
+        -------
+        bool
+            Whether the tables were reloaded.
+        """
+        signatures = self._current_signatures()
+        if signatures == self.signatures:
+            return False
+        with self._lock:
+            if signatures == self.signatures:
+                return False
+            tables = read_concurrently({
+                "fact_orders": table_read(self.modeled_dir, "fact_orders", columns=FACT_COLUMNS),
+                "dim_customers": table_read(self.modeled_dir, "dim_customers", columns=["customer_key", "customer_state"]),
+            })
+            self.index = OrderIndex(tables["fact_orders"], tables["dim_customers"])
+            self.signatures = signatures
+            self.loaded_at = pd.Timestamp.now(tz="UTC").isoformat()
+            self.cache.clear()
+        return True
+
+    def query(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        state: str | None = None,
+        customer_key: int | None = None,
+        by: str | None = None,
+        measures: list[str] | None = None,
+    ) -> list[dict]:
+        """
+        Aggregate KPIs of the orders matching the filters.
+
+        Parameters
+        ----------
+        start, end : str | None
+            First and last purchase day (inclusive), e.g. "2018-01-01".
+        state : str | None
+            Customer state (e.g. "SP").
+        customer_key : int | None
+            Surrogate key of a customer (see dim_customers).
+        by : str | None
+            Group by "month", "day" or "state"; None returns one overall row.
+        measures : list[str] | None
+            KPIs to compute (keys of MEASURES); all of them by default.
+
+        Returns
+        -------
+        list[dict]
+            One row per non-empty group (one row overall when by is None).
+
+        Raises
+        ------
+        ValueError
+            For unknown measures or groupings, or unparsable dates.
+        """
+        measures = list(measures or MEASURES)
+        unknown = [measure for measure in measures if measure not in MEASURES]
+        if unknown:
+            raise ValueError(f"Unknown measures {unknown} (expected some of {list(MEASURES)})")
+        if by is not None and by not in GROUP_BY:
+            raise ValueError(f"Unknown grouping {by!r} (expected one of {GROUP_BY})")
+        try:
+            start = pd.Timestamp(start) if start else None
+            end = pd.Timestamp(end) if end else None
+        except ValueError as exc:
+            raise ValueError(f"Invalid date: {exc}") from exc
+        state = state.upper() if state else None
+        customer_key = int(customer_key) if customer_key is not None else None
+
+        self.refresh()
+        key = (start, end, state, customer_key, by, tuple(measures))
+        result = self.cache.get(key)
+        if result is None:
+            index = self.index
+            result = index.aggregate(index.select(start, end, state, customer_key), measures, by)
+            self.cache.put(key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "loaded_at": self.loaded_at,
+            "orders": self.index.n_rows,
+            "cache": {"size": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+
+def make_handler(service: MetricsQueryService):
+    """
+    HTTP request handler class answering from a query service.
+
+    GET /kpis?start=&end=&state=&customer_key=&by=&measures=a,b returns the
+    query rows as JSON; GET /health returns the service stats.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            if url.path == "/health":
+                return self._send(200, service.stats())
+            if url.path != "/kpis":
+                return self._send(404, {"error": f"Unknown path {url.path!r}"})
+            try:
+                rows = service.query(
+                    start=params.get("start"),
+                    end=params.get("end"),
+                    state=params.get("state"),
+                    customer_key=params.get("customer_key"),
+                    by=params.get("by"),
+                    measures=params["measures"].split(",") if params.get("measures") else None,
+                )
+            except ValueError as exc:
+                return self._send(400, {"error": str(exc)})
+            self._send(200, {"rows": rows})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(modeled_dir: Path = MODELED_DATA_DIR, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          cache_size: int = DEFAULT_CACHE_SIZE):
+    """
+    Run the HTTP query service until interrupted.
+    """
+    service = MetricsQueryService(modeled_dir, cache_size)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving {service.index.n_rows} orders on http://{host}:{port}/kpis")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve low-latency KPI queries on the modeled tables.")
+    parser.add_argument("--modeled-dir", type=Path, default=MODELED_DATA_DIR)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Query results kept in the LRU cache.")
+    args = parser.parse_args()
+
+    serve(args.modeled_dir, args.host, args.port, args.cache_size)
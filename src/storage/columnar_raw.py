@@ -0,0 +1,88 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from orchestration.metrics import record_bytes_read, record_bytes_written
+
+# Columnar copies of the raw CSVs, next to them
+COLUMNAR_DIR = "_columnar"
+MANIFEST_FILE = "manifest.json"
+
+
+def file_signature(path: Path) -> list[int]:
+    """
+    Size and modification time of a file: cheap evidence that it did not change.
+    """
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+def columnar_path(csv_path: Path) -> Path:
+    """
+    Path of the Arrow IPC copy of a raw CSV.
+    """
+    csv_path = Path(csv_path)
+    return csv_path.parent / COLUMNAR_DIR / csv_path.with_suffix(".arrow").name
+
+def load_cache_manifest(raw_dir: Path) -> dict:
+    """
+    Entries of the columnar raw cache of a directory, keyed by CSV file name.
+
+    Each entry holds the table name, the CSV sha256 and signature it was
+    converted from, its row count and the timestamp values coerced to NaT.
+    """
+    manifest_path = Path(raw_dir) / COLUMNAR_DIR / MANIFEST_FILE
+    if not manifest_path.exists():
+        return {}
+    return json.loads(manifest_path.read_text())
+
+def save_cache_manifest(raw_dir: Path, manifest: dict):
+    manifest_path = Path(raw_dir) / COLUMNAR_DIR / MANIFEST_FILE
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_name(f".{MANIFEST_FILE}.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, manifest_path)
+
+def write_columnar(df: pd.DataFrame, csv_path: Path) -> Path:
+    """
+    Write the parsed content of a raw CSV as an uncompressed Arrow IPC file.
+
+    Uncompressed, so readers can memory-map it and use its buffers in place.
+    """
+    path = columnar_path(csv_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    try:
+        with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    record_bytes_written(path)
+    return path
+
+def open_columnar(csv_path: Path) -> tuple[pa.Table, dict] | None:
+    """
+    Memory-map the Arrow copy of a raw CSV, if it is up to date.
+
+    Returns
+    -------
+    tuple[pa.Table, dict] | None
+        Zero-copy table and its manifest entry, or None when the CSV has no
+        copy or changed since it was converted (then read the CSV).
+    """
+    csv_path = Path(csv_path)
+    entry = load_cache_manifest(csv_path.parent).get(csv_path.name)
+    path = columnar_path(csv_path)
+    if entry is None or not path.exists() or not csv_path.exists() or entry["signature"] != file_signature(csv_path):
+        return None
+
+    record_bytes_read(path)
+    # The table's buffers point into the mapping, which stays open while they are referenced
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table, entry
@@ -0,0 +1,226 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from orchestration.metrics import current_metrics, report_to
+from schemas.registry import read_raw_table
+from storage.columnar_raw import columnar_path
+from storage.tables import READ_PRIORITY, export_csv, read_table, table_path, write_table
+
+IO_WORKERS = 8
+DEFAULT_IN_FLIGHT_MB = 1024
+# Rough in-memory size of a zstd-compressed columnar file, per byte on disk
+COMPRESSED_EXPANSION = 4
+
+
+class MemoryBudget:
+    """
+    Cap on the bytes of data in flight: acquiring blocks until enough is released.
+
+    A request larger than the cap is admitted once nothing else is in
+    flight, so an oversized table slows the pool down instead of deadlocking it.
+
+    Parameters
+    ----------
+    limit_bytes : int
+        Bytes allowed in flight at once.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = limit_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size_bytes: int):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.in_flight == 0 or self.in_flight + size_bytes <= self.limit_bytes
+            )
+            self.in_flight += size_bytes
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, size_bytes: int):
+        with self._condition:
+            self.in_flight -= size_bytes
+            self._condition.notify_all()
+
+
+@dataclass(frozen=True)
+class Read:
+    """
+    A table read to run on the I/O pool.
+
+    Attributes
+    ----------
+    func : Callable
+        Reader (e.g. read_raw_table, read_table), called with args and kwargs.
+    args : tuple
+        Positional arguments of the reader.
+    kwargs : dict[str, Any]
+        Keyword arguments of the reader.
+    size_bytes : int
+        Estimated in-memory size of the result, counted against the budget
+        while the read runs.
+    """
+
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    size_bytes: int = 0
+
+
+def raw_table_read(path: Path, table: str, **read_csv_kwargs) -> Read:
+    """
+    Read of a raw table (see schemas.registry.read_raw_table), sized from its columnar copy or CSV file.
+    """
+    size_bytes = 0
+    for candidate in (columnar_path(Path(path)), Path(path)):
+        if candidate.exists():
+            size_bytes = candidate.stat().st_size
+            break
+    return Read(read_raw_table, (path, table), read_csv_kwargs, size_bytes)
+
+
+def table_read(directory: Path, name: str, columns: list[str] | None = None, fmt: str | None = None) -> Read:
+    """
+    Read of a stored table (see storage.tables.read_table), sized from its file.
+    """
+    size_bytes = 0
+    for candidate in [fmt] if fmt is not None else READ_PRIORITY:
+        path = table_path(directory, name, candidate)
+        if path.exists():
+            expansion = 1 if candidate == "csv" else COMPRESSED_EXPANSION
+            size_bytes = path.stat().st_size * expansion
+            break
+    return Read(read_table, (directory, name), {"columns": columns, "fmt": fmt}, size_bytes)
+
+
+class IOPool:
+    """
+    Thread pool running table reads and writes, with a cap on the bytes in flight.
+
+    The Arrow-based readers and writers (Parquet, Feather, the raw cache) and
+    pandas' CSV parser release the GIL, so I/O of several tables overlaps with
+    each other and with the computation of the pipeline steps. The rejects, NaT
+    coercions and bytes read or written by a task are reported to the step that
+    submitted it.
+
+    Parameters
+    ----------
+    max_workers : int
+        Reads and writes running at once.
+    max_in_flight_mb : float
+        Memory cap: estimated size of the tables being read, and of the
+        tables waiting to be or being written. Submitting blocks while the
+        cap is reached.
+    """
+
+    def __init__(self, max_workers: int = IO_WORKERS, max_in_flight_mb: float = DEFAULT_IN_FLIGHT_MB):
+        self.max_workers = max_workers
+        self.budget = MemoryBudget(int(max_in_flight_mb * 2**20))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io")
+
+    def submit(self, func: Callable[..., Any], *args, size_bytes: int = 0, **kwargs) -> Future:
+        """
+        Run func(*args, **kwargs) on the pool once size_bytes fit in the budget.
+        """
+        self.budget.acquire(size_bytes)
+        metrics = current_metrics()
+
+        def task():
+            try:
+                with report_to(metrics):
+                    return func(*args, **kwargs)
+            finally:
+                self.budget.release(size_bytes)
+
+        try:
+            return self._executor.submit(task)
+        except BaseException:
+            self.budget.release(size_bytes)
+            raise
+
+    def read_all(self, reads: dict[str, Read]) -> dict[str, Any]:
+        """
+        Run reads concurrently.
+
+        Returns
+        -------
+        dict[str, Any]
+            Result of each read, keyed like reads.
+
+        Raises
+        ------
+        Exception
+            The first failing read's exception, once every read has finished.
+        """
+        futures = {
+            name: self.submit(read.func, *read.args, size_bytes=read.size_bytes, **read.kwargs)
+            for name, read in reads.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def write_in_background(self, df: pd.DataFrame, directory: Path, name: str, fmt: str,
+                            csv_export: bool = False) -> Future:
+        """
+        Write a table (and its CSV export) on the pool; the caller carries on.
+
+        The writer gets a shallow copy of the frame: consumers may add or
+        replace columns of theirs meanwhile, but must not modify values in place.
+
+        Returns
+        -------
+        Future
+            Resolves to the path of the written table.
+        """
+        df = df.copy(deep=False)
+
+        def write():
+            path = write_table(df, directory, name, fmt=fmt)
+            if csv_export:
+                export_csv(df, directory, name)
+            return path
+
+        return self.submit(write, size_bytes=int(df.memory_usage(index=False, deep=True).sum()))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_default_pool: IOPool | None = None
+_default_pool_lock = threading.Lock()
+
+
+def get_io_pool() -> IOPool:
+    """
+    Process-wide I/O pool (created with the defaults on first use).
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = IOPool()
+        return _default_pool
+
+
+def configure_io_pool(max_workers: int = IO_WORKERS, max_in_flight_mb: float = DEFAULT_IN_FLIGHT_MB) -> IOPool:
+    """
+    Replace the process-wide I/O pool, after its pending tasks finish.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        previous, _default_pool = _default_pool, IOPool(max_workers, max_in_flight_mb)
+    if previous is not None:
+        previous.shutdown()
+    return _default_pool
+
+
+def read_concurrently(reads: dict[str, Read]) -> dict[str, Any]:
+    """
+    Run reads concurrently on the process-wide I/O pool (see IOPool.read_all).
+    """
+    return get_io_pool().read_all(reads)
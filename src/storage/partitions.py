@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from orchestration.metrics import record_bytes_read, record_bytes_written
+from schemas.registry import SCHEMAS, check_not_null, enforce_schema
+from storage.tables import DEFAULT_FORMAT, TableWriter, read_table, table_path, write_table
+
+INDEX_FILE = "_partitions.json"
+PART_NAME = "part-0"
+# Partition of the rows without a partition value, as in Hive
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _content_hash(df: pd.DataFrame) -> str:
+    """
+    Hash of the values, column names and dtypes of a partition.
+    """
+    digest = hashlib.sha256(str(list(df.dtypes.astype(str).items())).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _timestamp_bound(value) -> str | None:
+    return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+
+def load_partition_index(directory: Path, name: str) -> dict:
+    """
+    Load the partition index of a partitioned table (empty if there is none).
+
+    Returns
+    -------
+    dict
+        {"partition_column", "timestamp_column", "format", "partitions": {value: entry}},
+        where each entry holds the partition file path (relative to the
+        table directory), its row count, min/max timestamp and content hash.
+    """
+    index_path = Path(directory) / name / INDEX_FILE
+    if not index_path.exists():
+        return {"partitions": {}}
+    return json.loads(index_path.read_text())
+
+def _write_partition_index(table_dir: Path, index: dict):
+    """
+    Replace the partition index of a table atomically.
+    """
+    index_path = table_dir / INDEX_FILE
+    tmp_path = index_path.with_name(f".{INDEX_FILE}.tmp")
+    tmp_path.write_text(json.dumps(index, indent=2))
+    os.replace(tmp_path, index_path)
+
+def write_partitioned_table(
+    df: pd.DataFrame,
+    directory: Path,
+    name: str,
+    partition_values: pd.Series,
+    partition_column: str,
+    timestamp_column: str | None = None,
+    fmt: str = DEFAULT_FORMAT,
+    max_workers: int = 4,
+    replaced_partitions: list[str] | None = None,
+) -> list[str]:
+    """
+    Write a table as Hive-style partitions, rewriting only changed partitions.
+
+    Rows are split by partition value into
+    <directory>/<name>/<partition_column>=<value>/part-0.<ext>, and a
+    partition index (row count, min/max timestamp, content hash per
+    partition) is kept in <directory>/<name>/_partitions.json. Partitions
+    whose content hash and format match the index are left untouched, the
+    changed ones are written concurrently, and partitions that no longer
+    have rows are removed. With replaced_partitions, df only holds the rows
+    of those partitions: the other partitions are kept as they are, so an
+    upsert only reads and writes the partitions it touches.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Table to write.
+    directory : Path
+        Layer directory.
+    name : str
+        Table name (registered tables are cast to their schema first).
+    partition_values : pd.Series
+        Partition value of each row, aligned with df; missing values go to NULL_PARTITION.
+    partition_column : str
+        Name of the partition key in the directory names.
+    timestamp_column : str | None
+        Column whose min/max are recorded per partition, for pruning.
+    fmt : str
+        Storage format of the partition files.
+    max_workers : int
+        Partitions written concurrently.
+    replaced_partitions : list[str] | None
+        Partition values whose rows df holds (None: df is the whole table).
+
+    Returns
+    -------
+    list[str]
+        Partition values that were (re)written.
+
+    Raises
+    ------
+    ValueError
+        If df has rows outside replaced_partitions, or if the kept
+        partitions are stored in another format.
+    """
+    if name in SCHEMAS:
+        df = enforce_schema(df, name)
+        check_not_null(df, name)
+
+    table_dir = Path(directory) / name
+    previous_index = load_partition_index(directory, name)
+    previous = previous_index["partitions"]
+
+    partition_values = pd.Series(partition_values, index=df.index, dtype="object")
+    partition_values = partition_values.where(partition_values.notna(), NULL_PARTITION)
+    codes, values = pd.factorize(partition_values, sort=True)
+    rows_by_code = pd.Series(codes).groupby(codes).indices
+
+    partitions, changed = {}, []
+    if replaced_partitions is not None:
+        outside = set(values) - set(replaced_partitions)
+        if outside:
+            raise ValueError(f"Rows of {name!r} outside the replaced partitions: {sorted(outside)}")
+        kept = {value: entry for value, entry in previous.items() if value not in replaced_partitions}
+        if kept and previous_index["format"] != fmt:
+            raise ValueError(f"Partitions of {name!r} are stored as {previous_index['format']}, not {fmt}")
+        partitions.update(kept)
+    for code, value in enumerate(values):
+        part_df = df.take(rows_by_code[code])
+        path = table_path(Path(f"{partition_column}={value}"), PART_NAME, fmt)
+        entry = {
+            "path": path.as_posix(),
+            "rows": len(part_df),
+            "min_timestamp": _timestamp_bound(part_df[timestamp_column].min()) if timestamp_column else None,
+            "max_timestamp": _timestamp_bound(part_df[timestamp_column].max()) if timestamp_column else None,
+            "content_hash": _content_hash(part_df),
+        }
+        partitions[value] = entry
+
+        old_entry = previous.get(value)
+        if old_entry != entry or not (table_dir / path).exists():
+            changed.append((value, part_df))
+
+    def write_partition(item):
+        value, part_df = item
+        return write_table(part_df, table_dir / f"{partition_column}={value}", PART_NAME, fmt=fmt)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        written_paths = list(executor.map(write_partition, changed))
+    # Partitions are written on pool threads: account for them on the step thread
+    for path in written_paths:
+        record_bytes_written(path)
+
+    for value in previous.keys() - partitions.keys():
+        shutil.rmtree(table_dir / f"{partition_column}={value}", ignore_errors=True)
+
+    _write_partition_index(table_dir, {
+        "partition_column": partition_column,
+        "timestamp_column": timestamp_column,
+        "format": fmt,
+        "partitions": dict(sorted(partitions.items())),
+    })
+
+    return [value for value, _ in changed]
+
+class PartitionedTableWriter:
+    """
+    Write a Hive-style partitioned table chunk by chunk, without holding it in memory.
+
+    Same layout and partition index as write_partitioned_table, but every
+    chunk is split by partition value and appended to one TableWriter per
+    partition, so rows of a partition may arrive in any number of chunks.
+    Content hashes are updated chunk by chunk (hash_pandas_object is
+    row-wise, so they equal the hash of the whole partition). Every
+    partition is rewritten; partitions of a previous write that received
+    no rows are removed when the writer is closed.
+
+    Parameters
+    ----------
+    directory : Path
+        Layer directory.
+    name : str
+        Table name (registered tables are cast to their schema first).
+    partition_column : str
+        Name of the partition key in the directory names.
+    timestamp_column : str | None
+        Column whose min/max are recorded per partition, for pruning.
+    fmt : str
+        Storage format of the partition files.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        partition_column: str,
+        timestamp_column: str | None = None,
+        fmt: str = DEFAULT_FORMAT,
+    ):
+        self.directory = Path(directory)
+        self.name = name
+        self.partition_column = partition_column
+        self.timestamp_column = timestamp_column
+        self.fmt = fmt
+        self._table_dir = self.directory / name
+        # Partition value -> its file writer, row count, content digest and timestamp bounds
+        self._writers = {}
+        self._rows = {}
+        self._digests = {}
+        self._bounds = {}
+
+    def write(self, df: pd.DataFrame, partition_values: pd.Series):
+        """
+        Append a chunk, partition_values being the partition value of each of its rows.
+        """
+        if self.name in SCHEMAS:
+            df = enforce_schema(df, self.name)
+            check_not_null(df, self.name)
+
+        partition_values = pd.Series(partition_values, index=df.index, dtype="object")
+        partition_values = partition_values.where(partition_values.notna(), NULL_PARTITION)
+        codes, values = pd.factorize(partition_values)
+        rows_by_code = pd.Series(codes).groupby(codes).indices
+
+        for code, value in enumerate(values):
+            part_df = df.take(rows_by_code[code])
+            if value not in self._writers:
+                self._writers[value] = TableWriter(
+                    self._table_dir / f"{self.partition_column}={value}", PART_NAME, self.fmt,
+                )
+                self._rows[value] = 0
+                self._digests[value] = hashlib.sha256(str(list(part_df.dtypes.astype(str).items())).encode())
+                self._bounds[value] = (pd.NaT, pd.NaT)
+            self._writers[value].write(part_df)
+
+            self._rows[value] += len(part_df)
+            self._digests[value].update(pd.util.hash_pandas_object(part_df, index=False).to_numpy().tobytes())
+            if self.timestamp_column:
+                low, high = self._bounds[value]
+                timestamps = part_df[self.timestamp_column]
+                # min / max skip NaT
+                self._bounds[value] = (
+                    pd.Series([low, timestamps.min()], dtype="datetime64[ns]").min(),
+                    pd.Series([high, timestamps.max()], dtype="datetime64[ns]").max(),
+                )
+
+    def close(self, commit: bool = True) -> list[str]:
+        """
+        Finish the partition files and the index (or discard the written files).
+
+        Returns
+        -------
+        list[str]
+            Partition values written, sorted.
+        """
+        writers = iter(self._writers.values())
+        try:
+            for writer in writers:
+                writer.close(commit=commit)
+        except BaseException:
+            # Discard the partitions not closed yet
+            for writer in writers:
+                writer.close(commit=False)
+            raise
+        if not commit:
+            return []
+
+        previous = load_partition_index(self.directory, self.name)["partitions"]
+        for value in previous.keys() - self._writers.keys():
+            shutil.rmtree(self._table_dir / f"{self.partition_column}={value}", ignore_errors=True)
+
+        partitions = {
+            value: {
+                "path": table_path(Path(f"{self.partition_column}={value}"), PART_NAME, self.fmt).as_posix(),
+                "rows": self._rows[value],
+                "min_timestamp": _timestamp_bound(self._bounds[value][0]) if self.timestamp_column else None,
+                "max_timestamp": _timestamp_bound(self._bounds[value][1]) if self.timestamp_column else None,
+                "content_hash": self._digests[value].hexdigest(),
+            }
+            for value in sorted(self._writers)
+        }
+        self._table_dir.mkdir(parents=True, exist_ok=True)
+        _write_partition_index(self._table_dir, {
+            "partition_column": self.partition_column,
+            "timestamp_column": self.timestamp_column,
+            "format": self.fmt,
+            "partitions": partitions,
+        })
+        return list(partitions)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
+
+def read_partitioned_table(
+    directory: Path,
+    name: str,
+    start: str | pd.Timestamp | None = None,
+    end: str | pd.Timestamp | None = None,
+    columns: list[str] | None = None,
+    max_workers: int = 4,
+) -> pd.DataFrame:
+    """
+    Read a partitioned table, loading only the partitions overlapping a date range.
+
+    Partitions are pruned with the min/max timestamps of the partition
+    index, then rows outside [start, end] are filtered out.
+
+    Parameters
+    ----------
+    directory : Path
+        Layer directory.
+    name : str
+        Table name.
+    start, end : str | pd.Timestamp | None
+        Inclusive bounds on the timestamp column of the index (None = unbounded).
+    columns : list[str] | None
+        Columns to load.
+    max_workers : int
+        Partitions read concurrently.
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows of the selected partitions, in partition order.
+    """
+    index = load_partition_index(directory, name)
+    if not index["partitions"]:
+        raise FileNotFoundError(f"No partitioned table {name!r} in {directory}")
+
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    timestamp_column = index["timestamp_column"]
+    if (start is not None or end is not None) and timestamp_column is None:
+        raise ValueError(f"Partitioned table {name!r} has no timestamp column to filter on")
+
+    selected = []
+    for value in sorted(index["partitions"]):
+        entry = index["partitions"][value]
+        if start is not None and (entry["max_timestamp"] is None or pd.Timestamp(entry["max_timestamp"]) < start):
+            continue
+        if end is not None and (entry["min_timestamp"] is None or pd.Timestamp(entry["min_timestamp"]) > end):
+            continue
+        selected.append(Path(directory) / name / entry["path"])
+    if not selected:
+        # Nothing in range: read one partition for the columns and dtypes
+        first_entry = index["partitions"][min(index["partitions"])]
+        selected, start = [Path(directory) / name / first_entry["path"]], pd.Timestamp.max
+
+    read_columns = columns
+    if columns is not None and timestamp_column is not None and timestamp_column not in columns:
+        read_columns = [*columns, timestamp_column]
+
+    def read_partition(path):
+        return read_table(path.parent, PART_NAME, columns=read_columns, fmt=index["format"])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(executor.map(read_partition, selected))
+    for path in selected:
+        record_bytes_read(path)
+    df = pd.concat(parts, ignore_index=True)
+
+    if start is not None:
+        df = df[df[timestamp_column] >= start]
+    if end is not None:
+        df = df[df[timestamp_column] <= end]
+    if columns is not None:
+        df = df[columns]
+    if name in SCHEMAS:
+        df = enforce_schema(df, name)
+
+    return df.reset_index(drop=True)
@@ -0,0 +1,235 @@
+import os
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from orchestration.metrics import record_bytes_read, record_bytes_written
+from schemas.registry import SCHEMAS, check_not_null, enforce_schema
+
+# File extension of each supported storage format
+TABLE_FORMATS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "csv": ".csv",
+}
+DEFAULT_FORMAT = "parquet"
+
+# Formats tried, in order, when reading a table without an explicit format
+READ_PRIORITY = ["parquet", "feather", "csv"]
+
+
+def table_path(directory: Path, name: str, fmt: str = DEFAULT_FORMAT) -> Path:
+    """
+    Build the on-disk path of a table.
+
+    Parameters
+    ----------
+    directory : Path
+        Layer directory (e.g. data/processed/olist).
+    name : str
+        Table name, without extension.
+    fmt : str
+        One of TABLE_FORMATS.
+
+    Returns
+    -------
+    Path
+        Path of the table file.
+    """
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unsupported table format: {fmt!r} (expected one of {sorted(TABLE_FORMATS)})")
+
+    return Path(directory) / f"{name}{TABLE_FORMATS[fmt]}"
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def write_table(df: pd.DataFrame, directory: Path, name: str, fmt: str = DEFAULT_FORMAT) -> Path:
+    """
+    Write a table to a layer directory.
+
+    Columnar formats are zstd-compressed and keep the dataframe schema
+    (datetimes, booleans, nullable types), so readers get the same dtypes back.
+    The file is written to a temporary name and renamed into place, so a
+    failed write never leaves a partial table behind. Registered tables are
+    cast to their schema dtypes and checked for nulls first.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Table to write.
+    directory : Path
+        Layer directory, created if needed.
+    name : str
+        Table name, without extension.
+    fmt : str
+        One of TABLE_FORMATS.
+
+    Returns
+    -------
+    Path
+        Path of the written file.
+    """
+    path = table_path(directory, name, fmt)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = _tmp_path(path)
+
+    if name in SCHEMAS:
+        df = enforce_schema(df, name)
+        check_not_null(df, name)
+
+    try:
+        if fmt == "parquet":
+            df.to_parquet(tmp_path, index=False, compression="zstd")
+        elif fmt == "feather":
+            df.reset_index(drop=True).to_feather(tmp_path, compression="zstd")
+        else:
+            df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    record_bytes_written(path)
+    return path
+
+
+def read_table(
+    directory: Path,
+    name: str,
+    columns: list[str] | None = None,
+    fmt: str | None = None,
+) -> pd.DataFrame:
+    """
+    Read a table from a layer directory.
+
+    Parameters
+    ----------
+    directory : Path
+        Layer directory.
+    name : str
+        Table name, without extension.
+    columns : list[str] | None
+        Columns to load. Columnar formats only read these columns from disk.
+    fmt : str | None
+        Storage format. When None, the first existing file in READ_PRIORITY is
+        used, or the partitions of a table only stored partitioned (see
+        storage.partitions).
+
+    Returns
+    -------
+    pd.DataFrame
+        Loaded table, with schema dtypes for registered tables.
+    """
+    if fmt is None:
+        candidates = [table_path(directory, name, candidate) for candidate in READ_PRIORITY]
+        existing = [path for path in candidates if path.exists()]
+        if not existing:
+            # storage.partitions builds on this module
+            from storage.partitions import INDEX_FILE, read_partitioned_table
+            if (Path(directory) / name / INDEX_FILE).exists():
+                return read_partitioned_table(directory, name, columns=columns)
+            raise FileNotFoundError(f"No stored table {name!r} in {directory}")
+        path = existing[0]
+        fmt = path.suffix.lstrip(".")
+    else:
+        path = table_path(directory, name, fmt)
+
+    record_bytes_read(path)
+    if fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif fmt == "feather":
+        df = pd.read_feather(path, columns=columns)
+    else:
+        # Shortest repr floats, as written by to_csv, parsed back to the same value
+        df = pd.read_csv(path, usecols=columns, float_precision="round_trip")
+
+    if name in SCHEMAS:
+        df = enforce_schema(df, name)
+    return df
+
+
+def export_csv(df: pd.DataFrame, directory: Path, name: str) -> Path:
+    """
+    Export a table as CSV next to its columnar copy (e.g. for Power BI).
+    """
+    return write_table(df, directory, name, fmt="csv")
+
+
+class TableWriter:
+    """
+    Write a table chunk by chunk, without holding it in memory.
+
+    Columnar chunks are appended as row groups / record batches with the
+    schema of the first chunk. As with write_table, the file only appears
+    under its final name once the writer is closed without error.
+
+    Parameters
+    ----------
+    directory : Path
+        Layer directory, created if needed.
+    name : str
+        Table name, without extension.
+    fmt : str
+        One of TABLE_FORMATS.
+    """
+
+    def __init__(self, directory: Path, name: str, fmt: str = DEFAULT_FORMAT):
+        self.path = table_path(directory, name, fmt)
+        self.name = name
+        self.fmt = fmt
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = _tmp_path(self.path)
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        """
+        Append a chunk to the table.
+        """
+        if self.name in SCHEMAS:
+            df = enforce_schema(df, self.name)
+
+        if self.fmt == "csv":
+            df.to_csv(self._tmp_path, mode="a", header=self._schema is None, index=False)
+            self._schema = True
+            return
+
+        if self._schema is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            # Columns entirely missing in the first chunk have no type yet
+            for i, schema_field in enumerate(schema):
+                if pa.types.is_null(schema_field.type):
+                    schema = schema.set(i, schema_field.with_type(pa.string()))
+            self._schema = schema
+            if self.fmt == "parquet":
+                self._writer = pq.ParquetWriter(self._tmp_path, schema, compression="zstd")
+            else:
+                options = pa.ipc.IpcWriteOptions(compression="zstd")
+                self._writer = pa.ipc.new_file(str(self._tmp_path), schema, options=options)
+
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self, commit: bool = True):
+        """
+        Finish the file and move it into place (or discard it).
+        """
+        if self._writer is not None:
+            self._writer.close()
+        try:
+            if commit and self._schema is not None:
+                os.replace(self._tmp_path, self.path)
+                record_bytes_written(self.path)
+        finally:
+            self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules are imported relative to src, as when running `PYTHONPATH=src python ...`
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,15 @@
+import pytest
+
+from engines.parity import check_parity
+from ingestion.synthetic_olist import generate_olist_dataset
+from storage.tables import TABLE_FORMATS
+
+
+@pytest.fixture(scope="module")
+def raw_dir(tmp_path_factory):
+    return generate_olist_dataset(tmp_path_factory.mktemp("raw"), scale_factor=0.01)
+
+
+@pytest.mark.parametrize("storage_format", sorted(TABLE_FORMATS))
+def test_duckdb_matches_pandas(raw_dir, tmp_path, storage_format):
+    assert check_parity(["duckdb"], raw_dir, tmp_path, storage_format) == []